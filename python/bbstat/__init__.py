@@ -1,21 +1,70 @@
-import pkg_resources  # part of setuptools
-version = pkg_resources.require("bbstat")[0].version
-__version__ = version
+from importlib import import_module
 
-from .data.roster import Roster
-from .data.results import AtBatResult
-from .data.counter import Counter
-from .data.lineup import Lineup
-from .stats.gamestats import GameStats
-from .data.frame import Frame
-from .data.game import HalfGame
-from .data.game import Game
-from .data.reader import Reader
-from .stats.batstats import BatStats
-from .stats.pitchstats import PitchStats
+# Public names and the modules that define them.
+# Each module is imported when one of its names is first used (PEP 562).
+lazy_names = {
+    'Roster':            '.data.roster',
+    'AtBatResult':       '.data.results',
+    'Counter':           '.data.counter',
+    'CounterHistory':    '.data.counter',
+    'Lineup':            '.data.lineup',
+    'StatTable':         '.stats.stattable',
+    'StatLog':           '.stats.statlog',
+    'ExcelCache':        '.data.excelcache',
+    'GameStats':         '.stats.gamestats',
+    'InningState':       '.data.inningstate',
+    'Frame':             '.data.frame',
+    'HalfGame':          '.data.game',
+    'Game':              '.data.game',
+    'GameState':         '.data.game',
+    'EventTable':        '.data.eventtable',
+    'Splits':            '.stats.splits',
+    'RunExpectancy':     '.stats.runexpectancy',
+    'GameParser':        '.data.parser',
+    'Reader':            '.data.reader',
+    'BatStats':          '.stats.batstats',
+    'PitchStats':        '.stats.pitchstats',
+    'GameSummary':       '.data.gamesummary',
+    'GameCache':         '.data.gamecache',
+    'SeasonReader':      '.data.season',
+    'Instrument':        '.data.instrument',
+    'main_test_counter': '.test.test_counter',
+    'main_test_lineup':  '.test.test_lineup',
+    'main_test_game':    '.test.test_game',
+    'main_test_stats':   '.test.test_stats',
+    'main_test_reader':  '.test.test_reader',
+    'main_season':       '.data.season',
+    'main_bench_memory': '.test.bench_memory',
+    'main_bench_timing': '.test.bench_timing',
+    'main_bench_compare': '.test.bench_timing',
+    'main_gen_games':    '.test.gamegen',
+    'main_profile':      '.data.instrument',
+    'main_splits':       '.stats.splits',
+    'main_re24':         '.stats.runexpectancy',
+}
 
-from .test.test_counter import main_test_counter
-from .test.test_lineup  import main_test_lineup
-from .test.test_game    import main_test_game
-from .test.test_stats   import main_test_stats
-from .test.test_reader  import main_test_reader
+__all__ = ['version'] + list(lazy_names)
+
+def package_version():
+    '''Return the installed version of bbstat.'''
+    from importlib.metadata import PackageNotFoundError
+    from importlib.metadata import version as dist_version
+    try:
+        return dist_version("bbstat")
+    except PackageNotFoundError:
+        return 'unknown'
+
+def __getattr__(name):
+    if name in ('version', '__version__'):
+        val = package_version()
+        globals()['version'] = val
+        globals()['__version__'] = val
+        return val
+    if name not in lazy_names:
+        raise AttributeError(f"module 'bbstat' has no attribute '{name}'")
+    val = getattr(import_module(lazy_names[name], __name__), name)
+    globals()[name] = val
+    return val
+
+def __dir__():
+    return sorted(list(globals()) + list(lazy_names))
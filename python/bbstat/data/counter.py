@@ -5,8 +5,11 @@
 '''
 Counter for bbstat.
 Shared by bbstat Frames so they can by synchronized.
+CounterHistory holds values stamped with counter indices.
 '''
 
+from bisect import bisect_left, bisect_right
+
 class Counter:
 
     def __init__(self):
@@ -33,6 +36,8 @@ class Counter:
         if inkey is None or absent, the last value is returned.
         The value and the key are returned.
         '''
+        if isinstance(dic, CounterHistory):
+            return dic.find_with_key(inkey)
         if type(dic) is not dict:
             return None, None
         keys = list(dic.keys())
@@ -51,3 +56,80 @@ class Counter:
     def find(dic, a_key=None):
         return Counter.find_with_key(dic, a_key)[0]
 
+
+class CounterHistory:
+    '''
+    History of values indexed by counter indices.
+    The keys are held in a sorted array so the value for any index
+    is found by bisection and the latest value is found directly.
+    Values are usually recorded in increasing index order, which appends
+    in O(1), but an earlier index may be inserted or its value replaced.
+    '''
+
+    __slots__ = ('__keys', '__vals')
+
+    def __init__(self, idx=None, val=None):
+        '''
+        Create a history.
+        If idx is not None, value val is recorded for that index.
+        '''
+        self.__keys = []
+        self.__vals = []
+        if idx is not None: self.set(idx, val)
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def __iter__(self):
+        return iter(self.__keys)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+    def keys(self):
+        '''Return the list of indices in increasing order.'''
+        return list(self.__keys)
+
+    def values(self):
+        '''Return the list of values ordered by index.'''
+        return list(self.__vals)
+
+    def items(self):
+        '''Return the (index, value) pairs ordered by index.'''
+        return zip(self.__keys, self.__vals)
+
+    def set(self, idx, val):
+        '''
+        Record value val for counter index idx.
+        An existing value for the same index is replaced.
+        Appending at or after the latest index is O(1).
+        '''
+        keys = self.__keys
+        if len(keys) == 0 or idx > keys[-1]:
+            keys.append(idx)
+            self.__vals.append(val)
+            return
+        ikey = bisect_left(keys, idx)
+        if keys[ikey] == idx:
+            self.__vals[ikey] = val
+        else:
+            keys.insert(ikey, idx)
+            self.__vals.insert(ikey, val)
+
+    def find_with_key(self, inkey=None):
+        '''
+        Return the last value with index less than or equal to inkey
+        and that index.
+        If inkey is None, the latest value is returned.
+        (None, None) is returned if there is no such entry.
+        '''
+        keys = self.__keys
+        if len(keys) == 0: return None, None
+        if inkey is None: return self.__vals[-1], keys[-1]
+        ikey = bisect_right(keys, inkey) - 1
+        if ikey < 0: return None, None
+        return self.__vals[ikey], keys[ikey]
+
+    def find(self, inkey=None):
+        '''Return the last value with index less than or equal to inkey.'''
+        return self.find_with_key(inkey)[0]
@@ -0,0 +1,331 @@
+# eventtable.py
+'''
+Table of the plate appearances and on-base events in games.
+'''
+
+import numpy
+from bbstat import AtBatResult
+from bbstat import GameStats
+
+class EventTable:
+    '''
+    Plate appearances and on-base events held in a NumPy structured array
+    with one row per event ordered by game and counter index.
+    Columns (see dtype):
+      game - Game number assigned by the caller, e.g. file order in a season
+      idx - Counter index of the result or on-base action
+      inning - Inning number
+      half - 0 for the top (visitor at bat) and 1 for the bottom
+      outs - Outs before the event
+      bases - Occupied bases before the event: 1 for 1B + 2 for 2B + 4 for 3B
+      batter - Player at bat or -1 if there is none
+      runner - Runner making an on-base event, -1 for a plate appearance
+      pitcher - Pitcher or -1 if there is none
+      code - Event code: index in names
+      pa - True for a plate appearance
+      balls, strikes - Pitches recorded for the batter before the event.
+                       The pitch count is balls + strikes.
+      runs - Runs scored from this event up to the next in the half inning
+      rbi - Runs batted in over the same span
+      nout - Outs made over the same span
+    The runner advances and outs that follow a batter's result are part of
+    that plate appearance. Stolen bases, caught stealing, wild pitches,
+    passed balls and balks are events of their own as is any other out
+    on base made before the batter's result. Other advances are part of the
+    preceding event.
+    '''
+
+    names = ['out', 'k', 'kd', 'sac', 'sf', 'fc', 'e', 'bb', 'ibb', 'hbp',
+             'b1', 'b2', 'b3', 'hr', 'other',
+             'sb', 'di', 'wp', 'pb', 'balk', 'cs', 'po']
+    codes = {nam: icod for icod, nam in enumerate(names)}
+    onbase_actions = {'SB': 'sb', 'DI': 'di', 'WP': 'wp', 'PB': 'pb', 'BALK': 'balk'}
+    dtype = numpy.dtype([('game', 'i4'), ('idx', 'i4'), ('inning', 'i2'), ('half', 'i1'),
+                         ('outs', 'i1'), ('bases', 'i1'), ('batter', 'i2'), ('runner', 'i2'),
+                         ('pitcher', 'i2'), ('code', 'i1'), ('pa', '?'), ('balls', 'i1'),
+                         ('strikes', 'i1'), ('runs', 'i1'), ('rbi', 'i1'), ('nout', 'i1')])
+
+    @staticmethod
+    def result_name(res):
+        '''
+        Return the event name for a batter's AtBatResult.
+        A result counted in more than one batting stat takes the first of
+        strikeout, hit, walk, hit by pitch, error, fielder's choice,
+        sacrifice fly, sacrifice and out.
+        '''
+        if res.is_k: return 'k' if res.batter_out else 'kd'
+        if res.hit_base: return ['b1', 'b2', 'b3', 'hr'][res.hit_base-1]
+        if res.is_walk: return 'ibb' if res.label.rstrip('!') == 'IBB' else 'bb'
+        if res.is_hbp: return 'hbp'
+        if res.is_error: return 'e'
+        if res.is_fc: return 'fc'
+        if res.is_sacrifice_fly: return 'sf'
+        if 'SAC' in res.causes: return 'sac'
+        if res.batter_out: return 'out'
+        return 'other'
+
+    @staticmethod
+    def inning_rows(frames, state, dlup, ostats, dstats, inning=0):
+        '''
+        Return the structured array of events for the frames of a half inning.
+          frames - Frames of the half inning in batting order
+          state - InningState for the half inning. Its end index closes the
+                  span of the last event.
+          dlup - Defensive lineup used to find the pitcher
+          ostats, dstats - Stats of the batting and fielding teams. The runs,
+                           RBI and outs are taken from their increment logs.
+        The game and half columns are left zero.
+        '''
+        if len(frames) == 0: return numpy.zeros(0, dtype=EventTable.dtype)
+        codes = EventTable.codes
+        rows = []      # (idx, code, batter frame or None, runner frame or None)
+        pawins = []    # (result, next batter start or None) counter indices of each plate appearance
+        outs = []      # (idx, runner frame) for other outs on base
+        for ifrm, frm in enumerate(frames):
+            iend = frames[ifrm+1].index_start() if ifrm + 1 < len(frames) else None
+            for idx, act in frm.action_history():
+                nam = EventTable.onbase_actions.get(act)
+                if nam is not None:
+                    rows.append((idx, codes[nam], None, frm))
+                    continue
+                if act in ('T', 'AD'): continue
+                res = AtBatResult.get(act)
+                if frm.base(idx-1) == 0:
+                    rows.append((idx, codes[EventTable.result_name(res)], frm, None))
+                    pawins.append((idx, iend))
+                elif res.batter_out:
+                    if 'CS' in res.causes: rows.append((idx, codes['cs'], None, frm))
+                    else: outs.append((idx, frm))
+        for idx, frm in outs:
+            if not any(ifst <= idx and (ilst is None or idx < ilst) for ifst, ilst in pawins):
+                rows.append((idx, codes['po'], None, frm))
+        rows.sort(key=lambda row: row[0])
+        evts = numpy.zeros(len(rows), dtype=EventTable.dtype)
+        if len(rows) == 0: return evts
+        counts = {}    # Cumulative (index, balls, strikes) for each batter frame
+        cols = []
+        for idx, code, bfrm, rfrm in rows:
+            if bfrm is None: bfrm = state.base_frame(0, idx-1)
+            bases = 0
+            for ibas in range(1, 4):
+                if state.base_frame(ibas, idx-1) is not None: bases += 1 << (ibas - 1)
+            nball = 0
+            nstri = 0
+            if bfrm is not None:
+                if bfrm not in counts:
+                    pcnts = []
+                    for pidx, spits in bfrm.pitch_history():
+                        nb = spits.count('b')
+                        nball += nb
+                        nstri += len(spits) - nb
+                        pcnts.append((pidx, nball, nstri))
+                    counts[bfrm] = pcnts
+                nball = 0
+                nstri = 0
+                for pidx, nb, ns in counts[bfrm]:
+                    if pidx > idx: break
+                    nball = nb
+                    nstri = ns
+            # Lineup changes recorded at idx follow the event.
+            batter = None if bfrm is None else bfrm.player(idx-1)
+            runner = None if rfrm is None else rfrm.player(idx-1)
+            pitcher = None if dlup is None else dlup.get_player(1, idx-1)
+            cols.append((idx, state.outs(idx-1), bases,
+                         -1 if batter is None else batter, -1 if runner is None else runner,
+                         -1 if pitcher is None else pitcher, code, rfrm is None, nball, nstri))
+        for nam, vals in zip(['idx', 'outs', 'bases', 'batter', 'runner', 'pitcher', 'code', 'pa',
+                              'balls', 'strikes'], zip(*cols)):
+            evts[nam] = vals
+        evts['inning'] = inning
+        # Assign the logged runs, RBI and outs to the events in whose span they fall.
+        # The last span ends when the half inning does, even if frames were left active.
+        idxs = evts['idx']
+        iend = state.index_end()
+        batlog = None if ostats is None else ostats.bat_log()
+        pitlog = None if dstats is None else dstats.pitch_log()
+        batevts = None if batlog is None else batlog.events()
+        pitevts = None if pitlog is None else pitlog.events()
+        for col, levts, icol in [('runs', batevts, GameStats.bat_names.index('run')),
+                                 ('rbi', batevts, GameStats.bat_names.index('rbi')),
+                                 ('nout', pitevts, GameStats.pit_names.index('ino'))]:
+            if levts is None: continue
+            lidxs = levts['idx']
+            sel = (levts['col'] == icol) & (lidxs >= idxs[0])
+            if iend is not None: sel &= lidxs <= iend
+            irows = numpy.searchsorted(idxs, lidxs[sel], 'right') - 1
+            evts[col] = numpy.bincount(irows, weights=levts['delta'][sel], minlength=len(evts))
+        return evts
+
+    @classmethod
+    def concatenate(cls, tables):
+        '''Return the table holding the rows of a list of tables or arrays.'''
+        arrs = [tab.values() if isinstance(tab, EventTable) else tab for tab in tables]
+        if len(arrs) == 0: return cls()
+        return cls(numpy.concatenate(arrs))
+
+    @classmethod
+    def load(cls, fnam):
+        '''
+        Return the table saved in a .npy or .npz file with save.
+        Returns None if the file does not hold an event table.
+        '''
+        myname = 'EventTable.load'
+        gnams = []
+        teams = []
+        if fnam.endswith('.npz'):
+            with numpy.load(fnam, allow_pickle=False) as npz:
+                evts = npz['events'] if 'events' in npz else None
+                if 'gnams' in npz: gnams = [str(gnam) for gnam in npz['gnams']]
+                if 'teams' in npz: teams = [(str(vis), str(hom)) for vis, hom in npz['teams']]
+        else:
+            evts = numpy.load(fnam, allow_pickle=False)
+        if evts is None or evts.dtype != cls.dtype:
+            print(f"{myname}: ERROR: File {fnam} does not hold an event table.")
+            return None
+        return cls(evts, gnams, teams)
+
+    def __init__(self, evts=None, gnams=None, teams=None):
+        '''
+          evts - Structured array with dtype EventTable.dtype
+          gnams - Optional list of game names indexed by game number
+          teams - Optional list of (visitor, home) team names indexed by game number
+        '''
+        self.__evts = numpy.zeros(0, dtype=EventTable.dtype) if evts is None else evts
+        self.__gnams = [] if gnams is None else list(gnams)
+        self.__teams = [] if teams is None else [tuple(tms) for tms in teams]
+
+    def __len__(self):
+        return len(self.__evts)
+
+    def values(self):
+        '''Return the structured array of events.'''
+        return self.__evts
+
+    def game_names(self):
+        '''Return the list of game names indexed by game number.'''
+        return self.__gnams
+
+    def teams(self):
+        '''Return the list of (visitor, home) team names indexed by game number.'''
+        return self.__teams
+
+    def team_halves(self, team):
+        '''
+        Return the array indexed by game number of the half (0 or 1) in which
+        team bats or -1 if it did not play.
+        '''
+        return numpy.array([1 if hom == team else 0 if vis == team else -1
+                            for vis, hom in self.__teams], dtype=numpy.int64)
+
+    def team_rows(self, team, offense=True):
+        '''
+        Return the table of the events with team at bat or, if offense is
+        false, in the field. The game names and teams are kept.
+        '''
+        evts = self.__evts
+        halves = numpy.r_[self.team_halves(team), -1]
+        games = numpy.minimum(evts['game'], len(halves) - 1)
+        half = halves[games]
+        sel = (half >= 0) & ((evts['half'] == half) == offense)
+        return EventTable(evts[sel], self.__gnams, self.__teams)
+
+    def save(self, fnam):
+        '''
+        Save the table to file fnam.
+        A .npz file is compressed and includes the game names and teams.
+        Any other name is written with numpy.save and holds only the array.
+        '''
+        if fnam.endswith('.npz'):
+            teams = numpy.array(self.__teams, dtype=str).reshape(len(self.__teams), 2)
+            numpy.savez_compressed(fnam, events=self.__evts, gnams=numpy.array(self.__gnams, dtype=str),
+                                   teams=teams)
+        else:
+            numpy.save(fnam, self.__evts)
+
+    def __code_counts(self, groups, ngroup):
+        '''Return the (ngroup, ncode) matrix of event counts for each group and code.'''
+        ncode = len(EventTable.names)
+        keys = groups*ncode + self.__evts['code']
+        return numpy.bincount(keys, minlength=ngroup*ncode).reshape(ngroup, ncode)
+
+    @staticmethod
+    def __totals(nums, cols):
+        '''Return a DataFrame of stat columns cols indexed by player number dropping -1.'''
+        import pandas
+        df = pandas.DataFrame(cols, index=pandas.Index(nums, name=GameStats.num_index))
+        return df[df.index >= 0]
+
+    def bat_players(self):
+        '''Return the player credited with each event: the batter for a plate appearance and otherwise the runner.'''
+        evts = self.__evts
+        return numpy.where(evts['pa'], evts['batter'], evts['runner'])
+
+    def bat_columns(self, groups, ngroup):
+        '''
+        Return a dictionary of batting stat arrays with the totals for each
+        of ngroup groups. Array groups holds the group index of each event.
+        The stats are those of GameStats.bat_stats that follow from the
+        events: run and obo are not included.
+        '''
+        evts = self.__evts
+        counts = self.__code_counts(groups, ngroup)
+        cnt = {nam: counts[:, icod] for nam, icod in EventTable.codes.items()}
+        cols = {}
+        cols['pa'] = counts[:, :EventTable.codes['sb']].sum(axis=1)
+        cols['k'] = cnt['k'] + cnt['kd']
+        cols['out'] = cnt['out'] + cnt['k'] + cnt['sac'] + cnt['sf']
+        for nam in ['sac', 'sf', 'fc', 'e']: cols[nam] = cnt[nam]
+        cols['bb'] = cnt['bb'] + cnt['ibb']
+        for nam in ['hbp', 'b1', 'b2', 'b3', 'hr']: cols[nam] = cnt[nam]
+        cols['rbi'] = numpy.bincount(groups, weights=evts['rbi'], minlength=ngroup).astype(numpy.int64)
+        cols['cs'] = cnt['cs']
+        cols['sb'] = cnt['sb']
+        cols['pbw'] = cnt['pb'] + cnt['wp']
+        return cols
+
+    def pitch_columns(self, groups, ngroup):
+        '''
+        Return a dictionary of pitching stat arrays with the totals for each
+        of ngroup groups. Array groups holds the group index of each event.
+        The stats are those of GameStats.pitch_stats.
+        '''
+        evts = self.__evts
+        counts = self.__code_counts(groups, ngroup)
+        cnt = {nam: counts[:, icod] for nam, icod in EventTable.codes.items()}
+        def total(col, sel=None):
+            wts = evts[col] if sel is None else numpy.where(sel, evts[col], 0)
+            return numpy.bincount(groups, weights=wts, minlength=ngroup).astype(numpy.int64)
+        cols = {}
+        cols['bf'] = counts[:, :EventTable.codes['sb']].sum(axis=1)
+        cols['ino'] = total('nout')
+        cols['b'] = total('balls', evts['pa'])
+        cols['s'] = total('strikes', evts['pa'])
+        cols['bpo'] = cnt['out'] + cnt['k'] + cnt['sac'] + cnt['sf']
+        cols['rpo'] = cols['ino'] - cols['bpo']
+        cols['k'] = cnt['k'] + cnt['kd']
+        cols['bb'] = cnt['bb'] + cnt['ibb']
+        cols['hbp'] = cnt['hbp']
+        cols['hit'] = cnt['b1'] + cnt['b2'] + cnt['b3'] + cnt['hr']
+        cols['run'] = total('runs')
+        cols['wpa'] = cnt['wp']
+        return cols
+
+    def bat_totals(self):
+        '''
+        Return a DataFrame of batting stats indexed by player number with the
+        columns of bat_columns. Plate appearances are credited to the batter
+        and on-base events to the runner.
+        '''
+        nums, inv = numpy.unique(self.bat_players(), return_inverse=True)
+        return EventTable.__totals(nums, self.bat_columns(inv, len(nums)))
+
+    def pitch_totals(self):
+        '''
+        Return a DataFrame of pitching stats indexed by player number with
+        the columns of GameStats.pitch_stats. Balls and strikes are those
+        recorded before each result and are credited to the pitcher of the
+        result, so they differ from the game stats after a pitching change
+        during a plate appearance.
+        '''
+        nums, inv = numpy.unique(self.__evts['pitcher'], return_inverse=True)
+        return EventTable.__totals(nums, self.pitch_columns(inv, len(nums)))
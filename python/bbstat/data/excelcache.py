@@ -0,0 +1,122 @@
+# excelcache.py
+'''
+Opt-in cache of sheets read from Excel workbooks.
+'''
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+class ExcelCache:
+    '''
+    Cache of DataFrames read from Excel workbook sheets.
+    Each sheet is pickled to a file in the cache directory named
+    WORKBOOK.SHEET.HASH.pkl, where HASH identifies the workbook path. The
+    key for the read, i.e. the workbook path, mtime and size, the sheet,
+    the read options and a digest of the pickle, is written to a JSON file
+    with the same name ending in .json. The key is checked before the
+    pickle is loaded, so the pickle is used only if it was written by the
+    cache for the same read of an unchanged workbook.
+      dirnam - Cache directory. It is created if needed.
+    Nothing is written next to the workbooks. Entries that cannot be written
+    are skipped. The numbers of hits and misses for read are counted.
+    '''
+
+    def __init__(self, dirnam):
+        self.__dirnam = dirnam
+        os.makedirs(dirnam, exist_ok=True)
+        self.__nhit = 0
+        self.__nmiss = 0
+
+    @classmethod
+    def get_cache(cls, cache):
+        '''
+        Return the cache for a cache argument: an ExcelCache is returned as is,
+        a string is the name of the cache directory and None gives None.
+        '''
+        myname = 'ExcelCache.get_cache'
+        if cache is None or isinstance(cache, ExcelCache): return cache
+        if isinstance(cache, str): return ExcelCache(cache)
+        print(f"{myname}: WARNING: Ignoring invalid cache {cache!r}. Pass an ExcelCache or directory name.")
+        return None
+
+    def dirnam(self):
+        '''Return the cache directory.'''
+        return self.__dirnam
+
+    def counts(self):
+        '''Return a dictionary of the hit and miss counts.'''
+        return {'hit': self.__nhit, 'miss': self.__nmiss}
+
+    def path(self, fin, shnam):
+        '''Return the path of the pickle for sheet shnam of workbook fin.'''
+        absnam = os.path.abspath(fin)
+        phash = hashlib.sha256(absnam.encode()).hexdigest()[0:16]
+        return os.path.join(self.__dirnam, f"{os.path.basename(absnam)}.{shnam}.{phash}.pkl")
+
+    def key_path(self, fin, shnam):
+        '''Return the path of the JSON key file for sheet shnam of workbook fin.'''
+        return self.path(fin, shnam)[0:-4] + '.json'
+
+    @staticmethod
+    def key(fin, shnam, opts):
+        '''Return the key identifying a read of sheet shnam from workbook fin.'''
+        import pandas
+        stat = os.stat(fin)
+        sopts = repr(sorted(opts.items()))
+        return {'path': os.path.abspath(fin), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+                'sheet': shnam, 'opts': sopts, 'pandas': pandas.__version__}
+
+    def __load(self, key, path, kpath):
+        '''Return the cached DataFrame or None if the entry is missing or does not match key.'''
+        try:
+            with open(kpath, 'r') as fkey:
+                sidkey = json.load(fkey)
+            digest = sidkey.pop('digest')
+            if sidkey != key: return None
+            with open(path, 'rb') as fsid:
+                data = fsid.read()
+            if hashlib.sha256(data).hexdigest() != digest: return None
+            return pickle.loads(data)
+        except Exception:
+            return None
+
+    def __write(self, path, data, mode):
+        '''Write data to path through a temporary file so readers never see a partial file.'''
+        fd, tmpnam = tempfile.mkstemp(dir=self.__dirnam, suffix='.tmp')
+        try:
+            with os.fdopen(fd, mode) as fout:
+                fout.write(data)
+            os.replace(tmpnam, path)
+        except Exception:
+            os.remove(tmpnam)
+            raise
+
+    def read(self, fin, shnam, dbg=0, **opts):
+        '''
+        Return the DataFrame for sheet shnam of workbook fin read with
+        pandas.read_excel options opts. Errors reading the workbook are raised.
+        '''
+        import pandas
+        myname = 'ExcelCache.read'
+        key = ExcelCache.key(fin, shnam, opts)
+        path = self.path(fin, shnam)
+        kpath = self.key_path(fin, shnam)
+        df = self.__load(key, path, kpath)
+        if df is not None:
+            self.__nhit += 1
+            if dbg > 0: print(f"{myname}: Reading sheet {shnam} from {path}")
+            return df
+        self.__nmiss += 1
+        df = pandas.read_excel(fin, sheet_name=shnam, **opts)
+        try:
+            data = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+            # The key is written last so it never describes an old pickle.
+            self.__write(path, data, 'wb')
+            self.__write(kpath, json.dumps(dict(key, digest=hashlib.sha256(data).hexdigest())), 'w')
+            if dbg > 0: print(f"{myname}: Wrote sheet {shnam} to {path}")
+        except Exception:
+            if dbg > 0: print(f"{myname}: Unable to write cache entry {path}")
+        return df
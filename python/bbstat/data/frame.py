@@ -1,8 +1,12 @@
 # frame.py
 
-from collections import OrderedDict
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
 from bbstat import AtBatResult
-from bbstat import Counter
+
+# An action string classified by kind.
+ActionToken = namedtuple('ActionToken', 'kind code')
 
 class Frame:
     '''
@@ -11,13 +15,33 @@ class Frame:
     It has a list of pitches and a list of results and substitions.
     at-bat, advance on the base paths or out.
       pitches - array with b=ball, c=called strike, l=looking strike
-      pitch_idxs - Map of pitch indexes
       actions - array of actions after the pitches, starting with the at-bat result
-      action_idxs
       players - Player numbers original and substitutes.
       base - Current base: 0 is at bat, 1-3 is occupied base, 4 is scored, 5 is out
+    The pitch, action, player and base histories are held in one array of
+    64-bit entries ordered by counter index. The index is in the high 32 bits
+    and the low 32 bits hold a code whose low two bits give the kind of entry
+    and the rest the value: the player, the base or the code of the string in
+    a table of interned strings. The value for any counter index is found by
+    bisection on the index and a short scan back to the latest entry of the
+    wanted kind.
     '''
 
+    __slots__ = ('__halfgame', '__inning', '__index_start', '__index_end', '__ipos',
+                 '__player', '__base', '__hist', '__tagactions',
+                 '__state', '__out', 'tag_last', 'frame_last', 'frame_next', 'ostats', 'dstats')
+
+    token_cache_size = 4096   # Maximum number of cached action tokens
+    __tokens = {}             # ActionToken indexed by action string
+    __codes = {}              # Token kind indexed by action code
+    __prefixes = []           # (prefix, kind) checked in order
+    __handlers = {}           # (handler, need_active) indexed by token kind
+    __strings = []            # Interned pitch and action strings
+    __string_codes = {}       # Index in __strings indexed by string
+    __PITCH, __ACTION, __PLAYER, __BASE = range(4)   # Kinds of history entries
+    __VAL_OFFSET = 1 << 31    # Offset so signed codes pack as unsigned
+    __VAL_MASK = (1 << 32) - 1
+
     def __init__(self, halfgame, lineup_position, player, ostats, dstats, frame_last=None):
         '''
         Create a new frame.
@@ -26,14 +50,18 @@ class Frame:
           index - Index when player came up to bat.
         '''
         self.__halfgame = halfgame
+        self.__inning = halfgame.inning()
         self.__index_start = self.counter().get()   # Index when frame was created.
         self.__index_end = None              # Index when frame closed (out or end of inning).
         self.__ipos = lineup_position
-        self.__players = {self.counter().get():player}
-        self.__pitches = {}
-        self.__actions = {}
-        self.__tagactions = {}        # Unhandled tagged actions: lists indexed by tag.
-        self.__bases = {self.__index_start:0}
+        self.__hist = array('q')      # Counter index, kind and value for each history entry
+        self.__player = None          # Current player
+        self.__base = None            # Current base
+        self.__record(self.__index_start, Frame.__PLAYER, player)
+        self.__record(self.__index_start, Frame.__BASE, 0)
+        self.__tagactions = None      # Unhandled tagged actions: lists indexed by tag.
+        self.__state = halfgame.inning_state()   # Shared InningState for this inning
+        self.__state.move(self, None, 0, self.__index_start)
         self.__out = 0                # Inning out (1-3 if this frame made an out)
         self.tag_last = None          # Latest tag
         self.frame_last = frame_last  # Preceding frame in the inning
@@ -48,11 +76,97 @@ class Frame:
 
     def __str__(self):
         sout = ''
-        for pitch in self.__pitches: sout += pitch
-        for action in self.__actions:
+        for pitch in self.pitches(): sout += pitch
+        for action in self.actions():
             sout += ':' + str(action)
         return sout
 
+    @classmethod
+    def intern_code(cls, string):
+        '''Return the integer code for a pitch or action string.'''
+        code = cls.__string_codes.get(string)
+        if code is None:
+            code = len(cls.__strings)
+            cls.__strings.append(string)
+            cls.__string_codes[string] = code
+        return code
+
+    @classmethod
+    def code_string(cls, code):
+        '''Return the pitch or action string for an integer code.'''
+        return cls.__strings[code]
+
+    def __record(self, idx, kind, val):
+        '''
+        Record value val of kind kind at counter index idx.
+        Pitch and action strings are interned. An entry of the same kind at
+        the same index is replaced.
+        '''
+        if kind == Frame.__PLAYER: self.__player = val
+        elif kind == Frame.__BASE: self.__base = val
+        else: val = Frame.intern_code(val)
+        hist = self.__hist
+        ent = (idx << 32) | (4*val + kind + Frame.__VAL_OFFSET)
+        if len(hist) == 0 or idx > hist[-1] >> 32:
+            hist.append(ent)
+            return
+        iend = bisect_left(hist, (idx + 1) << 32)
+        ient = iend - 1
+        while ient >= 0 and hist[ient] >> 32 == idx:
+            if Frame.__decode(hist[ient])[0] == kind:
+                hist[ient] = ent
+                return
+            ient -= 1
+        hist.insert(iend, ent)
+
+    @staticmethod
+    def __decode(ent):
+        '''Return (kind, value) for a history entry.'''
+        code = (ent & Frame.__VAL_MASK) - Frame.__VAL_OFFSET
+        return code & 3, code >> 2
+
+    def __find(self, kind, idx):
+        '''Return the player or base value for counter index idx or None if there is none.'''
+        hist = self.__hist
+        ient = bisect_left(hist, (idx + 1) << 32) - 1
+        while ient >= 0:
+            ekind, val = Frame.__decode(hist[ient])
+            if ekind == kind: return val
+            ient -= 1
+        return None
+
+    def __entries(self, kind):
+        '''Return the list of (counter index, value) for the entries of kind kind.'''
+        out = []
+        for ent in self.__hist:
+            ekind, val = Frame.__decode(ent)
+            if ekind == kind: out.append((ent >> 32, val))
+        return out
+
+    def __history_idxs(self, kind):
+        '''Return the counter indices for the entries of kind kind.'''
+        return [idx for idx, val in self.__entries(kind)]
+
+    def __history_strings(self, kind):
+        '''Return the strings for the pitch or action entries of kind kind.'''
+        return [Frame.__strings[val] for idx, val in self.__entries(kind)]
+
+    def pitches(self):
+        '''Return the list of pitch strings.'''
+        return self.__history_strings(Frame.__PITCH)
+
+    def actions(self):
+        '''Return the list of recorded action strings.'''
+        return self.__history_strings(Frame.__ACTION)
+
+    def pitch_history(self):
+        '''Return the list of (counter index, pitch string) for the pitch entries.'''
+        return list(zip(self.__history_idxs(Frame.__PITCH), self.__history_strings(Frame.__PITCH)))
+
+    def action_history(self):
+        '''Return the list of (counter index, action) for the recorded actions.'''
+        return list(zip(self.__history_idxs(Frame.__ACTION), self.__history_strings(Frame.__ACTION)))
+
     def halfgame(self):
         return self.__halfgame
 
@@ -69,7 +183,20 @@ class Frame:
 
     def player(self, idx=None):
         '''Return the current player.'''
-        return Counter.find(self.__players, idx)
+        if idx is None: return self.__player
+        return self.__find(Frame.__PLAYER, idx)
+
+    def inning(self):
+        '''Return the inning number for this frame.'''
+        return self.__inning
+
+    def index_start(self):
+        '''Return the counter index when the frame was created.'''
+        return self.__index_start
+
+    def index_end(self):
+        '''Return the counter index when the frame was closed or None if it is active.'''
+        return self.__index_end
 
     def is_active(self, idx=None):
         '''
@@ -87,9 +214,9 @@ class Frame:
         chk = idx is not None
         nball = 0
         nstri = 0
-        for key, pit in self.__pitches.items():
+        for key, code in self.__entries(Frame.__PITCH):
             if chk and key > idx: break
-            if pit == 'b': nball += 1
+            if Frame.__strings[code] == 'b': nball += 1
             else: nstri += 1
         return nball+nstri, nball, nstri
 
@@ -100,9 +227,11 @@ class Frame:
           1-3 - on base
           4 - scored
         '''
-        bas = Counter.find(self.__bases, idx)
+        myname = 'Frame.base'
+        if idx is None: return self.__base
+        bas = self.__find(Frame.__BASE, idx)
         if bas is None:
-            print(f"{myname}: WARNING: No base found for index {idx} with bases {self.__bases}")
+            print(f"{myname}: WARNING: No base found for index {idx} before frame start {self.__index_start}")
             bas = 0
         return bas
         
@@ -126,31 +255,51 @@ class Frame:
         '''
         return self.is_active() and self.base() == 0
 
-    def preceding_frames(self, __frms=None):
+    def iter_preceding(self, idx=None):
+        '''
+        Iterate over the frames preceding this starting from the latest.
+        Frames started after index idx are skipped.
+        Index None means all current frames.
+        '''
+        frm = self.frame_last
+        while frm is not None:
+            if idx is None or frm.__index_start <= idx:
+                yield frm
+            frm = frm.frame_last
+
+    def iter_following(self, idx=None):
+        '''
+        Iterate over the frames following this before index idx starting
+        from the next frame.
+        Index None means all current frames.
+        '''
+        frm = self.frame_next
+        while frm is not None:
+            if idx is not None and frm.__index_start > idx: return
+            yield frm
+            frm = frm.frame_next
+
+    def iter_inning(self, idx=None):
+        '''
+        Iterate over all frames in this inning before index idx starting
+        from the first.
+        Index None means all current frames.
+        '''
+        return self.__halfgame.iter_inning(self.__inning, idx)
+
+    def preceding_frames(self, idx=None):
         '''
         Return the frames preceding this starting from the latest.
         '''
-        frms = __frms
-        if frms is None: frms = []
-        if self.frame_last is None:
-            return frms
-        frms.append(self.frame_last)
-        return self.frame_last.preceding_frames(frms)
+        return list(self.iter_preceding(idx))
 
-    def following_frames(self, idx=None, __frms=None):
+    def following_frames(self, idx=None):
         '''
         Return the frames following this before index idx starting
         from the next frame.
         Index None means all current frames.
         '''
-        frms = __frms
-        if frms is None: frms = []
-        if self.frame_next is None:
-            return frms
-        if idx is not None and self.frame_next.__index_start > idx:
-            return frms
-        frms.append(self.frame_next)
-        return self.frame_next.following_frames(idx,  frms)
+        return list(self.iter_following(idx))
 
     def inning_frames(self, idx=None):
         '''
@@ -158,93 +307,46 @@ class Frame:
         from the first.
         Index None means all current frames.
         '''
-        frames = []
-        frm = self
-        while frm.frame_last is not None: frm = frm.frame_last
-        while frm is not None:
-            frames.append(frm)
-            frm = frm.frame_next
-        return frames
+        return list(self.iter_inning(idx))
+
+    def inning_state(self):
+        '''Return the InningState shared by the frames in this inning.'''
+        return self.__state
 
     def inning_out_frame_map(self, idx=None):
         '''
         Return a dictionary of frames making outs indexed by out number.
         '''
-        myname = 'Frame.inning_out_frame_map'
-        dbg = 0
-        outs = {}
-        for frm in self.inning_frames():
-            out = frm.out()
-            ipos = frm.lineup_position()
-            if dbg: print(f"{myname}: Frame {ipos} out is {out}")
-            if out:
-                if frm.is_active(idx):
-                    print(f"{myname}: WARNING: Ignoring out because frame is active.")
-                    continue     # Out hasn't been made yet
-                if frm.out in outs:
-                    print(f"{myname}: WARNING: Ignoring duplicate out {out}.")
-                    continue
-                outs[out] = frm
-        if dbg: print(f"{myname}: Returning {len(outs)} outs.")
-        return outs
+        return self.__state.out_frame_map(idx)
 
     def inning_out_frame(self, out, idx=None):
         '''
         Return the frame making out out.
         Returns None if the out was not made.
         '''
-        ofrms = self.inning_out_frame_map(idx)
-        if out in ofrms:
-            return ofrms[out]
-        return None
+        return self.__state.out_frame(out, idx)
 
     def inning_outs(self, idx=None):
         '''
         Return the number of outs made in the inning.
         '''
-        myname = 'Frame.inning_outs'
-        dbg = 0
-        outs = list(self.inning_out_frame_map(idx).keys())
-        outs.sort()
-        nout = len(outs)
-        if dbg: print(f"{myname}: Returning {nout} outs.")
-        if outs != list(range(1,nout+1)):
-            print(f"{myname}: WARNING: Out values are inconsistent: {outs}")
-            print(self.inning_out_frame_map(idx))
-            assert(False)
-        return nout
+        return self.__state.outs(idx)
         
     def inning_runs(self, idx=None):
         '''Return the number of runs scored in the inning.'''
-        myname = 'Frame.inning_runs'
-        dbg = 0
-        nrun = 0
-        if dbg: print(f"{myname}: Checking inning runs.")
-        for frm in self.inning_frames():
-            if frm.scored(idx):
-                nrun += 1
-                if dbg: print(f"{myname}:   Position {frm.lineup_position():2d} scored")
-            else:
-                if dbg: print(f"{myname}:   Position {frm.lineup_position():2d} did not score")
-        if dbg: print(f"{myname}: Run count is {nrun}.")
-        return nrun
+        return self.__state.runs(idx)
 
     def inning_base_frame(self, base, idx=None):
         '''
         Return the frame on base base at index idx.
+        Base 0 is the frame at bat.
         Return None for error or if base is unoccupied.
         '''
         myname = 'Frame.inning_base_frame'
         if base < 0 or base > 3:
-            print("{myname}: ERROR: Cannot check base {base}")
+            print(f"{myname}: ERROR: Cannot check base {base}")
             return None
-        bfrm = None
-        for frm in self.inning_frames():
-            if frm.base(idx) == base:
-                if bfrm is not None:
-                     print("WARNING: Ignoring earlier player on base.")
-                bfrm = frm
-        return bfrm
+        return self.__state.base_frame(base, idx)
 
     def left_atbat(self):
         '''
@@ -252,7 +354,9 @@ class Frame:
         I.e. if this batter should bat again at the top of the next inning.
         '''
         if self.is_active(): return False
-        return len(self.__actions) == 0
+        for ent in self.__hist:
+            if Frame.__decode(ent)[0] == Frame.__ACTION: return False
+        return True
 
     def left_onbase(self):
         '''
@@ -277,8 +381,12 @@ class Frame:
         if ofrm is not None:
             print(f"{myname}: ERROR: Out {out} was already made by player {ofrm.player()}.")
             return 2
+        idx = self.counter().get()
+        if self.__state.set_out(self, self.base(), out, idx):
+            print(f"{myname}: ERROR: Out {out} does not follow out {self.inning_outs()}.")
+            return 3
         self.__out = out
-        self.__index_end = self.counter().get()
+        self.__index_end = idx
         self.dstats.increment_pitch_stat('ino')
         return 0
 
@@ -306,7 +414,8 @@ class Frame:
             print(f"WARNING: Advanced past home to {self.base()}")
             base = 4
         idx = self.counter().get()
-        self.__bases[idx] = base
+        self.__state.move(self, self.base(), base, idx)
+        self.__record(idx, Frame.__BASE, base)
             
     def pitch(self, spits, action=''):
         '''
@@ -335,7 +444,7 @@ class Frame:
         self.dstats.increment_pitch_stat('b', nb)
         self.dstats.increment_pitch_stat('s', nk)
         idx = self.counter().next()
-        self.__pitches[idx] = spits
+        self.__record(idx, Frame.__PITCH, spits)
         if len(action):
             self.add_action(action)
         return 0
@@ -354,6 +463,8 @@ class Frame:
           T = Advance on throw
           B:A = Add action A to the player on base B
           A1,A2,... = Add actions A1, A2, ...
+        The action is classified once by tokenize and then handled by the
+        handler registered for its kind (see register_action).
         '''
         myname = 'Frame.add_action'
         dbg = 0
@@ -363,13 +474,11 @@ class Frame:
         if len(action) == 0:
             print(f"{myname}: ERROR: Action string is empty.")
             return 1
-            
-        isout = False
+        tok = Frame.tokenize(action)
         # Handle multiple actions.
-        acts = action.split(',')
-        if len(acts) > 1:
+        if tok.kind == 'multi':
             if dbg: print(f"{myname}: Splitting action {action}")
-            for act in acts:
+            for act in action.split(','):
                 ret = self.add_action(act, dotag, False);
                 if ret:
                     print(f"{myname}: ERROR: Subaction {act} in action {action} failed.")
@@ -377,12 +486,12 @@ class Frame:
             return 0
         # An action that starts with '@' is a tag reference. Use it to build the tag name
         # and then carry out all actions associated with that name.
-        if action[0] == '@':
+        if tok.kind == 'tagref':
             tag = str(self.lineup_position())
             if len(action) > 1:
                 tag += '.' + action[1:]
             counts = [0,0]
-            for frm in self.preceding_frames():
+            for frm in self.iter_preceding():
                 frm.add_tag_actions(tag, counts)
             if counts[1] != 0:
                 print(f"{myname}: ERROR: Errors occured handling actions for tag {tag}.")
@@ -394,8 +503,7 @@ class Frame:
             return 0
         # If the action starts with a tag, record it and strip it off.
         tag = None
-        baseact = action.split(':')
-        if action[0] == '<':
+        if tok.kind == 'tagged':
             # Do not record a new tag if the action is being handled.
             if dotag:
                 print(f"{myname}: ERROR: Tag included in handled on-base action {action}")
@@ -406,12 +514,13 @@ class Frame:
                 return 1 
             tag = tagact[0]
             self.tag_last = tag
+            if self.__tagactions is None: self.__tagactions = {}
             if tag not in self.__tagactions:
                 self.__tagactions[tag] = []
             action = tagact[1]
         # Otherwise, use the latest tag.
         # Except end-only actions are recorded there.
-        elif len(self.__tagactions):
+        elif self.__tagactions:
             if action in ['LOB', 'LAB']: tag = 'end'
             else: tag = self.tag_last
         # If the frame is tagged and dotag is False, then record the action instead
@@ -425,210 +534,324 @@ class Frame:
             return 0
         # Handle the action.
         if dbg: print(f"{myname}: Handling action {action}")
-        # Handle onbase action.
-        if action in ['SB', 'DI', 'WP', 'PB', 'T', 'AD', 'BALK']:
-            if self.atbat():
-                print(f"{myname}: ERROR: On-base action {action} requested for player at-bat.")
-                return 5
-            if action == 'SB':
-                self.ostats.increment_player_bat_stat(self.player(),'sb')
-            elif action in ['PB', 'WP']:
-                self.ostats.increment_player_bat_stat(self.player(),'pbw')
-            if action == 'WP':
-                self.dstats.increment_pitch_stat('wpa')
-            oldbase = self.base()
-            if self.advance_base(): return 1
-            newbase = self.base()
-            if dbg: print(f"{myname}: Player advanced from base {oldbase} to base {newbase}")
-            self.__actions[idx] = action
-            return 0
-        # Handle check of at bat.
-        if action == 'ATBAT':
-            if not dotag:
-                self.__tagactions['end'] = action
-                return 0
-            if self.atbat(): return 0
-            pos = self.lineup_position()
-            print(f"{myname}: ERROR: Frame {pos} is not at bat.")
-            return 1
-        # Handle check of left at bat at then end of the inning.
-        # Inning may not be over, e.g. mercy.
-        if action == 'LAB':
-            if self.atbat() or self.left_atbat(): return 0
-            pos = self.lineup_position()
-            print(f"{myname}: ERROR: Frame {pos} is not left at bat.")
-            return 1
-        # Handle check of left on base at the end of the inning.
-        if action == 'LOB':
-            if not dotag:
-                if 'end' not in self.__tagactions:
-                    self.__tagactions['end'] = [action]
-                else: self.__tagactions['end'].append(action)
-                return 0
-            if self.left_onbase(): return 0
-            print(f"{myname}: ERROR: Frame is not left on base.")
+        handler, need_active = Frame.__handlers[tok.kind]
+        if need_active and not self.is_active():
+            print(f"{myname}: ERROR: Action {action} requested for a frame that is not active.")
             return 1
-        # Handle check of scored.
-        if action[0:3] == 'RUN':
-            if self.scored(): return 0
-            print(f"{myname}: ERROR: Frame did not score.")
+        return handler(self, tok, idx, dotag)
+
+    @classmethod
+    def tokenize(cls, action):
+        '''
+        Return the ActionToken for an action string.
+        Tokens are cached so each distinct action is classified once.
+        '''
+        tok = cls.__tokens.get(action)
+        if tok is None:
+            if len(cls.__tokens) >= cls.token_cache_size: cls.__tokens.clear()
+            tok = ActionToken(cls.__classify(action), action)
+            cls.__tokens[action] = tok
+        return tok
+
+    @classmethod
+    def __classify(cls, action):
+        '''Return the kind of an action string.'''
+        if ',' in action: return 'multi'
+        chr0 = action[0:1]
+        if chr0 == '@': return 'tagref'
+        if chr0 == '<': return 'tagged'
+        kind = cls.__codes.get(action)
+        if kind is not None: return kind
+        for pfx, kind in cls.__prefixes:
+            if action.startswith(pfx): return kind
+        if chr0 in AtBatResult.pitch_types(): return 'pitches'
+        return 'result'
+
+    @classmethod
+    def register_action(cls, code, handler, kind=None, prefix=False, need_active=False):
+        '''
+        Register a handler for an action code.
+          code - Action string or, if prefix is true, the start of the action string
+          handler - Function handler(frame, token, idx, dotag) returning 0 for success
+          kind - Token kind. Default is the code.
+          need_active - If true, the action is rejected for an inactive frame.
+        Registered prefixes are checked before those registered earlier.
+        '''
+        if kind is None: kind = code
+        if prefix:
+            cls.__prefixes.insert(0, (code, kind))
+        else:
+            cls.__codes[code] = kind
+        cls.__handlers[kind] = (handler, need_active)
+        cls.__tokens.clear()
+
+    @classmethod
+    def unregister_action(cls, code, prefix=False):
+        '''
+        Remove the registration of an action code or, if prefix is true, an
+        action prefix. The handler for its kind is removed when no other code
+        or prefix has that kind. Returns 0 for success or 1 if the code is
+        not registered.
+        '''
+        myname = 'Frame.unregister_action'
+        if prefix:
+            kinds = [kind for pfx, kind in cls.__prefixes if pfx == code]
+            cls.__prefixes[:] = [(pfx, kind) for pfx, kind in cls.__prefixes if pfx != code]
+        else:
+            kinds = [cls.__codes.pop(code)] if code in cls.__codes else []
+        if len(kinds) == 0:
+            print(f"{myname}: ERROR: Action {code} is not registered.")
             return 1
-        # Handle check of outs.
-        if action[0:3] == 'OUT':
-            if action[0:5] == 'OUTS:':
-                assert( len(action) == 6 )
-                chkout = int(action[5])
-                if chkout != self.inning_outs():
-                    print(f"{myname}: ERROR: Inconsistent inning out counts: {chkout} != {self.out()}")
-                    return 1
-            else:
-                assert( len(action) == 4 )
-                chkout = int(action[3])
-                if chkout != self.out():
-                    print(f"{myname}: ERROR: Inconsistent out counts: {chkout} != {self.out()}")
-                    return 1
+        used = set(cls.__codes.values()) | set(kind for pfx, kind in cls.__prefixes)
+        for kind in kinds:
+            if kind not in used: cls.__handlers.pop(kind, None)
+        cls.__tokens.clear()
+        return 0
+
+    @classmethod
+    def register_standard_actions(cls):
+        '''Register the handlers for the standard actions.'''
+        for code in ['SB', 'DI', 'WP', 'PB', 'T', 'AD', 'BALK']:
+            cls.register_action(code, cls.__do_onbase, 'onbase')
+        cls.register_action('ATBAT', cls.__do_atbat_check)
+        cls.register_action('LAB', cls.__do_lab_check)
+        cls.register_action('LOB', cls.__do_lob_check)
+        cls.register_action('RBI', cls.__do_rbi)
+        for code in ['NORBI', 'PO', 'DP']:
+            cls.register_action(code, cls.__do_nothing, 'nothing')
+        # Prefixes are registered in reverse order of precedence.
+        cls.register_action('RSUB#', cls.__do_runner_sub, 'rsub', prefix=True, need_active=True)
+        cls.register_action('PITCH#', cls.__do_pitcher, 'pitcher', prefix=True, need_active=True)
+        cls.register_action('[', cls.__do_base_check, 'base', prefix=True)
+        cls.register_action('OUT', cls.__do_out_check, 'out', prefix=True)
+        cls.register_action('RUN', cls.__do_run_check, 'run', prefix=True)
+        # Pitches and at-bat results are found when no code matches.
+        cls.__handlers['pitches'] = (cls.__do_pitches, True)
+        cls.__handlers['result'] = (cls.__do_result, True)
+
+    def __do_onbase(self, tok, idx, dotag):
+        '''Handle onbase action.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        dbg = 0
+        action = tok.code
+        if self.atbat():
+            print(f"{myname}: ERROR: On-base action {action} requested for player at-bat.")
+            return 5
+        if action == 'SB':
+            self.ostats.increment_player_bat_stat(self.player(),'sb')
+        elif action in ['PB', 'WP']:
+            self.ostats.increment_player_bat_stat(self.player(),'pbw')
+        if action == 'WP':
+            self.dstats.increment_pitch_stat('wpa')
+        oldbase = self.base()
+        if self.advance_base(): return 1
+        newbase = self.base()
+        if dbg: print(f"{myname}: Player advanced from base {oldbase} to base {newbase}")
+        self.__record(idx, Frame.__ACTION, action)
+        return 0
+
+    def __do_atbat_check(self, tok, idx, dotag):
+        '''Handle check of at bat.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        if not dotag:
+            if self.__tagactions is None: self.__tagactions = {}
+            self.__tagactions['end'] = tok.code
             return 0
-        # Handle check of base.
-        if action[0] == '[':
-            if len(action) != 3 or action[2] != ']' or not action[1].isdigit():
-                print(f"{myname}: ERROR: Invalid base check action: {action}")
+        if self.atbat(): return 0
+        pos = self.lineup_position()
+        print(f"{myname}: ERROR: Frame {pos} is not at bat.")
+        return 1
+
+    def __do_lab_check(self, tok, idx, dotag):
+        '''
+        Handle check of left at bat at then end of the inning.
+        Inning may not be over, e.g. mercy.
+        '''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        if self.atbat() or self.left_atbat(): return 0
+        pos = self.lineup_position()
+        print(f"{myname}: ERROR: Frame {pos} is not left at bat.")
+        return 1
+
+    def __do_lob_check(self, tok, idx, dotag):
+        '''Handle check of left on base at the end of the inning.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        if not dotag:
+            if self.__tagactions is None: self.__tagactions = {}
+            if 'end' not in self.__tagactions:
+                self.__tagactions['end'] = [tok.code]
+            else: self.__tagactions['end'].append(tok.code)
+            return 0
+        if self.left_onbase(): return 0
+        print(f"{myname}: ERROR: Frame is not left on base.")
+        return 1
+
+    def __do_run_check(self, tok, idx, dotag):
+        '''Handle check of scored.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        if self.scored(): return 0
+        print(f"{myname}: ERROR: Frame did not score.")
+        return 1
+
+    def __do_out_check(self, tok, idx, dotag):
+        '''Handle check of outs.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        action = tok.code
+        if action[0:5] == 'OUTS:':
+            assert( len(action) == 6 )
+            chkout = int(action[5])
+            if chkout != self.inning_outs():
+                print(f"{myname}: ERROR: Inconsistent inning out counts: {chkout} != {self.out()}")
                 return 1
-            base = int(action[1])
-            if base != self.base():
-                print(f"{myname}: ERROR: Expected base is incorrect: {base} != {self.base()}")
+        else:
+            assert( len(action) == 4 )
+            chkout = int(action[3])
+            if chkout != self.out():
+                print(f"{myname}: ERROR: Inconsistent out counts: {chkout} != {self.out()}")
                 return 1
-            return 0
-        # Handle RBI.
-        if action == 'RBI':
-            if dbg:
-                print(f"{myname}: Handling RBI.")
-            self.ostats.increment_player_bat_stat(self.player(),'rbi')
-            return 0
-        # Handle no RBI.
-        if action == 'NORBI':
-            if dbg:
-                print(f"{myname}: Handling NORBI.")
-            return 0
-        # Handle productive out.
-        if action == 'PO':
-            if dbg:
-                print(f"{myname}: Handling PO.")
-            return 0
-        # Handle double play.
-        if action == 'DP':
-            if dbg:
-                print(f"{myname}: Handling DP.")
-            return 0
-        # Remainder require that player is active.
-        if not self.is_active():
-            print(f"{myname}: ERROR: Action {action} requested for a frame that is not active.")
+        return 0
+
+    def __do_base_check(self, tok, idx, dotag):
+        '''Handle check of base.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        action = tok.code
+        if len(action) != 3 or action[2] != ']' or not action[1].isdigit():
+            print(f"{myname}: ERROR: Invalid base check action: {action}")
             return 1
-        # Handle pitches.
-        if action[0:1] in AtBatResult.pitch_types():
-            if not self.atbat():
-                print(f"{myname}: Pitches {action} received when not at bat.")
-                return 1
-            sta = self.pitch(action)
-            if sta: return sta
-            return 0
-        # Pitcher substitution.
-        elif action[0:6] == 'PITCH#':
-            pspec = '1#' + action[6:]
-            dlup = self.halfgame().defensive_lineup()
-            nerr, nset = dlup.set_from_string(pspec)
-            if nerr:
-                print(f"{myname}: ERROR: Unable to set pitcher with spec {pspec}")
-            return nerr
-        # Runner substitution.
-        elif action[0:5] == 'RSUB#':
-            if not self.is_active():
-                print(f"{myname}: ERROR: Runner subsitution {action} requested for an inactive frame.")
-                return 6
-            if not self.base() in [1,2,3]:
-                print(f"{myname}: ERROR: Runner substitution requested when not no base.")
-                return 6
-            num = int(action[5:])
-            irun = int(action[5:])
-            # Add runner to stats if needed.
-            assert(self.ostats.have_batter(irun, add=True))
-            self.__players[self.counter().get()] = num
-        # Handle atbat action.
+        base = int(action[1])
+        if base != self.base():
+            print(f"{myname}: ERROR: Expected base is incorrect: {base} != {self.base()}")
+            return 1
+        return 0
+
+    def __do_rbi(self, tok, idx, dotag):
+        '''Handle RBI.'''
+        self.ostats.increment_player_bat_stat(self.player(),'rbi')
+        return 0
+
+    def __do_nothing(self, tok, idx, dotag):
+        '''Handle no RBI, productive out and double play.'''
+        return 0
+
+    def __do_pitches(self, tok, idx, dotag):
+        '''Handle pitches.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        action = tok.code
+        if not self.atbat():
+            print(f"{myname}: Pitches {action} received when not at bat.")
+            return 1
+        sta = self.pitch(action)
+        if sta: return sta
+        return 0
+
+    def __do_pitcher(self, tok, idx, dotag):
+        '''Pitcher substitution.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        pspec = '1#' + tok.code[6:]
+        dlup = self.halfgame().defensive_lineup()
+        nerr, nset = dlup.set_from_string(pspec)
+        if nerr:
+            print(f"{myname}: ERROR: Unable to set pitcher with spec {pspec}")
+        return nerr
+
+    def __do_runner_sub(self, tok, idx, dotag):
+        '''Runner substitution.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        action = tok.code
+        if not self.is_active():
+            print(f"{myname}: ERROR: Runner subsitution {action} requested for an inactive frame.")
+            return 6
+        if not self.base() in [1,2,3]:
+            print(f"{myname}: ERROR: Runner substitution requested when not no base.")
+            return 6
+        num = int(action[5:])
+        irun = int(action[5:])
+        # Add runner to stats if needed.
+        assert(self.ostats.have_batter(irun, add=True))
+        self.__record(self.counter().get(), Frame.__PLAYER, num)
+        return 0
+
+    def __do_result(self, tok, idx, dotag):
+        '''Handle atbat action.'''
+        myname = f"Frame.add_action: Frame {self.lineup_position()}"
+        dbg = 0
+        action = tok.code
+        isout = False
+        if not self.is_active():
+            print(f"{myname}: ERROR: At-bat action {action} requested for an inactive frame.")
+            return 6
+        res = AtBatResult.get(action)
+        if res.valid:
+            isout = res.batter_out
+            iserr = len(res.errors) > 0
+            # For player on base, the result must be an out or an error.
+            oldbase = self.base()
+            resbase = 0 if res.base is None else res.base
+            advbase = resbase
+            if oldbase:
+                if not isout and not iserr:
+                    print(f"{myname}: ERROR: At-bat action {action} for a frame on base must be "
+                          f"an out or an error.")
+                    return 6
+                if iserr:
+                    advbase = 1
+                    resbase = oldbase + 1
+                if isout:
+                    num = self.player()
+                    if not self.ostats.have_batter(num):
+                        print(f"{myname}: ERROR: On-base out made by unknown player number {num}")
+                        return 1
+                    self.ostats.increment_player_bat_stat(num,'obo')
+                    self.dstats.increment_pitch_stat('rpo')
+                    if 'CS' in res.causes:
+                        self.ostats.increment_player_bat_stat(num,'cs')
+                    del num
+            if dbg: print(f"{myname}: At-bat result for action {action}: base={resbase}, "
+                          f"isout={res.batter_out}")
+            self.__record(idx, Frame.__ACTION, action)
+            if advbase:
+                self.advance_base(advbase)
+                if self.base() != resbase:
+                    print(f"{myname}: ERROR: Action {action} advanced base {self.base()} " \
+                          f"is not the expected {resbase}.")
+                    return 7
+            # Update batting stats if action is for a batter.
+            if oldbase == 0:
+                self.ostats.increment_player_bat_stat(self.player(),'pa')
+                if res.is_k:
+                    self.ostats.increment_player_bat_stat(self.player(),'k')
+                    self.dstats.increment_pitch_stat('k')
+                if res.batter_out:
+                    self.ostats.increment_player_bat_stat(self.player(),'out')
+                    self.dstats.increment_pitch_stat('bpo')
+                if res.is_fc:
+                    self.ostats.increment_player_bat_stat(self.player(),'fc')
+                if res.is_error:
+                    self.ostats.increment_player_bat_stat(self.player(),'e')
+                if res.is_sacrifice_fly:
+                    self.ostats.increment_player_bat_stat(self.player(),'sf')
+                if 'SAC' in res.causes:
+                    self.ostats.increment_player_bat_stat(self.player(),'sac')
+                if res.is_walk:
+                    self.ostats.increment_player_bat_stat(self.player(),'bb')
+                    self.dstats.increment_pitch_stat('bb')
+                if res.is_hbp:
+                    self.ostats.increment_player_bat_stat(self.player(),'hbp')
+                    self.dstats.increment_pitch_stat('hbp')
+                if res.hit_base == 1:
+                    self.ostats.increment_player_bat_stat(self.player(),'b1')
+                if res.hit_base == 2:
+                    self.ostats.increment_player_bat_stat(self.player(),'b2')
+                if res.hit_base == 3:
+                    self.ostats.increment_player_bat_stat(self.player(),'b3')
+                if res.hit_base == 4:
+                    self.ostats.increment_player_bat_stat(self.player(),'hr')
+                if res.hit_base:
+                    self.dstats.increment_pitch_stat('hit')
+                self.dstats.increment_pitch_stat('bf')
         else:
-            if not self.is_active():
-                print(f"{myname}: ERROR: At-bat action {action} requested for an inactive frame.")
-                return 6
-            res = AtBatResult(action)
-            if res.valid:
-                isout = res.batter_out
-                iserr = len(res.errors) > 0
-                # For player on base, the result must be an out or an error.
-                oldbase = self.base()
-                resbase = 0 if res.base is None else res.base
-                advbase = resbase
-                if oldbase:
-                    if not isout and not iserr:
-                        print(f"{myname}: ERROR: At-bat action {action} for a frame on base must be "
-                              f"an out or an error.")
-                        return 6
-                    if iserr:
-                        advbase = 1
-                        resbase = oldbase + 1
-                    if isout:
-                        num = self.player()
-                        if not self.ostats.have_batter(num):
-                            print(f"{myname}: ERROR: On-base out made by unknown player number {num}")
-                            return 1
-                        self.ostats.increment_player_bat_stat(num,'obo')
-                        self.dstats.increment_pitch_stat('rpo')
-                        if 'CS' in res.causes:
-                            self.ostats.increment_player_bat_stat(num,'cs')
-                        del num
-                if dbg: print(f"{myname}: At-bat result for action {action}: base={resbase}, "
-                              f"isout={res.batter_out}")
-                self.__actions[idx] = action
-                if advbase:
-                    self.advance_base(advbase)
-                    if self.base() != resbase:
-                        print(f"{myname}: ERROR: Action {action} advanced base {self.base()} " \
-                              f"is not the expected {resbase}.")
-                        return 7
-                # Update batting stats if action is for a batter.
-                if oldbase == 0:
-                    self.ostats.increment_player_bat_stat(self.player(),'pa')
-                    if res.is_k:
-                        self.ostats.increment_player_bat_stat(self.player(),'k')
-                        self.dstats.increment_pitch_stat('k')
-                    if res.batter_out:
-                        self.ostats.increment_player_bat_stat(self.player(),'out')
-                        self.dstats.increment_pitch_stat('bpo')
-                    if res.is_fc:
-                        self.ostats.increment_player_bat_stat(self.player(),'fc')
-                    if res.is_error:
-                        self.ostats.increment_player_bat_stat(self.player(),'e')
-                    if res.is_sacrifice_fly:
-                        self.ostats.increment_player_bat_stat(self.player(),'sf')
-                    if 'SAC' in res.causes:
-                        self.ostats.increment_player_bat_stat(self.player(),'sac')
-                    if res.is_walk:
-                        self.ostats.increment_player_bat_stat(self.player(),'bb')
-                        self.dstats.increment_pitch_stat('bb')
-                    if res.is_hbp:
-                        self.ostats.increment_player_bat_stat(self.player(),'hbp')
-                        self.dstats.increment_pitch_stat('hbp')
-                    if res.hit_base == 1:
-                        self.ostats.increment_player_bat_stat(self.player(),'b1')
-                    if res.hit_base == 2:
-                        self.ostats.increment_player_bat_stat(self.player(),'b2')
-                    if res.hit_base == 3:
-                        self.ostats.increment_player_bat_stat(self.player(),'b3')
-                    if res.hit_base == 4:
-                        self.ostats.increment_player_bat_stat(self.player(),'hr')
-                    if res.hit_base:
-                        self.dstats.increment_pitch_stat('hit')
-                    self.dstats.increment_pitch_stat('bf')
-            else:
-                print(f"{myname}: ERROR: Invalid atbat action: {action}")
-                return 7
+            print(f"{myname}: ERROR: Invalid atbat action: {action}")
+            return 7
         # If we are out set the frame counter.
         if isout:
             nout_old = self.inning_outs()
@@ -646,11 +869,12 @@ class Frame:
         myname = 'Frame.add_tag_actions'
         dbg = 0
         ipos = self.lineup_position()
-        if tag not in self.__tagactions:
+        if not self.__tagactions or tag not in self.__tagactions:
             if dbg:
                 print(f"{myname}: Frame {ipos} has no actions for tag {tag}.")
             return 0
         acts = self.__tagactions.pop(tag)
+        if not self.__tagactions: self.__tagactions = None
         if dbg:
             print(f"{myname}: Frame {self.lineup_position()} has {len(acts)} actions for tag {tag}.")
         for act in acts:
@@ -663,10 +887,12 @@ class Frame:
         '''End the inning. Set all frames inactive for thsi inning.'''
         myname = 'Frame.end_inning'
         counts = [0,0]
-        for frm in self.inning_frames():
-            if frm.is_active(): frm.__index_end = self.counter().get() 
+        for frm in self.iter_inning():
+            if frm.is_active():
+                frm.__index_end = self.counter().get() 
+                self.__state.leave(frm, frm.base(), frm.__index_end)
             frm.add_tag_actions('end', counts)
-            tags = frm.__tagactions.keys()
+            tags = {} if frm.__tagactions is None else frm.__tagactions.keys()
             if len(tags):
                 ipos = frm.lineup_position()
                 print(f"{myname}: ERROR: Frame {ipos} has unhandled action tags: {tags}")
@@ -680,9 +906,9 @@ class Frame:
     def sequence(self):
         '''Return string with pitches and action sequence.'''
         sout = ''
-        for pit in self.__pitches.values():
+        for pit in self.pitches():
             sout += pit
-        for act in self.__actions.values():
+        for act in self.actions():
             if len(sout): sout += ' '
             sout += act
         return sout
@@ -693,15 +919,8 @@ class Frame:
         for counter index idx or current if idx is None.
         Returns None if the base is unoccupied.
         '''
-        base_frames = []
-        frm = self.frame_last
-        while frm is not None:
-            if frm.base(idx) == base:
-                base_frames.append(frm)
-            frm = frm.frame_last
-        nfrm = len(base_frames)
-        if nfrm == 0: return None
-        if nfrm > 1:
-            print(f"WARNING: There are mutiple players on base {base}")
-        return base_frames[0]
+        frm = self.inning_base_frame(base, idx)
+        if frm is None or frm.__index_start >= self.__index_start: return None
+        return frm
 
+Frame.register_standard_actions()
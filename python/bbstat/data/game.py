@@ -1,8 +1,60 @@
+import gc
+import sys
+import types
+import numpy
 from collections import OrderedDict
+from collections import namedtuple
 from bbstat import Counter
+from bbstat import CounterHistory
 from bbstat import Lineup
+from bbstat import InningState
 from bbstat import Frame
 from bbstat import GameStats
+from bbstat import AtBatResult
+from bbstat import EventTable
+
+class GameState(namedtuple('GameState', 'idx inning half outs bases batter pitcher vruns hruns offense defense')):
+    '''
+    State of a game at a counter index.
+      idx - Counter index
+      inning - Current or last inning, 0 before the game starts
+      half - 'top', 'bottom' or 'none' between half innings
+      outs - Outs in the half inning
+      bases - Player numbers on bases 1-3, None for an empty base
+      batter, pitcher - Player numbers or None
+      vruns, hruns - Runs scored by the visiting and home teams
+      offense - Map of player numbers indexed by batting position for the team at bat
+      defense - Map of player numbers indexed by field position for the team in the field
+    '''
+
+    __slots__ = ()
+
+    def score(self):
+        '''Return the score as string 'NV-NH'.'''
+        return f"{self.vruns}-{self.hruns}"
+
+def reachable_bytes(roots, stop=(), seen=None):
+    '''
+    Return the number of bytes held by the objects reachable from roots.
+    The walk does not enter objects of the types in stop other than the roots,
+    classes, modules, functions or objects whose ids are in set seen.
+    The ids of the objects counted are added to seen.
+    '''
+    shared = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+    if seen is None: seen = set()
+    rootids = {id(obj) for obj in roots}
+    nbyte = 0
+    objs = list(roots)
+    while len(objs):
+        obj = objs.pop()
+        if id(obj) in seen: continue
+        if id(obj) not in rootids:
+            if isinstance(obj, shared) or isinstance(obj, stop): continue
+            if isinstance(obj, int) and -5 <= obj <= 256: continue
+        seen.add(id(obj))
+        nbyte += sys.getsizeof(obj)
+        objs.extend(gc.get_referents(obj))
+    return nbyte
 
 class HalfGame:
     '''
@@ -10,11 +62,21 @@ class HalfGame:
       initial frames indexed by inning number.
     '''
 
-    def __init__(self, counter, team_bat, team_field, olup, dlup, ostats, dstats):
+    __slots__ = ('__counter', '__team_bat', '__team_field', '__olup', '__dlup', '__frames',
+                 '__last_frames', '__frame', '__active', '__inning_runs', '__states',
+                 'ostats', 'dstats', '__nerror', 'ipos', '__keep_frames', '__last_batter',
+                 '__keep_events', '__events')
+
+    def __init__(self, counter, team_bat, team_field, olup, dlup, ostats, dstats, keep_frames=True,
+                 keep_events=False):
         '''
           team: Team name
           olup: Shared batting lineup for this team
           dlup: Shared defensive lineup for the opposing team
+          keep_frames: If false, the frames for each inning are dropped when the
+                       inning ends leaving only the stats, runs and errors.
+          keep_events: If true and the frames are dropped, the event rows for each
+                       inning are recorded before its frames are dropped.
         '''
         myname = 'HalfGame.ctor'
         dbg = 0
@@ -24,12 +86,18 @@ class HalfGame:
         self.__olup = olup       # Batting lineup.
         self.__dlup = dlup       # Defensive lineup
         self.__frames = {}       # Initial frames indexed by inning (one per batter)
+        self.__last_frames = {}  # Last frames indexed by inning
         self.__frame = None      # Current or last frame.
         self.__active = False    # True if we are in an active inning.
         self.__inning_runs = {}  # Runs indexed by inning
+        self.__states = {}       # InningState indexed by inning
         self.ostats = ostats
         self.dstats = dstats
         self.__nerror = 0
+        self.__keep_frames = keep_frames
+        self.__last_batter = None  # (lineup position, left at bat) for the last frame of the last inning
+        self.__keep_events = keep_events
+        self.__events = {}         # Event arrays indexed by inning for innings whose frames are dropped
 
     def counter(self):
         '''Return the indexer.'''
@@ -39,6 +107,21 @@ class HalfGame:
         '''Return the error count.'''
         return self.__nerror
 
+    def keeps_frames(self):
+        '''Return if the frames are kept after their inning ends.'''
+        return self.__keep_frames
+
+    def has_events(self):
+        '''Return if the event rows are available for all innings.'''
+        return self.__keep_frames or self.__keep_events
+
+    def frames(self):
+        '''Return the list of frames held for all innings.'''
+        frms = []
+        for ing in self.innings():
+            frms += self.inning_frames(ing)
+        return frms
+
     def team(self):
         '''Return the batting team name.'''
         return self.__team_bat
@@ -58,7 +141,7 @@ class HalfGame:
     def lineup_map(self, idx=None):
         '''Return the map of player numbers indexed by batting position.'''
         if self.__olup is None: return {}
-        return self.__olup.get(idx)
+        return self.__olup.get_lineup(idx)
         
     def defensive_lineup(self):
         '''Return the defense lineup.'''
@@ -67,7 +150,7 @@ class HalfGame:
     def defense(self, idx=None):
         '''Return the map of player numbers indexed by field position.'''
         if self.__dlup is None: return {}
-        return self.__dlup.get(idx)
+        return self.__dlup.get_lineup(idx)
         
     def is_valid(self, verbose=True):
         '''Return if this is a valid half game.'''
@@ -94,36 +177,73 @@ class HalfGame:
         '''Return the the current inning if active or last inning.'''
         return len(self.__frames)
 
+    def iter_inning(self, a_inning=None, idx=None):
+        '''
+        Iterate over the frames for an inning started by index idx.
+        Index None means all current frames.
+        '''
+        inning = self.inning() if a_inning is None else a_inning
+        frm = self.__frames.get(inning)
+        if frm is None: return
+        if idx is None or frm.index_start() <= idx: yield frm
+        else: return
+        yield from frm.iter_following(idx)
+
     def inning_frames(self, a_inning=None):
         '''Return the (ordered) array of frames for an inning.'''
-        if a_inning == None: inning = self.inning()
-        if inning not in self.__frames: return []
-        return self.__frames[inning].inning_frames()
+        return list(self.iter_inning(a_inning))
+
+    def first_frame(self, ing):
+        '''Return the first frame for inning ing.'''
+        return self.__frames.get(ing)
 
     def frame(self):
         '''Return the frame for the current or last batter.'''
-        if len(self.__frames) == 0: return None
-        return self.inning_frames()[-1]
+        return self.__last_frames.get(self.inning())
 
     def last_frame(self, ing):
         '''Return the last frame for inning ing.'''
-        if ing not in self.__frames: return None
-        return self.__frames[ing].following_frames()[-1]
+        return self.__last_frames.get(ing)
 
-    def inning_runs(ing):
+    def inning_state(self, ing=None):
+        '''Return the InningState for inning ing or the current inning.'''
+        if ing is None: ing = self.inning()
+        return self.__states.get(ing)
+
+    def inning_runs(self, ing):
         '''Return the number of runs scored in inning ing.'''
-        if ing not in self.__inning_runs: return 0
-        return self.__inning_runs[ing]
+        if ing not in self.__states: return 0
+        return self.__states[ing].runs()
+
+    def line_score(self):
+        '''Return the list of runs scored in each inning including any in progress.'''
+        return [self.__states[ing].runs() for ing in self.innings()]
 
     def runs(self):
         '''Return the total number of runs scored.'''
         nrun = 0
-        for irun in self.__inning_runs.values():
-            nrun += irun
-        if self.inning() > len(self.__inning_runs):
-            nrun += self.frame().inning_runs()
+        for state in self.__states.values():
+            nrun += state.runs()
         return nrun
 
+    def inning_events(self, ing=None):
+        '''
+        Return the structured array of events for inning ing or the current
+        inning (see EventTable). These are found from the frames or, if the
+        frames are not kept, recorded when the inning ends. The array is empty
+        for an inning whose frames were dropped without recording its events.
+        '''
+        if ing is None: ing = self.inning()
+        if ing in self.__events: return self.__events[ing]
+        if ing not in self.__states: return numpy.zeros(0, dtype=EventTable.dtype)
+        return EventTable.inning_rows(self.inning_frames(ing), self.__states[ing], self.__dlup,
+                                      self.ostats, self.dstats, ing)
+
+    def events(self):
+        '''Return the structured array of events for all innings.'''
+        return numpy.concatenate([numpy.zeros(0, dtype=EventTable.dtype)] +
+                                 [self.inning_events(ing) for ing in self.innings()])
+
     def start_inning(self):
         '''Start a new inning and return that inning number.'''
         myname = 'HalfGame.start_inning'
@@ -139,6 +259,7 @@ class HalfGame:
         if dbg: print(f"{myname}: Starting {self.team()} inning {ing}")
         assert( ing not in self.__frames )
         self.__frames[ing] = None
+        self.__states[ing] = InningState()
         assert( self.inning() == ing )
         return ing
 
@@ -158,7 +279,7 @@ class HalfGame:
         ing = len(self.__frames)
         assert( self.inning_frames() == self.frame().inning_frames() )
         nout = 0
-        for frm in self.inning_frames():
+        for frm in self.iter_inning():
             idesc = f"{self.team()} inning {ing}"
             fdesc = f"{idesc} frame {frm.lineup_position()} player {frm.player()}"
             if frm.is_active():
@@ -174,7 +295,15 @@ class HalfGame:
         # Collect the runs.
         assert( ing == self.inning() )
         assert( ing not in self.__inning_runs )
-        self.__inning_runs[ing] = self.frame().inning_runs()
+        self.__inning_runs[ing] = self.__states[ing].runs()
+        self.__states[ing].end(self.counter().get())
+        lastfrm = self.frame()
+        self.__last_batter = (lastfrm.lineup_position(), lastfrm.left_atbat())
+        if not self.__keep_frames:
+            if self.__keep_events: self.__events[ing] = self.inning_events(ing)
+            self.__frames[ing] = None
+            del self.__last_frames[ing]
+            self.__states[ing].drop_frames()
         self.counter().next()
         self.__active = False
         self.__frame = None
@@ -195,32 +324,30 @@ class HalfGame:
         # First batter of the inning.
         if self.__frame is None:
             assert( self.__frames[ing] is None )
-            lasting = ing - 1
-            lastfrm = self.last_frame(lasting)
-            if lastfrm is None:
+            if self.__last_batter is None:
                 ipos = 1
                 assert(not isxir)
-            elif lastfrm.left_atbat() or isxir:
-                ipos = lastfrm.lineup_position()
+            else:
+                lastpos, left_atbat = self.__last_batter
+                if left_atbat or isxir: ipos = lastpos
         # Not the first batter of the inning.
         else:
             assert(not isxir)
-            lastfrm = self.frame()
+            lastpos = self.frame().lineup_position()
         if ipos is None:
-            lastpos = lastfrm.lineup_position()
             ipos = lastpos % self.lineup().length() + 1
         player = self.lineup().get_player(ipos)
         if player is None:
             print(f"{myname}: WARNING: No player found for position {ipos}")
             self.lineup().display()
             assert(False)
-        lastfrm_ing = None if self.__frame is None else lastfrm
-        frm = Frame(self, ipos, player, self.ostats, self.dstats, lastfrm_ing)
+        frm = Frame(self, ipos, player, self.ostats, self.dstats, self.__frame)
         if isxir:
             frm.advance_base()
             frm.advance_base()
         self.__frame = frm
         if self.__frames[ing] is None: self.__frames[ing] = frm
+        self.__last_frames[ing] = frm
         self.ipos = ipos
         return frm
 
@@ -237,9 +364,13 @@ class Game:
        counter - index counter
     Lineups may be arrays of player numbers or the number of players.
     Defaults are for all are 9.
+    If keep_frames is false, the frames for each half inning are dropped when
+    it ends so the game holds only the stats, line score and errors. The
+    event rows are then also kept if keep_events is true.
     '''
 
-    def __init__(self, atts, vname, hname, vbat=9, vdef=9, hbat=9, hdef=9, counter=None):
+    def __init__(self, atts, vname, hname, vbat=9, vdef=9, hbat=9, hdef=9, counter=None, keep_frames=True,
+                 keep_events=False):
         self.__counter = Counter() if counter is None else counter
         self.title    = '' if 'title'    not in atts else atts['title']
         self.date     = '' if 'date'     not in atts else atts['date']
@@ -250,14 +381,19 @@ class Game:
         self.vdlup = Lineup(f"{vname} defense", self.counter(), 9)
         self.hstats = GameStats(self.holup, self.hdlup, hname)
         self.vstats = GameStats(self.volup, self.vdlup, vname)
-        self.home    = HalfGame(self.counter(), hname, vname, self.holup, self.vdlup, self.hstats, self.vstats)
-        self.visitor = HalfGame(self.counter(), vname, hname, self.volup, self.hdlup, self.vstats, self.hstats)
+        self.home    = HalfGame(self.counter(), hname, vname, self.holup, self.vdlup, self.hstats, self.vstats,
+                                keep_frames, keep_events)
+        self.visitor = HalfGame(self.counter(), vname, hname, self.volup, self.hdlup, self.vstats, self.hstats,
+                                keep_frames, keep_events)
         self.__index = 0
         self.__homebat = None    # current if active or last if not.
         self.__active = False
         self.__call_reason = ''   # Reason if game is called MERCY, TIME, ...
         self.expected_inning_count = 7
         self.error = 0            # Set nonzero to indicate any error
+        # Half inning starts and ends indexed by counter index.
+        # Values are (half game at bat or None, inning, visitor runs, home runs).
+        self.__timeline = CounterHistory()
 
     def counter(self):
         '''Return the indexer.'''
@@ -343,6 +479,7 @@ class Game:
         atbat = self.atbat()
         frame = atbat.start_inning()
         assert(atbat.is_active())
+        self.__timeline.set(self.index(), (atbat, frame, self.visitor.runs(), self.home.runs()))
         return frame
 
     def end_half_inning(self, reason=None, index=None):
@@ -352,8 +489,10 @@ class Game:
         if not self.is_active():
             print(f"{myname}: ERROR: Half inning is not in progress.")
             return None
-        self.atbat().end_inning(reason)
+        atbat = self.atbat()
+        atbat.end_inning(reason)
         self.__active = False
+        self.__timeline.set(self.index(), (None, atbat.inning(), self.visitor.runs(), self.home.runs()))
         if dbg: print(f"{myname}: Score is {self.score()}")
 
     def next_batter(self):
@@ -394,3 +533,73 @@ class Game:
     def call_reason(self):
         '''Return the reason why game was called.'''
         return self.__call_reason
+
+    def state_at(self, idx=None):
+        '''
+        Return the GameState at counter index idx or the current state if idx is None.
+        The half inning is found in the game timeline and the rest from the
+        histories of its inning state, frames and lineups, so a query is O(log n).
+        Bases and batter are None for innings whose frames were dropped.
+        '''
+        if idx is None: idx = self.index()
+        ent = self.__timeline.find(idx)
+        if ent is None:
+            return GameState(idx, 0, 'none', 0, (None, None, None), None, None, 0, 0, {}, {})
+        half, inning, vruns, hruns = ent
+        if half is None:
+            return GameState(idx, inning, 'none', 0, (None, None, None), None, None, vruns, hruns, {}, {})
+        state = half.inning_state(inning)
+        if half is self.home: hruns += state.runs(idx)
+        else: vruns += state.runs(idx)
+        players = []
+        for base in range(4):
+            frm = state.base_frame(base, idx)
+            players.append(None if frm is None else frm.player(idx))
+        hlab = 'bottom' if half is self.home else 'top'
+        return GameState(idx, inning, hlab, state.outs(idx), tuple(players[1:]), players[0],
+                         half.defensive_lineup().get_player(1, idx), vruns, hruns,
+                         half.lineup_map(idx), half.defense(idx))
+
+    def has_events(self):
+        '''Return if the event rows are available for the whole game.'''
+        return self.visitor.has_events()
+
+    def events(self, game=0):
+        '''
+        Return the EventTable of plate appearances and on-base events in
+        counter order with game number game. The teams are recorded for that
+        game number.
+        '''
+        vevts = self.visitor.events()
+        hevts = self.home.events()
+        hevts['half'] = 1
+        evts = numpy.concatenate([vevts, hevts])
+        evts = evts[numpy.argsort(evts['idx'], kind='stable')]
+        evts['game'] = game
+        teams = game*[('', '')] + [(self.visitor.team(), self.home.team())]
+        return EventTable(evts, teams=teams)
+
+    def memory_footprint(self):
+        '''
+        Return a dictionary of the bytes held by the game broken down by
+          stats - the two GameStats including their tables
+          lineups - the batting and defensive lineups
+          frames - the frames held by the half games
+          halfgames - the half games and their inning states
+          game - the game itself and its counter
+        and the sum of these as total. Objects shared by more than one part,
+        e.g. at-bat results and classes, are not counted.
+        '''
+        halves = [self.visitor, self.home]
+        parts = [('stats', [self.vstats, self.hstats]),
+                 ('lineups', [self.volup, self.vdlup, self.holup, self.hdlup]),
+                 ('frames', [frm for half in halves for frm in half.frames()]),
+                 ('halfgames', halves + [half.inning_state(ing) for half in halves for ing in half.innings()]),
+                 ('game', [self, self.counter()])]
+        stop = (Game, HalfGame, Frame, InningState, GameStats, Lineup, Counter, AtBatResult)
+        seen = set()
+        res = {}
+        for name, roots in parts:
+            res[name] = reachable_bytes(roots, stop, seen)
+        res['total'] = sum(res.values())
+        return res
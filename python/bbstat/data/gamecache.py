@@ -0,0 +1,94 @@
+# gamecache.py
+'''
+On-disk cache of parsed game results.
+'''
+
+import hashlib
+import os
+import pickle
+import tempfile
+import bbstat
+
+class GameCache:
+    '''
+    Directory holding the GameSummary and reader output for parsed game files.
+    Entries are keyed by a hash of the bbstat version and the file content so
+    any edit to the file or upgrade of bbstat invalidates them.
+      dirnam - Cache directory. It is created if needed.
+    The numbers of hits and misses for get are counted.
+    '''
+
+    def __init__(self, dirnam):
+        self.__dirnam = dirnam
+        os.makedirs(dirnam, exist_ok=True)
+        self.__nhit = 0
+        self.__nmiss = 0
+
+    def dirnam(self):
+        '''Return the cache directory.'''
+        return self.__dirnam
+
+    def nhit(self):
+        '''Return the number of cache hits.'''
+        return self.__nhit
+
+    def nmiss(self):
+        '''Return the number of cache misses.'''
+        return self.__nmiss
+
+    def counts(self):
+        '''Return a dictionary of the hit and miss counts.'''
+        return {'hit': self.__nhit, 'miss': self.__nmiss}
+
+    @staticmethod
+    def key(fnam):
+        '''Return the cache key for a game file.'''
+        hsh = hashlib.sha256(f"bbstat {bbstat.version}\n".encode())
+        with open(fnam, 'rb') as fin:
+            hsh.update(fin.read())
+        return hsh.hexdigest()
+
+    def path(self, key):
+        '''Return the path of the cache entry for a key.'''
+        return os.path.join(self.__dirnam, key + '.pkl')
+
+    def get_with_log(self, fnam, events=False):
+        '''
+        Return (summary, log) for a game file or None if it is not cached.
+        Unreadable files and entries are misses. If events is true, an entry
+        whose summary does not hold the game's events is also a miss.
+        '''
+        try:
+            with open(self.path(GameCache.key(fnam)), 'rb') as fin:
+                summ, log = pickle.load(fin)
+        except Exception:
+            self.__nmiss += 1
+            return None
+        if events and getattr(summ, 'events', None) is None:
+            self.__nmiss += 1
+            return None
+        summ.fnam = fnam
+        self.__nhit += 1
+        return summ, log
+
+    def get(self, fnam, events=False):
+        '''Return the cached GameSummary for a game file or None. See get_with_log.'''
+        entry = self.get_with_log(fnam, events)
+        if entry is None: return None
+        return entry[0]
+
+    def put(self, fnam, summ, log=''):
+        '''
+        Store the GameSummary and reader output for a game file.
+        The entry is written to a temporary file and renamed so concurrent
+        readers never see a partial entry.
+        '''
+        path = self.path(GameCache.key(fnam))
+        fd, tmpnam = tempfile.mkstemp(dir=self.__dirnam, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as fout:
+                pickle.dump((summ, log), fout, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmpnam, path)
+        except Exception:
+            os.remove(tmpnam)
+            raise
@@ -0,0 +1,52 @@
+# gamesummary.py
+'''
+Compact summary of a parsed game.
+It holds no frames or lineups so it is cheap to pickle and can be
+returned from worker processes.
+'''
+
+class GameSummary:
+    '''
+    Results of a parsed game.
+      fnam - Name of the file the game was read from
+      title, date, location - Header attributes
+      visitor, home - Team names
+      score - Final score 'NV-NH'
+      vline, hline - Runs in each inning for the visiting and home teams
+      call_reason - Reason the game was called or ''
+      nerr - Reader error count
+      error - Game error flag
+      nerror_game, nerror_stats - Game error counts
+      vstats, hstats - Detached GameStats for the visiting and home teams
+      events - EventTable for the game if events is true and the game has
+               its event rows. Otherwise None.
+    '''
+
+    def __init__(self, game, nerr=0, fnam='', events=False):
+        self.fnam = fnam
+        self.title = game.title
+        self.date = game.date
+        self.location = game.location
+        self.visitor = game.visitor.team()
+        self.home = game.home.team()
+        self.score = game.score()
+        self.vline = game.visitor.line_score()
+        self.hline = game.home.line_score()
+        self.call_reason = game.call_reason()
+        self.nerr = nerr
+        self.error = game.error
+        self.nerror_game = game.nerror_game()
+        self.nerror_stats = game.nerror_stats()
+        self.vstats = game.vstats.detached()
+        self.hstats = game.hstats.detached()
+        self.events = game.events() if events and game.has_events() else None
+
+    def nerror(self):
+        '''Return the total number of errors in reading and evaluating the game.'''
+        return self.nerr + self.nerror_game + self.nerror_stats
+
+    def teamstats(self, team='Wildcats'):
+        '''Return the stats for a team or None if the team did not play.'''
+        if self.home == team: return self.hstats
+        if self.visitor == team: return self.vstats
+        return None
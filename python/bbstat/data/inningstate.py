@@ -0,0 +1,133 @@
+# inningstate.py
+'''
+State of a half inning for bbstat.
+'''
+
+from bbstat import CounterHistory
+
+class InningState:
+    '''
+    Base occupancy, outs and runs for one half inning.
+    The frames update the state when they start, advance, score, are
+    put out or are left at the end of the inning, so queries for the
+    current state are O(1). Histories indexed by counter index give the
+    state at any earlier index in O(log n).
+      base 0 - frame at bat
+      base 1-3 - frame on base
+    A base may be held by more than one frame for a while because the
+    advances of the runners ahead of a batter are recorded later, when the
+    next batter refers to their tags. Runners cannot pass one another, so
+    the earlier frames on a shared base are lead runners whose advances are
+    still to be recorded. Each base holds a list of its occupants in frame
+    order and the last, i.e. the trailing runner who holds the base, is
+    reported. This is the occupant found by scanning the frames in order
+    for the last with that base at the index.
+    '''
+
+    __slots__ = ('__bases', '__base_hists', '__out_frames', '__out_idxs', '__nout_hist',
+                 '__nrun', '__nrun_hist', '__index_end')
+
+    def __init__(self):
+        self.__bases = [[] for ibas in range(4)]                   # Frames at bat and on each base
+        self.__base_hists = [CounterHistory() for ibas in range(4)]  # Histories of __bases
+        self.__out_frames = {}          # Frames making outs indexed by out number
+        self.__out_idxs = {}            # Counter index of each out
+        self.__nout_hist = CounterHistory()
+        self.__nrun = 0
+        self.__nrun_hist = CounterHistory()
+        self.__index_end = None         # Counter index when the half inning ended
+
+    def base_frame(self, base, idx=None):
+        '''
+        Return the frame at bat (base 0) or on base 1-3 for index idx.
+        None means the current state. Returns None if the base is empty.
+        '''
+        if idx is None:
+            frms = self.__bases[base]
+            return frms[-1] if len(frms) else None
+        return self.__base_hists[base].find(idx)
+
+    def outs(self, idx=None):
+        '''Return the number of outs made at index idx.'''
+        if idx is None: return len(self.__out_frames)
+        nout = self.__nout_hist.find(idx)
+        return 0 if nout is None else nout
+
+    def out_frame(self, out, idx=None):
+        '''Return the frame making out out or None if it was not made by index idx.'''
+        if out not in self.__out_frames: return None
+        if idx is not None and self.__out_idxs[out] > idx: return None
+        return self.__out_frames[out]
+
+    def out_frame_map(self, idx=None):
+        '''Return a dictionary of frames making outs indexed by out number.'''
+        outs = {}
+        for out, frm in self.__out_frames.items():
+            if idx is None or self.__out_idxs[out] <= idx:
+                outs[out] = frm
+        return outs
+
+    def index_end(self):
+        '''Return the counter index when the half inning ended or None if it is in progress.'''
+        return self.__index_end
+
+    def end(self, idx):
+        '''Record that the half inning ended at counter index idx.'''
+        self.__index_end = idx
+
+    def runs(self, idx=None):
+        '''Return the number of runs scored at index idx.'''
+        if idx is None: return self.__nrun
+        nrun = self.__nrun_hist.find(idx)
+        return 0 if nrun is None else nrun
+
+    def __record_base(self, base, idx):
+        self.__base_hists[base].set(idx, self.base_frame(base))
+
+    def leave(self, frm, base, idx):
+        '''Remove frame frm from base base if it is an occupant.'''
+        if base >= 4: return
+        frms = self.__bases[base]
+        for ifrm in range(len(frms)):
+            if frms[ifrm] is frm:
+                del frms[ifrm]
+                self.__record_base(base, idx)
+                return
+
+    def move(self, frm, oldbase, newbase, idx):
+        '''
+        Move frame frm from base oldbase to base newbase at index idx.
+        Use oldbase None for a new frame. Base 4 or more is a run.
+        '''
+        if oldbase is not None: self.leave(frm, oldbase, idx)
+        if newbase >= 4:
+            self.__nrun += 1
+            self.__nrun_hist.set(idx, self.__nrun)
+        else:
+            frms = self.__bases[newbase]
+            ifrm = len(frms)
+            while ifrm > 0 and frms[ifrm-1].index_start() > frm.index_start(): ifrm -= 1
+            frms.insert(ifrm, frm)
+            self.__record_base(newbase, idx)
+
+    def set_out(self, frm, base, out, idx):
+        '''
+        Record frame frm on base base making out number out at index idx.
+        Returns nonzero if the out is already made or not the next out.
+        '''
+        if out in self.__out_frames or out != len(self.__out_frames) + 1:
+            return 1
+        self.leave(frm, base, idx)
+        self.__out_frames[out] = frm
+        self.__out_idxs[out] = idx
+        self.__nout_hist.set(idx, out)
+        return 0
+
+    def drop_frames(self):
+        '''
+        Release the frames held by the state, e.g. when the inning is closed and
+        its frames are dropped. The outs and runs and their histories are kept.
+        '''
+        self.__bases = [[] for ibas in range(4)]
+        self.__base_hists = [CounterHistory() for ibas in range(4)]
+        self.__out_frames = {out: None for out in self.__out_frames}
@@ -0,0 +1,253 @@
+# instrument.py
+'''
+Opt-in call counts and timing for the parsing and stats hot paths.
+'''
+
+import sys
+import time
+import bbstat
+
+def line_type(line):
+    '''Return the type of a line of a game description as seen by GameParser.'''
+    line = line.strip()
+    if len(line) == 0: return 'blank'
+    if line[0:6] == 'PITCH#': return 'pitch'
+    if line[0:4] == 'DLUP': return 'dlup'
+    if line[0:6] == 'SCORE:': return 'score'
+    if line[0:5] == 'OUTS:': return 'outs'
+    if line[0:7] == 'Inning ': return 'inning'
+    if line in ['MERCY', 'TIME', 'WALKOFF', 'END']: return 'end'
+    if line[0:1].isdigit(): return 'batter'
+    return 'header'
+
+def action_kind(frm, action, *args, **kwargs):
+    return bbstat.Frame.tokenize(action).kind if len(action) else 'empty'
+
+def result_label(res, labc):
+    return labc.split(':')[0]
+
+def lookup_type(dic, *args, **kwargs):
+    return 'history' if isinstance(dic, bbstat.CounterHistory) else type(dic).__name__
+
+def feed_line_type(prs, line):
+    return line_type(line)
+
+def bat_stat_name(gst, num, name, *args, **kwargs):
+    return 'bat.' + name
+
+def pitch_stat_name(gst, name, *args, **kwargs):
+    return 'pitch.' + name
+
+class Instrument:
+    '''
+    Call counts and cumulative times for the hot paths of reading games.
+    Nothing is recorded and there is no overhead until enable is called:
+    enable replaces the instrumented methods with timing wrappers and
+    disable puts the original methods back. Only one instrument may be
+    enabled at a time. It may also be used as a context manager:
+      with Instrument() as ins:
+          Reader(fnam)
+      ins.report()
+    Each operation is recorded with a kind, e.g. the line type for
+    reader.line or the action kind for frame.add_action. The time for a
+    call includes that of the calls it makes and calls nested in another
+    call of the same operation, e.g. the actions carried out for a tag
+    reference, are not counted separately.
+      operations - If not None, the list of operations to instrument, e.g.
+                   ['frame.add_action']. Other methods are left as they are
+                   so they add no overhead to the recorded times.
+    '''
+
+    active = None       # The enabled instrument
+
+    # Instrumented operations: (operation, class name, method name, kind).
+    # The kind is a string or a function of the call arguments.
+    targets = [
+        ('reader.line',        'GameParser',     'feed',                      feed_line_type),
+        ('frame.add_action',   'Frame',          'add_action',                action_kind),
+        ('atbatresult.get',    'AtBatResult',    'get',                       result_label),
+        ('atbatresult.init',   'AtBatResult',    '__init__',                  result_label),
+        ('counter.find',       'Counter',        'find_with_key',             lookup_type),
+        ('counter.find',       'CounterHistory', 'find_with_key',             'history'),
+        ('gamestats.increment', 'GameStats',     'increment_player_bat_stat', bat_stat_name),
+        ('gamestats.increment', 'GameStats',     'increment_pitch_stat',      pitch_stat_name),
+        ('gamestats.merge',    'GameStats',      'merge',                     'merge'),
+    ]
+
+    def __init__(self, operations=None):
+        myname = 'Instrument.init'
+        known = [oper for oper, clsnam, metnam, kind in Instrument.targets]
+        for oper in operations or []:
+            if oper not in known: print(f"{myname}: WARNING: Unknown operation: {oper}")
+        self.__targets = [tgt for tgt in Instrument.targets if operations is None or tgt[0] in operations]
+        self.__counts = {}      # Call counts indexed by (operation, kind)
+        self.__times = {}       # Cumulative seconds indexed by (operation, kind)
+        self.__originals = []   # (class, method name, original attribute) while enabled
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *exc):
+        self.disable()
+        return False
+
+    def enabled(self):
+        '''Return if this instrument is recording.'''
+        return len(self.__originals) > 0
+
+    def reset(self):
+        '''Clear the recorded counts and times.'''
+        self.__counts.clear()
+        self.__times.clear()
+
+    def __wrap(self, oper, fun, kind, depths):
+        '''Return a timing wrapper for function fun.'''
+        counts = self.__counts
+        times = self.__times
+        clock = time.perf_counter
+        def timed(*args, **kwargs):
+            if depths[oper]: return fun(*args, **kwargs)
+            key = (oper, kind if isinstance(kind, str) else kind(*args, **kwargs))
+            depths[oper] += 1
+            tsta = clock()
+            try:
+                return fun(*args, **kwargs)
+            finally:
+                times[key] = times.get(key, 0.0) + clock() - tsta
+                counts[key] = counts.get(key, 0) + 1
+                depths[oper] -= 1
+        timed.__name__ = fun.__name__
+        timed.__doc__ = fun.__doc__
+        return timed
+
+    def enable(self):
+        '''
+        Start recording by installing the timing wrappers.
+        Returns 0 for success or 1 if another instrument is enabled.
+        '''
+        myname = 'Instrument.enable'
+        if Instrument.active is self: return 0
+        if Instrument.active is not None:
+            print(f"{myname}: ERROR: Another instrument is enabled.")
+            return 1
+        depths = {oper: 0 for oper, clsnam, metnam, kind in self.__targets}
+        for oper, clsnam, metnam, kind in self.__targets:
+            cls = getattr(bbstat, clsnam)
+            orig = cls.__dict__[metnam]
+            if isinstance(orig, (staticmethod, classmethod)):
+                wrapped = type(orig)(self.__wrap(oper, orig.__func__, kind, depths))
+            else:
+                wrapped = self.__wrap(oper, orig, kind, depths)
+            self.__originals.append((cls, metnam, orig))
+            setattr(cls, metnam, wrapped)
+        Instrument.active = self
+        return 0
+
+    def disable(self):
+        '''Stop recording and restore the original methods.'''
+        for cls, metnam, orig in reversed(self.__originals):
+            setattr(cls, metnam, orig)
+        self.__originals.clear()
+        if Instrument.active is self: Instrument.active = None
+
+    def results(self):
+        '''
+        Return the recorded results as a dictionary indexed by operation and
+        then kind holding dictionaries with the call count and the time in seconds.
+        '''
+        res = {}
+        for oper, kind in sorted(self.__counts):
+            res.setdefault(oper, {})[kind] = {'count': self.__counts[(oper, kind)],
+                                              'seconds': self.__times[(oper, kind)]}
+        return res
+
+    def table(self):
+        '''Return the results as a printable table.'''
+        lines = [f"{'operation':<20} {'kind':<16} {'count':>9} {'total ms':>10} {'us/call':>9}"]
+        for oper, kinds in self.results().items():
+            for kind, val in kinds.items():
+                nsec = val['seconds']
+                ncal = val['count']
+                lines.append(f"{oper:<20} {kind:<16} {ncal:>9} {1.e3*nsec:>10.3f} {1.e6*nsec/ncal:>9.2f}")
+        return '\n'.join(lines)
+
+    def report(self, fout=None):
+        '''Print the results table.'''
+        print(self.table(), file=fout)
+
+    @staticmethod
+    def prometheus_label(val):
+        '''Return a string escaped for use as a Prometheus label value.'''
+        return str(val).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    def prometheus(self, prefix='bbstat'):
+        '''Return the results in the Prometheus text exposition format.'''
+        res = self.results()
+        lines = []
+        for name, field, text in [('calls_total', 'count', 'Number of instrumented calls.'),
+                                  ('seconds_total', 'seconds', 'Time spent in instrumented calls.')]:
+            metric = f"{prefix}_{name}"
+            lines.append(f"# HELP {metric} {text}")
+            lines.append(f"# TYPE {metric} counter")
+            for oper, kinds in res.items():
+                for kind, val in kinds.items():
+                    labels = f'operation="{oper}",kind="{Instrument.prometheus_label(kind)}"'
+                    lines.append(f"{metric}{{{labels}}} {val[field]!r}")
+        return '\n'.join(lines) + '\n'
+
+def main_profile():
+    '''
+    Read games with the instrumentation enabled and report the results.
+    Usage: bbstat-profile GAME [GAME ...] [format=table|prom|dict] [out=FILE] [repeat=1]
+      GAME is a game file or glob pattern
+      format - table, Prometheus text (prom) or python dictionary (dict)
+      out - Write the results to this file instead of the terminal
+      repeat - Number of times each game is read
+    '''
+    import contextlib
+    import io
+    import pprint
+    from bbstat.data.season import expand_game_files
+    fnams = []
+    fmt = 'table'
+    out = None
+    repeat = 1
+    for arg in sys.argv[1:]:
+        if arg[0:7] == 'format=': fmt = arg[7:]
+        elif arg[0:4] == 'out=': out = arg[4:]
+        elif arg[0:7] == 'repeat=': repeat = int(arg[7:])
+        elif '=' not in arg: fnams.append(arg)
+        else:
+            print(f"Invalid argument: {arg}")
+            return 1
+    if len(fnams) == 0 or fmt not in ['table', 'prom', 'dict']:
+        print(main_profile.__doc__)
+        return 1
+    fnams = expand_game_files(fnams)
+    nerr = 0
+    log = io.StringIO()
+    with Instrument() as ins:
+        with contextlib.redirect_stdout(log):
+            for irep in range(repeat):
+                for fnam in fnams:
+                    try:
+                        rdr = bbstat.Reader(fnam)
+                    except OSError as exc:
+                        print(exc)
+                        nerr += 1
+                        continue
+                    if rdr.game() is None or rdr.nerr: nerr += 1
+    if fmt == 'table': text = ins.table() + '\n'
+    elif fmt == 'prom': text = ins.prometheus()
+    else: text = pprint.pformat(ins.results()) + '\n'
+    if out is None:
+        print(text, end='')
+    else:
+        with open(out, 'w') as fout:
+            fout.write(text)
+        print(f"Results written to {out}")
+    if nerr:
+        print(f"Errors reading {nerr} game files:")
+        print(log.getvalue().rstrip())
+    return 1 if nerr else 0
@@ -4,14 +4,17 @@
 # May 2022
 '''
 Lineup for bbstat.
-Each position (can be battting or defense) is a map so the
+Each position (can be battting or defense) is a CounterHistory so the
 lineup can be returned for any index.
 '''
 
 from bbstat import Counter
+from bbstat import CounterHistory
 
 class Lineup:
 
+    __slots__ = ('__title', '__counter', '__data')
+
     @classmethod
     def decode(cls, line):
         '''
@@ -73,11 +76,11 @@ class Lineup:
             pass
         elif type(lineup) is int:
             for ival in range(lineup):
-                self.__data.append({})
+                self.__data.append(CounterHistory())
         else:
             idx = self.__counter.get()
             for ival in range(len(lineup)):
-                self.__data.append({idx:lineup[ival]})
+                self.__data.append(CounterHistory(idx, lineup[ival]))
 
     def __str__(self):
         sout = f"Lineup {self.title()}"
@@ -93,6 +96,10 @@ class Lineup:
     def title(self):
         return self.__title
 
+    def counter(self):
+        '''Return the shared counter.'''
+        return self.__counter
+
     def length(self):
         '''Return the current number of players in the lineup.'''
         return len(self.__data)
@@ -106,7 +113,7 @@ class Lineup:
         kpos = ipos - 1
         if kpos < 0: return None
         if kpos >= self.length(): return None
-        return Counter.find(self.__data[kpos], idx)
+        return self.__data[kpos].find(idx)
 
     def get_lineup(self, idx=None):
         '''
@@ -116,7 +123,7 @@ class Lineup:
         '''
         lineup = {}
         for kpos in range(self.length()):
-            lineup[kpos+1], key = Counter.find_with_key(self.__data[kpos], idx)
+            lineup[kpos+1] = self.__data[kpos].find(idx)
         return lineup
 
     def has_position(self, pos, idx=None):
@@ -157,10 +164,10 @@ class Lineup:
                 print(f"{myname}: Cannot add player {player} to position {ipos}")
                 return 1
             while self.length() <= kpos:
-                self.__data.append({})
+                self.__data.append(CounterHistory())
         if not reset and self.get_player(ipos, idx) == player:
              return 0
-        self.__data[kpos][idx] = player
+        self.__data[kpos].set(idx, player)
 
     def set_from_string(self, line):
         '''
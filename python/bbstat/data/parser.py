@@ -0,0 +1,285 @@
+# parser.py
+
+import bbstat
+
+class GameParser:
+    '''
+    Incremental parser for the text description of a game.
+    Lines are passed one at a time with feed or from any iterable,
+    e.g. an open file, a generator or a socket reader, with feed_lines.
+    Only the current line is held so input of any length can be parsed.
+    Parsing stops at the first line that fails and later lines are ignored.
+    '''
+
+    def __init__(self, name='', dbg=0, keep_frames=True, keep_events=False):
+        '''
+        name - Name of the input, e.g. the file name.
+        dbg - Debug level.
+        keep_frames - If false, the frames for each half inning are dropped
+                      when it ends so memory stays bounded for large inputs.
+        keep_events - If true, the event rows for each half inning are kept
+                      when its frames are dropped and the summary includes them.
+        '''
+        self.__name = name        # Name of the input
+        self.__game = None        # Game description
+        self.__dbg = dbg
+        self.__keep_frames = keep_frames
+        self.__keep_events = keep_events
+        self.__stopped = False    # True after a line fails
+        self.nerr = 0
+        # Parser state.
+        self.__ilin = 0           # Number of lines received
+        self.__inning = 0
+        self.__athome = True
+        self.__frm = None         # Current frame
+        self.__atbat = None       # Current batting half game
+        self.__in_inning = False
+        self.__nbat_inning = 0    # Number of batters in the inning
+        self.__gameatts = {}
+        self.__home = None
+        self.__visi = None
+        self.__vbat = 9
+        self.__hbat = 9
+
+    def name(self):
+        '''Return the name of the input.'''
+        return self.__name
+
+    def game(self):
+        return self.__game
+
+    def nline(self):
+        '''Return the number of lines received.'''
+        return self.__ilin
+
+    def stopped(self):
+        '''Return if parsing was stopped by a failed line.'''
+        return self.__stopped
+
+    def summary(self):
+        '''Return the GameSummary for the game or None if there is no game.'''
+        if self.game() is None: return None
+        return bbstat.GameSummary(self.game(), self.nerr, self.__name, self.__keep_events)
+
+    def feed_lines(self, lines):
+        '''
+        Parse each line from an iterable.
+        Returns 0 on success or nonzero if parsing was stopped.
+        '''
+        for line in lines:
+            if self.feed(line): return 1
+        return 0
+
+    def feed(self, line):
+        '''
+        Parse one line of a game description.
+        Returns 0 on success or nonzero if the line failed or parsing
+        was already stopped.
+        '''
+        if self.__stopped: return 1
+        if self.__parse_line(line):
+            self.__stopped = True
+            return 1
+        return 0
+
+    def __parse_line(self, line):
+        '''Parse one line and return nonzero for failure.'''
+        myname = 'GameParser.feed'
+        dbg = self.__dbg
+        self.__ilin += 1
+        ilin = self.__ilin
+        line = line.strip()
+        if len(line) == 0: return 0
+        if dbg: print(f"{myname}: {ilin:3d}: {line}")
+        # Pitching substitution.
+        if line[0:6] == 'PITCH#':
+            pspec = '1#' + line[6:]
+            dlup = self.game().atbat().defensive_lineup()
+            nerr, nset = dlup.set_from_string(pspec)
+            if nerr: return 1
+        # Adjust defensive lineup.
+        elif line[0:4] == 'DLUP':
+            word = line[4:]
+            dlup = self.game().atbat().defensive_lineup()
+            nerr, nset = dlup.set_from_string(word)
+            pfx = 'ERROR: ' if nerr else ''
+            if dbg or nerr:
+                print(f"{myname}: {pfx}Set {nset} defensive positions with {nerr} errors..")
+                if dbg > 1: print(f"{myname}: {dlup}")
+            if nerr: return 1
+        # Score check.
+        elif line[0:6] == 'SCORE:':
+            chk_score = line[6:]
+            gam_score = self.game().score()
+            if chk_score != gam_score:
+                print(f"{myname}: ERROR Expected and game scores differ: {chk_score} != {gam_score}")
+                self.nerr += 1
+                self.game().error += 1
+                return 1
+        # Inning outs check.
+        elif line[0:5] == 'OUTS:':
+            if self.__frm.add_action(line):
+                self.game().error = 11
+                return 1
+        # Start a new inning.
+        elif line[0:7] == 'Inning ':
+            # Start game if needed.
+            if self.game() is None:
+                if self.__home is None or self.__visi is None:
+                    print(f"{myname}: ERROR: Home and Visitor must precede the first inning. Line {ilin}: {line}")
+                    self.nerr += 1
+                    return 1
+                self.__game = bbstat.Game(self.__gameatts, self.__visi, self.__home,
+                                          self.__vbat, 9, self.__hbat, 9,
+                                          keep_frames=self.__keep_frames,
+                                          keep_events=self.__keep_events)
+            # End the previous inning.
+            if self.__in_inning:
+                assert( self.__atbat is not None )
+                self.game().end_half_inning()
+            # Start this inning.
+            old_inning = self.__inning
+            old_athome = self.__athome
+            self.__nbat_inning = 0
+            shin = line[7:]
+            inning = int(shin[0:-1])
+            self.__inning = inning
+            svh = shin[-1]
+            if svh in 'hb': athome = True
+            elif svh in 'vt': athome = False
+            else:
+                print(f"{myname}: ERROR: Invalid inning specification {shin} on line {ilin}: {line}")
+                self.nerr += 1
+                return 1
+            self.__athome = athome
+            if athome:
+                sathome = 'home'
+                if old_athome:
+                    print(f"{myname}: ERROR: At home specifier must follow visiting. Line {ilin}: {line}")
+                    self.nerr += 1
+                    return 1
+                if old_inning != inning:
+                    print(f"{myname}: ERROR: Home inning mus match preceding visiting. Line {ilin}: {line}")
+                    self.nerr += 1
+                    return 1
+            else:
+                sathome = 'visiting'
+                if not old_athome:
+                    print(f"{myname}: ERROR: Visiting specifier must follow at home. Line {ilin}: {line}")
+                    self.nerr += 1
+                    return 1
+                if inning != old_inning + 1:
+                    print(f"{myname}: ERROR: Visiting inning must increment. Line {ilin}: {line}")
+                    self.nerr += 1
+                    return 1
+                if dbg>1: print(f"{myname}: Starting inning {inning} for the {sathome} team.")
+            # Start game inning if not already done.
+            if not self.game().is_active():
+                ing = self.game().start_half_inning()
+                msg = ''
+                if ing < 1: msg = "Unable to start half inning."
+                if len(msg):
+                    print(f"{myname}: ERROR: {msg} Line {ilin}: {line}")
+                    self.nerr += 1
+                    return 1
+            assert( self.game().is_active() )
+            self.__in_inning = True
+
+        # End the game (including current inning).
+        elif line in ['MERCY', 'TIME', 'WALKOFF']:
+            if self.game().is_active():
+                self.game().end_half_inning(line)
+            else:
+                print(f"{myname}: Cannot end game during inning for reason {line}")
+                self.nerr += 1
+                return 1
+            self.game().call(line)
+        # End the game (including current inning).
+        elif line == 'END':
+            self.game().end_half_inning()
+        # New batter.
+        elif self.__in_inning and line[0:1].isdigit():
+            words = line.split()
+            # First word is the batting position number.
+            atbat = self.game().atbat()
+            self.__atbat = atbat
+            word = words[0]
+            words = words[1:]
+            ibat = int(word[0:-1])
+            if ibat <= 0 or word[-1] != '.':
+                print(f"{myname}: ERROR: Invalid play line {ilin}: {line}")
+                self.nerr += 1
+                return 1
+            # Check if the next word is a player spec. If so, we need to set that
+            # before starting the at bat and, if needed, the inning.
+            word = words[0] if len(words) else 'SKIP'
+            if word[0] == '#':
+                words = words[1:]
+                word = word[1:]
+                # If there is '(', then append words until we have the closing ')'.
+                if word.find('(') != -1:
+                    while word[-1] != ')':
+                        if len(words) == 0:
+                            print(f"{myname}: ERROR: Invalid player spec. Line {ilin}: {line}")
+                            self.nerr += 1
+                            return 1
+                        word = word + ' ' + words[0]
+                        words = words[1:]
+                pwords = word.split('(')
+                player = int(pwords[0])
+                name = ''
+                if len(pwords) > 1:
+                    name = word[1:].split('(')[1].split(')')[0]
+                atbat.lineup().set(ibat, player, add=True)
+                assert( atbat.ostats.have_batter(player, name, add=True) )
+                if dbg > 1: atbat.lineup().display()
+            # Start the next frame.
+            isxir = len(words) and words[0] == 'XIR'
+            if isxir: words = words[1:]
+            frm = atbat.start_batter(isxir=isxir)
+            self.__frm = frm
+            if ibat != frm.lineup_position():
+                print(f"{myname}: ERROR: Inconsistent position: {ibat} != {frm.lineup_position()}")
+                print(f"{myname}: INFO: isxir = {isxir}, word = {words[0]}")
+                self.nerr += 1
+                #self.game.error += 1
+                return 1
+            # Remaining words are actions to be handled by the frame.
+            assert( frm is not None )
+            for word in words:
+                sta = frm.add_action(word)
+                if sta:
+                    ipos = frm.lineup_position()
+                    hv = self.game().atbat_label()
+                    self.nerr += 1
+                    self.game().error += 1
+                    print(f"{myname}: ERROR: Inning {self.game().inning()} {hv} frame {ipos}" \
+                          f" action {word} failed.")
+                    return 1
+                assert( sta == 0 )
+
+        # Configuring game in header.
+        elif not self.__in_inning and self.game() is None:
+            if line[0:5] == 'Date:':
+                self.__gameatts['date'] = line[5:].strip()
+            elif line[0:5] == 'Home:':
+                self.__home = line[5:].strip()
+            elif line[0:8] == 'Visitor:':
+                self.__visi = line[9:].strip()
+            elif line[0:5] == 'VBAT:':
+                self.__vbat = int(line[5:].strip())
+            elif line[0:6] == 'Title:':
+                self.__gameatts['title'] = line[6:].strip()
+            elif line[0:9] == 'Location:':
+                self.__gameatts['location'] = line[9:].strip()
+            elif line[0:5] == 'HBAT:':
+                self.__hbat = int(line[5:].strip())
+            else:
+                print(f"{myname}: ERROR: Invalid header line {ilin}: {line}")
+                self.nerr += 1
+                return 1
+        else:
+            print(f"{myname}: ERROR: Invalid line {ilin}: {line}")
+            self.nerr += 1
+            return 1
+        return 0
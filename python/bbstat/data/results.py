@@ -1,8 +1,18 @@
 # results.py
 
+import sys
+
 class AtBatResult:
-    """Describes the results of an at-bat."""
-    
+    """
+    Describes the results of an at-bat.
+    Results are immutable. Use get to obtain the shared result for a label.
+    """
+
+    cache_size = 1024      # Maximum number of results held for get
+    __cache = {}           # Shared results indexed by label:cause string
+    __labels = {}          # Result attributes indexed by legal label
+    __defaults = {'valid': True, 'pitchs': '', 'base': None, 'batter_out': 0, 'outs': 0,
+                  'putouts': None, 'assists': None, 'errors': (), 'is_sacrifice_fly': False}
 
     @staticmethod
     def pitch_types():
@@ -25,6 +35,30 @@ class AtBatResult:
         except:
             return 0
 
+    @classmethod
+    def get(cls, labc):
+        """
+        Return the shared result for labc, creating it if needed.
+        Repeated labels return the same object.
+        At most cache_size results are held. The oldest is dropped when full.
+        """
+        res = cls.__cache.get(labc)
+        if res is None:
+            res = cls(labc)
+            if len(cls.__cache) >= cls.cache_size:
+                del cls.__cache[next(iter(cls.__cache))]
+            cls.__cache[sys.intern(labc)] = res
+        return res
+
+    @classmethod
+    def clear_cache(cls):
+        """Drop all the shared results."""
+        cls.__cache.clear()
+
+    @classmethod
+    def labels(cls):
+        """Return the list of legal labels (without the excellent suffix '!')."""
+        return list(cls.__labels.keys())
 
     def __init__(self, labc):
         """
@@ -44,7 +78,8 @@ class AtBatResult:
         Dropped 3rd strike options:
           WP:KD, E2:KD, 2-3:KD 
         Consequences are derived from the label, e.g. "HBP" or "6-3"
-        Consequences are returned as member data:
+        Consequences are looked up in a table of legal labels built at import
+        and are returned as member data:
           pitchs - allowed last pitchs (client may check this)
           base - Base reached by batter: 0 for none (out)
           batter_out - True if batter is out
@@ -52,6 +87,7 @@ class AtBatResult:
           putouts - position numbers making putouts
           assists - postion numbers awarded assists
           errors - position numbers assigned errors
+          (putouts, assists and errors are tuples)
           excellent - true if first contact was excellent
           is_k - True if batter struck out whether or not reached base.
           is_fc - True if batter reached on fielder's choice.
@@ -64,110 +100,105 @@ class AtBatResult:
         words = labc.split(':')
         assert( len(words) > 0 )
         lab = words[0]
-        self.label = lab
+        dat = self.__dict__
+        dat['label'] = lab
         if lab[-1] == '!':
-            self.excellent = True
+            dat['excellent'] = True
             lab = lab [0:-1]
         else:
-            self.excellent = False
-        self.causes = ['AB'] if len(words) < 2 else words[1:]
-        self.valid = True
-        self.pitchs = ''
-        self.base = None
-        self.batter_out = 0
-        self.putouts = None
-        assists = None
-        self.errors = []
-        self.is_sacrifice_fly = False
-        self.is_k = lab[0]=='K' or self.causes[0]=='K'
-        self.is_fc = lab=='FC'
-        self.is_error = lab[0]=='E'
-        self.is_walk = lab=='BB' or lab=="IBB"
-        self.is_hbp = lab=='HBP'
-        if   lab == '1B': self.hit_base = 1
-        elif lab == '2B': self.hit_base = 2
-        elif lab == '3B': self.hit_base = 3
-        elif lab == 'HR': self.hit_base = 4
-        else:             self.hit_base = 0
-        len2 = len(lab) == 2
-        len3 = len(lab) == 3
-        len5 = len(lab) == 5
-        len6 = len(lab) == 6
-        len7 = len(lab) == 7
-        pos = []   # Position number for each character in lab
-        isd = []   # True if char is '-'
-        for val in lab:
-            pos.append(AtBatResult.getpos(val))
-            isd.append(val == '-')
-        dash = []   # True if char is '-'
-        #print(f"XXXXX: lab is {lab}, len3 is {len3}, pos is {pos}")
-        for val in lab:
-            dash.append(val=='-')
-        # Batter safe
-        if   lab == 'BB': self.__set('b')
-        elif lab == 'IBB': self.__set('bs')
-        elif lab == 'WP': self.__set('bs')  # Batter may reach on dropped 3rd strike
-        elif lab == 'PP': self.__set('bs')
-        elif lab =='HBP': self.__set('b')
-        elif lab == 'KD': self.__set('s')     # Dropped 3rd strike
-        elif lab == 'CI': self.__set('s')
-        elif lab == '1B': self.__set('s')
-        elif lab == '2B': self.__set('s', 2)
-        elif lab == '3B': self.__set('s', 3)
-        elif lab == 'HR': self.__set('s', 4)
-        elif lab == 'FC':
-            self.__set('s', 1)
-        elif len2 and lab[0] == 'E' and pos[1]:
-            self.__set('s', 1)
-            self.errors=([pos[1]])
-        # Batter out
-        elif lab =='OUT': self.__set_out('s')
-        elif lab == 'KS': self.__set_out('s') 
-        elif lab == 'KC': self.__set_out('c')
-        elif lab == 'KL': self.__set_out('c')
-        elif lab == 'BI': self.__set_out('s')
-        elif lab == 'IF': self.__set_out('s')      # Infield fly
-        elif lab ==  'K': self.__set_out('cs')
-        elif lab =='K23': self.__set_out('cs', [3], [2])
-        elif lab =='KC23': self.__set_out('c', [3], [2])
-        elif lab =='KS23': self.__set_out('s', [3], [2])
-        elif lab =='K2U': self.__set_out('cs', [2])
-        elif lab =='KC2U': self.__set_out('c', [2])
-        elif lab =='KS2U': self.__set_out('s', [2])
-        elif len2 and lab[0] == 'L' and pos[1]:        # L7
-            self.__set_out('s', [pos[1]])
-        elif len2 and lab[0] == 'F' and pos[1]:        # F7
-            self.__set_out('s', [pos[1]])
-        elif len3 and lab[0:2] == 'FF' and pos[2]:     # FF7
-            self.__set_out('s', [pos[2]])
-        elif len3 and lab[0:2] == 'SF' and pos[2]:     # SF7
-            self.__set_out('s', [pos[2]], sacfly=True)
-        elif len3 and lab[0:2] == 'FO' and pos[2]:     # FO7
-            self.__set_out('s', [pos[2]])
-        elif len2 and lab[1] in ['u', 'U'] and pos[0]:        # 3U
-            self.__set_out('s', [pos[0]])
-        elif len3 and pos[0] and isd[1] and pos[2]:    # 6-3
-            self.__set_out('s', [pos[2]], [pos[0]])
-        elif len5 and pos[0] and isd[1] and pos[2] and isd[3] and pos[4]:   # 6-4-3
-            self.__set_out('s', [pos[4]], [pos[0]], pos[2])
+            dat['excellent'] = False
+        causes = ('AB',) if len(words) < 2 else tuple(words[1:])
+        dat['causes'] = causes
+        dat.update(AtBatResult.__defaults)
+        attrs = AtBatResult.__labels.get(lab)
+        if attrs is None:
+            dat['valid'] = False
         else:
-            self.valid = False
+            dat.update(attrs)
+        dat['is_k'] = lab[0]=='K' or causes[0]=='K'
+        dat['is_fc'] = lab=='FC'
+        dat['is_error'] = lab[0]=='E'
+        dat['is_walk'] = lab=='BB' or lab=="IBB"
+        dat['is_hbp'] = lab=='HBP'
+        if   lab == '1B': dat['hit_base'] = 1
+        elif lab == '2B': dat['hit_base'] = 2
+        elif lab == '3B': dat['hit_base'] = 3
+        elif lab == 'HR': dat['hit_base'] = 4
+        else:             dat['hit_base'] = 0
+
+    def __setattr__(self, name, val):
+        raise AttributeError(f"AtBatResult is immutable: cannot set {name}")
 
-    def __set(self, pitchs, base=1):
-        """Set state with defaults for runner reaching base."""
-        self.batter_out = False
-        self.pitchs = pitchs
-        self.base = base
+    @staticmethod
+    def __set(pitchs, base=1):
+        """Return state with defaults for runner reaching base."""
+        return {'batter_out': False, 'pitchs': pitchs, 'base': base}
+
+    @staticmethod
+    def __set_out(pitchs, putouts=(), assists=(), outs=1, base=None, \
+                errors=(), sacfly=False):
+        """Return state for batter out."""
+        return {'batter_out': True, 'pitchs': pitchs, 'base': base, 'outs': outs,
+                'putouts': tuple(putouts), 'assists': tuple(assists),
+                'errors': tuple(errors), 'is_sacrifice_fly': sacfly}
+
+    @classmethod
+    def build_label_table(cls):
+        """
+        Build the table of result attributes for every legal label.
+        Where patterns overlap, the first entry is kept.
+        """
+        tab = {}
+        add = tab.setdefault
+        bset = cls.__set
+        bout = cls.__set_out
+        poss = range(1, 10)
+        # Batter safe
+        add('BB', bset('b'))
+        add('IBB', bset('bs'))
+        add('WP', bset('bs'))   # Batter may reach on dropped 3rd strike
+        add('PP', bset('bs'))
+        add('HBP', bset('b'))
+        add('KD', bset('s'))    # Dropped 3rd strike
+        add('CI', bset('s'))
+        add('1B', bset('s'))
+        add('2B', bset('s', 2))
+        add('3B', bset('s', 3))
+        add('HR', bset('s', 4))
+        add('FC', bset('s', 1))
+        for ipos in poss:                             # E6
+            add(f"E{ipos}", dict(bset('s', 1), errors=(ipos,)))
+        # Batter out
+        add('OUT', bout('s'))
+        add('KS', bout('s'))
+        add('KC', bout('c'))
+        add('KL', bout('c'))
+        add('BI', bout('s'))
+        add('IF', bout('s'))   # Infield fly
+        add('K', bout('cs'))
+        add('K23', bout('cs', [3], [2]))
+        add('KC23', bout('c', [3], [2]))
+        add('KS23', bout('s', [3], [2]))
+        add('K2U', bout('cs', [2]))
+        add('KC2U', bout('c', [2]))
+        add('KS2U', bout('s', [2]))
+        for ipos in poss:
+            add(f"L{ipos}", bout('s', [ipos]))        # L7
+            add(f"F{ipos}", bout('s', [ipos]))        # F7
+            add(f"FF{ipos}", bout('s', [ipos]))       # FF7
+            add(f"SF{ipos}", bout('s', [ipos], sacfly=True))   # SF7
+            add(f"FO{ipos}", bout('s', [ipos]))       # FO7
+        for ipos in poss:                             # 3U
+            add(f"{ipos}u", bout('s', [ipos]))
+            add(f"{ipos}U", bout('s', [ipos]))
+        for ipos in poss:                             # 6-3
+            for jpos in poss:
+                add(f"{ipos}-{jpos}", bout('s', [jpos], [ipos]))
+        for ipos in poss:                             # 6-4-3
+            for jpos in poss:
+                for kpos in poss:
+                    add(f"{ipos}-{jpos}-{kpos}", bout('s', [kpos], [ipos], jpos))
+        cls.__labels = tab
+        return tab
 
-    def __set_out(self, pitchs, putouts=[], assists=[], outs=1, base=None, \
-                errors=[], sacfly=False):
-        """Set state for batter out."""
-        self.batter_out = True
-        self.pitchs = pitchs
-        self.base = base
-        self.outs = outs
-        self.putouts = putouts 
-        self.assists = assists
-        self.errors = errors
-        self.is_sacrifice_fly = sacfly
-           
+AtBatResult.build_label_table()
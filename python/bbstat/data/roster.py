@@ -5,6 +5,7 @@
 
 import pandas
 import traceback
+from bbstat import ExcelCache
 
 class Roster:
 
@@ -15,16 +16,24 @@ class Roster:
     self.__data = pandas.DataFrame(columns=Roster.cols)
     self.__data.set_index(Roster.index, inplace=True)
 
-  def set_from_excel(self, fin, dbg=0):
-    '''Set roster from an excel file'''
+  def set_from_excel(self, fin, dbg=0, cache=None):
+    '''
+    Set roster from an excel file.
+    If cache is an ExcelCache or cache directory name, the sheet is read
+    through that cache.
+    '''
     myname = 'set_from_excel'
     print(f"Setting roster from {fin}")
     shnam = 'roster'
     inam = Roster.index
     cols = [inam] + Roster.cols
+    opts = dict(header=0, index_col=inam, usecols=cols, converters={'first':str, 'last':str})
+    xcache = ExcelCache.get_cache(cache)
     try:
-      self.__data = pandas.read_excel(fin, sheet_name=shnam, header=0, index_col=inam,
-                                      usecols=cols, converters={'first':str, 'last':str})
+      if xcache is None:
+        self.__data = pandas.read_excel(fin, sheet_name=shnam, **opts)
+      else:
+        self.__data = xcache.read(fin, shnam, dbg, **opts)
     except:
       traceback.print_exc()
       self.__data = pandas.DataFrame()
@@ -0,0 +1,232 @@
+# season.py
+'''
+Reads many game files, optionally in a pool of worker processes.
+'''
+
+import concurrent.futures
+import contextlib
+import glob
+import io
+import os
+import sys
+import traceback
+from bbstat import Reader
+from bbstat import GameSummary
+from bbstat import GameStats
+from bbstat import GameCache
+from bbstat import EventTable
+
+def expand_game_files(fnams):
+    '''
+    Return the list of game files for a file name, glob pattern or
+    list of either. Matches for each pattern are sorted. Names that
+    match nothing are kept so they are reported as errors.
+    '''
+    if isinstance(fnams, str): fnams = [fnams]
+    out = []
+    for pat in fnams:
+        matches = sorted(glob.glob(pat))
+        if len(matches): out += matches
+        else: out.append(pat)
+    return out
+
+def read_game_summary(fnam, dbg=0, events=False):
+    '''
+    Read a game file and return (summary, log).
+    The summary is None if the game could not be read. Only the summary is
+    kept so the reader drops the frames of each half inning as it ends.
+    If events is true, the summary includes the game's EventTable.
+    Everything the reader prints is captured in the log.
+    '''
+    log = io.StringIO()
+    summ = None
+    try:
+        with contextlib.redirect_stdout(log):
+            rdr = Reader(fnam, dbg, keep_frames=False, keep_events=events)
+            game = rdr.game()
+            if game is None:
+                print(f"ERROR: No game found in {fnam}")
+            else:
+                summ = GameSummary(game, rdr.nerr, fnam, events)
+    except Exception:
+        log.write(traceback.format_exc())
+    return summ, log.getvalue()
+
+class SeasonReader:
+    '''
+    Reads the text descriptions of many games.
+      fnams - File name, glob pattern or list of either
+      jobs - Number of worker processes: 1 reads in this process,
+             None or 0 uses one per CPU
+      cache - GameCache or cache directory name. Cached files are not
+              read again and newly read files are added to the cache.
+      events - If true, the summaries include the EventTable for each game.
+               Cached entries without these are read again.
+    Each worker returns a GameSummary so only the stat tables are sent back.
+    Summaries are kept in file order so sums do not depend on the order
+    in which the workers finish.
+    Files that fail or have errors are recorded in errors() with the
+    reader output for that file.
+    '''
+
+    def __init__(self, fnams, jobs=1, dbg=0, cache=None, events=False):
+        self.__fnams = expand_game_files(fnams)
+        self.__jobs = jobs if jobs else os.cpu_count()
+        self.__cache = GameCache(cache) if isinstance(cache, str) else cache
+        self.__summaries = []    # GameSummary for each good file in file order
+        self.__errors = {}       # Reader log indexed by file name for bad files
+        self.__logs = {}         # Reader log indexed by file name
+        self.__events = events
+        # Find the cached results.
+        outs = {}
+        if self.__cache is not None:
+            for fnam in self.__fnams:
+                entry = self.__cache.get_with_log(fnam, events)
+                if entry is not None: outs[fnam] = entry
+        # Read the other files.
+        rnams = [fnam for fnam in self.__fnams if fnam not in outs]
+        njob = min(self.__jobs, len(rnams))
+        dbgs = len(rnams)*[dbg]
+        evtss = len(rnams)*[events]
+        if njob > 1:
+            chunk = max(1, len(rnams)//(4*njob))
+            with concurrent.futures.ProcessPoolExecutor(max_workers=njob) as pool:
+                routs = list(pool.map(read_game_summary, rnams, dbgs, evtss, chunksize=chunk))
+        else:
+            routs = map(read_game_summary, rnams, dbgs, evtss)
+        for fnam, (summ, log) in zip(rnams, routs):
+            outs[fnam] = (summ, log)
+            if self.__cache is not None and summ is not None:
+                self.__cache.put(fnam, summ, log)
+        # Collect the results in file order.
+        for fnam in self.__fnams:
+            summ, log = outs[fnam]
+            self.__logs[fnam] = log
+            if summ is None or summ.error or summ.nerror():
+                if len(log) == 0:
+                    if summ is None: log = "ERROR: Game could not be read."
+                    else: log = f"ERROR: Game has {summ.nerror()} errors. Reader output was not cached."
+                self.__errors[fnam] = log
+            if summ is not None:
+                self.__summaries.append(summ)
+
+    def fnams(self):
+        '''Return the list of game files.'''
+        return self.__fnams
+
+    def jobs(self):
+        '''Return the number of worker processes requested.'''
+        return self.__jobs
+
+    def cache(self):
+        '''Return the GameCache or None.'''
+        return self.__cache
+
+    def summaries(self):
+        '''Return the game summaries in file order.'''
+        return self.__summaries
+
+    def errors(self):
+        '''Return the reader output indexed by file name for files with errors.'''
+        return self.__errors
+
+    def log(self, fnam):
+        '''Return the reader output for a file.'''
+        return self.__logs.get(fnam, '')
+
+    def events(self):
+        '''
+        Return the EventTable for all the games.
+        The game number is the position of the game in summaries(), the
+        game names are the file names and the teams are taken from the
+        summaries. Returns None if the games were read without events.
+        '''
+        myname = 'SeasonReader.events'
+        if not self.__events:
+            print(f"{myname}: ERROR: Games were read without events.")
+            return None
+        arrs = []
+        for igam, summ in enumerate(self.__summaries):
+            if summ.events is None: continue
+            evts = summ.events.values().copy()
+            evts['game'] = igam
+            arrs.append(evts)
+        evts = EventTable.concatenate(arrs)
+        return EventTable(evts.values(), [summ.fnam for summ in self.__summaries],
+                          [(summ.visitor, summ.home) for summ in self.__summaries])
+
+    def teamstats(self, team='Wildcats', roster=None, dbg=0):
+        '''
+        Return the summed stats for a team.
+        Every player appearing for the team is included along with,
+        if roster is not None, every player in the roster.
+        Games are added in file order.
+        '''
+        gsum = GameStats(name=team, roster=roster, fill=True)
+        for summ in self.__summaries:
+            gstats = summ.teamstats(team)
+            if gstats is not None: gsum.add(gstats, dbg)
+        return gsum
+
+def main_season():
+    '''
+    Usage: bbstat-season GAMES [opt1 opt2 ...]
+      GAMES is a game file, glob pattern or comma-separated list of either
+      opts include
+        jobs=N - Number of worker processes (0 for one per CPU)
+        team=NAME - Team to sum (default Wildcats)
+        roster=FILE - Excel roster file
+        cache=DIR - Directory for cached game results
+        minpa=N - Set minpa for bat stats to N
+        events=FILE - Save the table of plate appearances and on-base events
+                      for all games to a .npy or .npz file
+    '''
+    import pandas
+    from bbstat import Roster
+    from bbstat import BatStats
+    from bbstat import PitchStats
+    pandas.options.display.width = 0
+    line = '----------------------------'
+    if len(sys.argv) < 2:
+        print(main_season.__doc__)
+        return 1
+    fnams = sys.argv[1].split(',')
+    jobs = 0
+    team = 'Wildcats'
+    ros = None
+    minpa = 20
+    cache = None
+    evtfile = None
+    for opt in sys.argv[2:]:
+        if   opt[0:5] == 'jobs=': jobs = int(opt[5:])
+        elif opt[0:5] == 'team=': team = opt[5:]
+        elif opt[0:7] == 'roster=':
+            ros = Roster()
+            ros.set_from_excel(opt[7:])
+        elif opt[0:6] == 'minpa=': minpa = int(opt[6:])
+        elif opt[0:6] == 'cache=': cache = opt[6:]
+        elif opt[0:7] == 'events=': evtfile = opt[7:]
+        else:
+            print(f"Invalid option: {opt}")
+            return 1
+    srdr = SeasonReader(fnams, jobs, cache=cache, events=evtfile is not None)
+    print(f"Read {len(srdr.summaries())} of {len(srdr.fnams())} games with {srdr.jobs()} jobs.")
+    if srdr.cache() is not None:
+        print(f"Cache {srdr.cache().dirnam()}: {srdr.cache().counts()}")
+    for fnam, log in srdr.errors().items():
+        print(line, 'Errors for', fnam)
+        print(log.rstrip())
+    gstat_sum = srdr.teamstats(team, ros)
+    print(line)
+    bstats = BatStats(gstat_sum, minpa=minpa)
+    bstats.report()
+    print(line)
+    pstats = PitchStats(gstat_sum, mininn=5)
+    pstats.report()
+    print(line)
+    print(f"Games with errors: {list(srdr.errors().keys())}")
+    if evtfile is not None:
+        evts = srdr.events()
+        evts.save(evtfile)
+        print(f"Saved {len(evts)} events to {evtfile}")
+    return 0
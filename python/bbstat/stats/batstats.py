@@ -3,6 +3,7 @@
 # Class to evalaute derived batting stats.
 #
 
+import numpy
 import pandas
 import traceback
 
@@ -11,9 +12,28 @@ def krat(num, den):
   if int(den) == 0: return 0.0
   return int(round(1000*num/den))
 
+def krat_array(num, den):
+  '''
+  Evaluate krat for whole columns num and den.
+  Zero denominators give 0. The ratios are rounded half to even like round
+  so the values are identical to krat. As for krat applied row by row, the
+  result is float if any denominator is zero and int otherwise.
+  '''
+  num = numpy.asarray(num, dtype=numpy.int64)
+  den = numpy.asarray(den, dtype=numpy.int64)
+  zero = den == 0
+  rat = numpy.zeros(len(den))
+  numpy.divide(1000*num, den, out=rat, where=~zero)
+  rat = numpy.rint(rat)
+  if zero.any(): return rat
+  return rat.astype(numpy.int64)
+
 class BatStats:
   '''Compile and return batting stats.
     atb - at-bats
+    avg, obp, slg, ops - batting average, on-base, slugging and their sum (x1000)
+    kpct, bbpct - strikeouts and walks per plate appearance (x1000)
+  All rates are evaluated for whole columns with krat_array.
   '''
 
   @classmethod
@@ -22,30 +42,38 @@ class BatStats:
     row.loc['hit2'] = row['b1'] + row['b2'] + row.b3 + row.hr
     return row
 
+  @staticmethod
+  def add_derived(s):
+    '''Add the derived columns to DataFrame s of batting stats and return it.'''
+    s['hit'] = s.b1 + s.b2 + s.b3 + s.hr
+    s['atb'] = s.pa - s.bb - s.hbp - s.sf - s.sac
+    s['avg'] = krat_array(s.hit, s.atb)
+    s['slg'] = krat_array(s.b1 + 2*s.b2 + 3*s.b3 + 4*s.hr, s.atb)
+    s['obp'] = krat_array(s.hit + s.bb + s.hbp, s.atb + s.bb + s.hbp + s.sf)
+    s['ops'] = s.obp + s.slg
+    s['kpct'] = krat_array(s.k, s.pa)
+    s['bbpct'] = krat_array(s.bb, s.pa)
+    return s
+
   def __init__(self):
     bat_index = 'num'
     names = 'hit atb'
     self.stats = None
 
-  def __init__(self, gstats, minpa=1, add_rname=False):
+  def __init__(self, gstats, minpa=1, add_rname=False, dbg=0):
     myname = 'BatStats.init'
     s = gstats.bat_stats().copy()
-    print(f"{myname}: Roster: {gstats.roster()}")
+    if dbg: print(f"{myname}: Roster: {gstats.roster()}")
     if add_rname:
       if gstats.roster() is not None:
         s.insert(0, 'rname', gstats.roster().get()['first'])
       else:
         print(f"{myname}: WARNING: No roster found.")
-    s['hit'] = s.b1 + s.b2 + s.b3 + s.hr
-    s['atb'] = s.pa - s.bb - s.hbp - s.sf - s.sac
     #s['avg'] = 0
     #s.loc[s['atb']>0,'avg'] = round(1000*s.hit/s.atb).astype(int)
     #s.loc['avg2'] = krat(s.hit, s.atb)
-    print(s)
-    s.loc[:,'avg'] = s.apply(lambda x: krat(x.hit, x.atb), axis=1)
-    s.loc[:,'slg'] = s.apply(lambda x: krat(x.b1 + 2*x.b2 + 3*x.b3 + 4*x.hr, x.atb), axis=1)
-    s.loc[:,'obp'] = s.apply(lambda x: krat(x.hit + x.bb + x.hbp, x.atb + x.bb + x.hbp + x.sf), axis=1)
-    s.loc[:,'ops'] = s.obp + s.slg
+    BatStats.add_derived(s)
+    if dbg > 1: print(s)
     #for idx, row in s.iterrows():
     #  BatStats.update_row(row)
     s = s.query(f"pa>{minpa}")
@@ -82,7 +110,7 @@ class BatStats:
     # Max name length.
     lnam = 0
     for nam in self.stats.loc[:,'name'].values:
-      if len(nam) > lnam: lnam = len(nam)
+      if nam and len(nam) > lnam: lnam = len(nam)
     # Build the header and separator line
     wnam = lnam + 1
     header = ''
@@ -106,7 +134,7 @@ class BatStats:
       line = ''
       for fie in self.report_fields:
         if fie == 'Name':
-          line += f"{x['name']:>{wnam}}"
+          line += f"{x['name'] or '':>{wnam}}"
         elif fie == '|':
           line += ' |'
         else:
@@ -3,12 +3,20 @@
 # Class to hols the stats for one game.
 #
 
-import pandas
+import os
 import traceback
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import ThreadPoolExecutor
+from bbstat import StatTable
+from bbstat import StatLog
+from bbstat import ExcelCache
 
 class GameStats:
   '''
   Class to manage batting, pitching and defensive stats.
+  Batting and pitching stats are held in StatTable integer matrices so
+  increments are cheap. The DataFrames returned by bat_stats() and
+  pitch_stats() are built from these when requested.
   Source batting stats:
     pa = Plate appearnces
     k = strike outs (need not reult in an out)
@@ -102,17 +110,21 @@ class GameStats:
     self.dlup = dlup
     self.__roster = roster
     # Create batting stats
-    self.__batstats = pandas.DataFrame(columns=GameStats.idx_bat_names, dtype=int)
-    self.__batstats.name.astype(str)
+    self.__batstats = StatTable(GameStats.bat_names)
     self.batstats_last = None
-    self.__batstats.set_index(GameStats.num_index, inplace=True)
     # Create pitching stats
-    self.__pitstats = pandas.DataFrame(columns=GameStats.idx_pit_names, dtype=int)
-    self.__pitstats.name.astype(str)
+    self.__pitstats = StatTable(GameStats.pit_names)
     self.pitstats_last = None
-    self.__pitstats.set_index(GameStats.num_index, inplace=True)
     # Create fielding stats
     self.__fldstats = None
+    # Logs of the increments for as_of. These need the counter from a lineup.
+    lup = olup if olup is not None else dlup
+    self.__counter = None if lup is None else lup.counter()
+    self.__batlog = None
+    self.__pitlog = None
+    if self.__counter is not None:
+      self.__batlog = StatLog(len(GameStats.bat_names))
+      self.__pitlog = StatLog(len(GameStats.pit_names))
     # Error counter.
     self.__nerror = 0
     if fill and self.roster() is not None:
@@ -122,61 +134,58 @@ class GameStats:
         rosdf = self.roster().get().copy()
         rosdf['name'] = rosdf['first']+ ' ' + rosdf['last']
         rosdf.drop(['first', 'last'], axis=1, inplace=True)
-        batdf = rosdf.copy()
-        for nam in GameStats.bat_names:
-            batdf[nam] = int(0)
-        self.__batstats = batdf
-        pitdf = rosdf.copy()
-        for nam in GameStats.pit_names:
-            pitdf[nam] = int(0)
-        self.__pitstats = pitdf
+        self.__batstats.set_dataframe(rosdf)
+        self.__pitstats.set_dataframe(rosdf)
     if len(xfile):
       self.add_from_excel(xfile)
 
-  def __adddf(self, olddf, rhsdf, nam, dbg):
-    '''Add stats from another stats object.'''
-    myname = 'GameStats.__adddf'
-    if olddf is None: return
-    if rhsdf is None: return
+  def __addtab(self, oldtab, rhstab, nam, dbg):
+    '''
+    Add stats from another stats table.
+    Players are aligned on number and those not yet in the table are added.
+    '''
+    myname = 'GameStats.__addtab'
+    if oldtab is None: return
+    if rhstab is None: return
     if dbg > 0: print(f"Adding stats from")
-    # Check names and find the number of the players to be updated.
-    nums = []
-    newdf = olddf
-    updcols = GameStats.bat_names
-    for num in olddf.index:
-      if num not in rhsdf.index: continue
-      oldnam = olddf.loc[num, 'name']
-      rhsnam = rhsdf.loc[num, 'name']
+    if dbg > 1: olddf = oldtab.dataframe()
+    # Add the stats and check the names of the players in both tables.
+    for num, oldnam, rhsnam in oldtab.merge(rhstab):
       if not GameStats.name_match(rhsnam, oldnam):
         print(f"{myname}: WARNING: Player {num} new name {rhsnam} differs from existing name {oldnam}")
-      if dbg > 1: print(f"{myname}: Updating {nam} stats for {num} {oldnam}.")
-      newdf.loc[num, updcols] = olddf.loc[num, updcols] + rhsdf.loc[num, updcols]
-    for num in rhsdf.index:
-      if num not in olddf.index:
-        print(f"{myname}: WARNING: Ignoring stats for new player {num} {rhsdf.loc[num,'name']}")
     if dbg > 1:
       print(f"{myname}: Old {nam} stats:\n{olddf}")
-      print(f"{myname}: Add {nam} stats:\n{rhsdf}")
-      print(f"{myname}: New {nam} stats:\n{newdf}")
-    return newdf
+      print(f"{myname}: Add {nam} stats:\n{rhstab.dataframe()}")
+      print(f"{myname}: New {nam} stats:\n{oldtab.dataframe()}")
+    return oldtab
 
   def add(self, rhs, dbg=0):
-    '''Add stats from another stats object.'''
+    '''Add batting and pitching stats from another stats object.'''
     myname = 'GameStats.add'
-    self.__batsums = self.__adddf(self.bat_stats(), rhs.bat_stats(), 'bat', dbg)
-    #TEMP self.__pitsums = self.__adddf(self.pitch_stats(), rhs.pitch_stats(), 'pit', dbg)
+    self.__addtab(self.__batstats, rhs.__batstats, 'bat', dbg)
+    self.__addtab(self.__pitstats, rhs.__pitstats, 'pit', dbg)
     return 0
 
-  def add_from_excel(self, fin, dbg=0):
-    '''Add stats from an excel file'''
+  def add_from_excel(self, fin, dbg=0, cache=None):
+    '''
+    Add stats from an excel file.
+    If cache is an ExcelCache or cache directory name, the sheet is read
+    through that cache.
+    '''
+    import pandas
     myname = 'add_from_excel'
     print(f"Adding stats from {fin}")
     shnam = 'batsum'
     inam = GameStats.num_index
     cols = GameStats.idx_bat_names
+    opts = dict(header=0, index_col=inam, usecols=cols)
+    xcache = ExcelCache.get_cache(cache)
     try:
       if dbg > 0: print(f"{myname}: Reading batstats from {fin}")
-      bstats = pandas.read_excel(fin, sheet_name=shnam, header=0, index_col=inam, usecols=cols)
+      if xcache is None:
+        bstats = pandas.read_excel(fin, sheet_name=shnam, **opts)
+      else:
+        bstats = xcache.read(fin, shnam, dbg, **opts)
       if dbg > 2: print(bstats.info());
     except:
       traceback.print_exc()
@@ -200,32 +209,33 @@ class GameStats:
       self.batstats_last = bstats
       if dbg > 1:
         print(f"\n{myname}: Starting:")
-        print(self.__batstats)
+        print(self.bat_stats())
         print(f"\n{myname}: Adding ({len(bstats)} batters):")
         print(bstats)
       if len(self.__batstats) == 0:
         if dbg: print(f"\n{myname}: Creating bat stats.")
-        self.__batstats = bstats
+        self.__batstats.set_dataframe(bstats)
       else:
         if dbg: print(f"\n{myname}: Updating bat stats.")
-        sumstats = self.__batstats.drop('name', axis=1).add(bstats, fill_value=0).astype('int')
-        sumstats.insert(0, 'name', self.__batstats['name'])
-        self.__batstats = sumstats
+        oldstats = self.bat_stats()
+        sumstats = oldstats.drop('name', axis=1).add(bstats, fill_value=0).astype('int')
+        sumstats.insert(0, 'name', oldstats['name'])
+        self.__batstats.set_dataframe(sumstats)
       if dbg > 1:
         print(f"{myname}: Summed batting stats:")
-        print(self.__batstats)
+        print(self.bat_stats())
 
   def add_batter(self, num, name=None):
     myname = 'GameStats.add_batter'
     dbg = 0
-    if num in self.bat_stats().index:
-      oldnam = bat_stats().loc[num, 'name']
+    if num in self.__batstats:
+      oldnam = self.__batstats.get_name(num)
       if oldnam is None:
         if name is None:
           print(f"{myname}: Batter {num} is already included without a name.")
         else:
           if dbg: print(f"{myname}: Assigning name to batter {num}: {name}.")
-          bat_stats().loc[num, 'name'] = name
+          self.__batstats.set_name(num, name)
           return 0
       else:
         if name is None:
@@ -237,21 +247,19 @@ class GameStats:
           print(f"{myname}: New name {name} is ignored.")
       return 1
     if dbg: print(f"{myname}: Adding batter {num} {name}")
-    newrow = pandas.DataFrame.from_dict({ num : GameStats.bat_dict }, orient='index')
-    newrow.index.name = 'num'
-    newrow['name'] = name
-    self.__batstats = pandas.concat([self.__batstats, newrow])
+    self.__batstats.add_player(num, name)
     return 0
 
   def have_batter(self, num, name=None, add=False):
     myname = 'GameStats.have_batter'
     dbg = 0
-    if num in self.bat_stats().index: return True
+    if num in self.__batstats: return True
     if not add: return False
     assert(self.add_batter(num, name) == 0)
     return True
 
   def add_fielder(self, num, name=None):
+    import pandas
     myname = 'GameStats.add_fielder'
     dbg = 1
     if num in self.fld_stats().index:
@@ -290,15 +298,15 @@ class GameStats:
   def add_pitcher(self, num, name=None):
     myname = f"GameStats.add_pitcher: {self.name}"
     dbg = 0
-    stas = self.pitch_stats()
-    if num in stas.index:
-      oldnam = stas.loc[num, 'name']
+    stas = self.__pitstats
+    if num in stas:
+      oldnam = stas.get_name(num)
       if oldnam is None:
         if name is None:
           print(f"{myname}: Pitcher {num} is already included without a name.")
         else:
           if dbg: print(f"{myname}: Assigning name to pitcher {num}: {name}.")
-          pitch_stats().loc[num, 'name'] = name
+          stas.set_name(num, name)
           return 0
       else:
         if name is None:
@@ -310,16 +318,13 @@ class GameStats:
           print(f"{myname}: New name {name} is ignored.")
       return 1
     if dbg: print(f"{myname}: Adding pitcher {num} {name}")
-    newrow = pandas.DataFrame.from_dict({ num : GameStats.pit_dict }, orient='index')
-    newrow.index.name = 'num'
-    newrow['name'] = name
-    self.__pitstats = pandas.concat([stas, newrow])
+    stas.add_player(num, name)
     return 0
 
   def have_pitcher(self, num, name=None, add=False):
     myname = 'GameStats.have_pitcher'
     dbg = 0
-    if num in self.pitch_stats().index: return True
+    if num in self.__pitstats: return True
     if not add: return False
     assert(self.add_pitcher(num, name) == 0)
     return True
@@ -327,20 +332,21 @@ class GameStats:
   def bat_stats(self, num=None):
     '''Return all stats or stats for player num.'''
     if num is None:
-      return self.__batstats
+      return self.__batstats.dataframe()
     else:
-      return self.__batstats.query(f"num={num}")
+      return self.__batstats.dataframe().query(f"num={num}")
 
   def pitch_stats(self, num=None):
     '''Return all stats or stats for player num.'''
     if num is None:
-      return self.__pitstats
+      return self.__pitstats.dataframe()
     else:
-      return self.__pitstats.query(f"num={num}")
+      return self.__pitstats.dataframe().query(f"num={num}")
 
   def increment_player_bat_stat(self, num, name, delta=1):
     '''Increment bat stats by player number.'''
-    self.bat_stats().loc[num, name] += delta
+    irow, icol = self.__batstats.increment(num, name, delta)
+    if self.__batlog is not None: self.__batlog.record(self.__counter.get(), irow, icol, delta)
     return 0
 
   def increment_position_bat_stat(self, pos, name, delta=1):
@@ -365,25 +371,132 @@ class GameStats:
       print(f"{myname}: {self.dlup}")
       self.__nerror += 1
       return 1
-    if name not in self.pitch_stats().columns:
+    stas = self.__pitstats
+    if not stas.has_stat(name):
       print(f"{myname}: ERROR: Cannot increment unknown stat {name}.")
       self.__nerror += 1
       return 2
-    stas = self.pitch_stats()
-    if num not in stas.index:
+    if num not in stas:
       self.add_pitcher(num)
-      stas = self.pitch_stats()
-    stas.loc[num, name] += delta
+    irow, icol = stas.increment(num, name, delta)
+    if self.__pitlog is not None: self.__pitlog.record(self.__counter.get(), irow, icol, delta)
     return 0
 
+  def detached(self):
+    '''
+    Return a copy of these stats without the lineups and roster.
+    The copy holds only the stat tables so it is cheap to pickle.
+    '''
+    gstats = GameStats(name=self.name, fill=False)
+    gstats.__batstats = self.__batstats.copy()
+    gstats.__pitstats = self.__pitstats.copy()
+    gstats.__nerror = self.__nerror
+    return gstats
+
+  def bat_log(self):
+    '''Return the StatLog of batting stat increments or None if there is none.'''
+    return self.__batlog
+
+  def pitch_log(self):
+    '''Return the StatLog of pitching stat increments or None if there is none.'''
+    return self.__pitlog
+
+  def as_of(self, idx):
+    '''
+    Return stats with the values these had at counter index idx.
+    The tables are built from the increment logs without replaying the game.
+    Changes made with add or add_from_excel are not logged. As for detached,
+    the result holds only the stat tables. Returns None if there are no logs,
+    e.g. for detached or merged stats.
+    '''
+    myname = f"GameStats.as_of: {self.name}"
+    if self.__batlog is None:
+      print(f"{myname}: ERROR: Stats do not have increment logs.")
+      return None
+    gstats = GameStats(name=self.name, fill=False)
+    bats = self.__batstats
+    pits = self.__pitstats
+    gstats.__batstats = bats.with_values(self.__batlog.values_at(idx, len(bats)))
+    gstats.__pitstats = pits.with_values(self.__pitlog.values_at(idx, len(pits)))
+    return gstats
+
+  @classmethod
+  def empty(cls, name=None):
+    '''Return stats with no players. This is the identity for merge.'''
+    return cls(name=name, fill=False)
+
+  @staticmethod
+  def merge_names(nam1, nam2):
+    '''Return the name for merged stats: the distinct names joined with ' + '.'''
+    if nam1 is None: return nam2
+    if nam2 is None: return nam1
+    nams = set(nam1.split(' + ')) | set(nam2.split(' + '))
+    return ' + '.join(sorted(nams))
+
+  def merge(self, rhs):
+    '''
+    Return new stats with the sum of these stats and rhs.
+    As for detached, the result holds only the stat tables, name and error
+    count. Players are ordered by number and conflicting names resolved with
+    StatTable.pick_name without warnings. Merge is associative and commutative
+    with identity empty() so any grouping of a sum gives identical results.
+    Use add to accumulate into a roster-ordered table with name checks.
+    '''
+    gstats = GameStats(name=GameStats.merge_names(self.name, rhs.name), fill=False)
+    gstats.__batstats = self.__batstats.merged(rhs.__batstats)
+    gstats.__pitstats = self.__pitstats.merged(rhs.__pitstats)
+    gstats.__nerror = self.__nerror + rhs.__nerror
+    return gstats
+
+  def __add__(self, rhs):
+    if not isinstance(rhs, GameStats): return NotImplemented
+    return self.merge(rhs)
+
+  def __radd__(self, lhs):
+    '''Add to 0 so the builtin sum can be used.'''
+    if isinstance(lhs, int) and lhs == 0: return self.merge(GameStats.empty())
+    return NotImplemented
+
+  @staticmethod
+  def merge_pair(pair):
+    '''Return the merge of a pair of stats.'''
+    return pair[0].merge(pair[1])
+
+  @staticmethod
+  def tree_sum(stats, jobs=1, processes=False):
+    '''
+    Return the sum of a sequence of stats by pairwise tree reduction.
+    Each level merges adjacent pairs using jobs workers in a thread pool or,
+    if processes is true, a process pool. Jobs 0 or None means one per CPU.
+    The result is identical to sum(stats).
+    '''
+    level = list(stats)
+    if len(level) == 0: return GameStats.empty()
+    if len(level) == 1: return level[0].merge(GameStats.empty())
+    if not jobs: jobs = os.cpu_count()
+    if processes: level = [gstats.detached() for gstats in level]
+    executor = None
+    if jobs > 1:
+      executor = ProcessPoolExecutor(jobs) if processes else ThreadPoolExecutor(jobs)
+    try:
+      while len(level) > 1:
+        pairs = [(level[ista], level[ista+1]) for ista in range(0, len(level)-1, 2)]
+        if executor is None: merged = [GameStats.merge_pair(pair) for pair in pairs]
+        else: merged = list(executor.map(GameStats.merge_pair, pairs))
+        if len(level) % 2: merged.append(level[-1])
+        level = merged
+    finally:
+      if executor is not None: executor.shutdown()
+    return level[0]
+
   def display_bat_stats(self):
-    print (self.__batstats)
+    print (self.bat_stats())
 
   def display_field_stats(self):
     print (self.__fldstats)
 
   def display_pitch_stats(self):
-    print (self.__pitstats)
+    print (self.pitch_stats())
 
   def roster(self):
     return self.__roster
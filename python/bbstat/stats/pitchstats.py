@@ -6,6 +6,7 @@
 import pandas
 import traceback
 from bbstat import GameStats
+from bbstat.stats.batstats import krat_array
 
 def krat(num, den):
   #print(f"{num}/{den}")
@@ -15,6 +16,11 @@ def krat(num, den):
 class PitchStats:
   '''Compile and return batting stats.
     ino - inning outs = 3*innings
+    inn - innings
+    pit - pitches
+    kpct, bbpct - strikeouts and walks per batter faced (x1000)
+    whip - walks plus hits per inning (x1000)
+  All rates are evaluated for whole columns with krat_array.
   '''
 
   @classmethod
@@ -23,18 +29,27 @@ class PitchStats:
     #row.loc['hit2'] = row['b1'] + row['b2'] + row.b3 + row.hr
     return row
 
+  @staticmethod
+  def add_derived(s):
+    '''Add the derived columns to DataFrame s of pitching stats and return it.'''
+    s['inn'] = s.ino/3 + 0.1*(s.ino%3)
+    s['pit'] = s.b + s.s
+    s['kpct'] = krat_array(s.k, s.bf)
+    s['bbpct'] = krat_array(s.bb, s.bf)
+    s['whip'] = krat_array(3*(s.bb + s.hit), s.ino)
+    return s
+
   def __init__(self):
     num_index = 'num'
     names = 'inn pit'
     self.stats = None
 
-  def __init__(self, gstats, mininn=5):
+  def __init__(self, gstats, mininn=5, dbg=0):
     s = gstats.pitch_stats().copy()
-    print(gstats.roster())
+    if dbg: print(gstats.roster())
     if gstats.roster() is not None:
       s.insert(0, 'rname', gstats.roster().get()['first'])
-    s['inn'] = s.ino/3 + 0.1*(s.ino%3)
-    s['pit'] = s.b + s.s
+    PitchStats.add_derived(s)
     #s.loc[:,'avg'] = s.apply(lambda x: krat(x.hit, x.atb), axis=1)
     #s.loc[:,'slg'] = s.apply(lambda x: krat(x.b1 + 2*x.b2 + 3*x.b3 + 4*x.hr, x.atb), axis=1)
     #s.loc[:,'obp'] = s.apply(lambda x: krat(x.hit + x.bb + x.hbp, x.pa + x.bb + x.hbp + x.sf), axis=1)
@@ -58,5 +73,5 @@ class PitchStats:
     for idx, x in self.stats.sort_values('inn', ascending=False).iterrows():
       if count == 0:
         print('  -----------------|--------------------------|--------')
-      print(f"{x['name']:>18} | {x.inn:4.0f} {x.pit:4.0f}")
+      print(f"{x['name'] or '':>18} | {x.inn:4.0f} {x.pit:4.0f}")
       count = (count + 1) % 4
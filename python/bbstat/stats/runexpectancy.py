@@ -0,0 +1,192 @@
+# runexpectancy.py
+#
+# Class to evaluate the run expectancy (RE24) matrix and player contributions.
+#
+
+import sys
+import numpy
+import pandas
+from bbstat import EventTable
+from bbstat import GameStats
+
+class RunExpectancy:
+  '''
+  Run expectancy for the 24 base-out states from the events in an EventTable.
+    evts - EventTable
+    matrix - If not None, the (8, 3) array or DataFrame of expected runs used
+             to value the events, e.g. the matrix for a whole league used to
+             value the events of one team. Otherwise the matrix for evts.
+  The state of an event is the outs and bases before it with index
+  8*outs + bases. Index 24 is the end of the half-inning with no expected runs.
+  The runs to the end of the half-inning from each event, including those
+  on the event, are found with a reverse cumulative sum over each
+  half-inning. The expected runs for a state is the mean of these over the
+  plate appearances starting in that state. Half-innings that end with fewer
+  than three outs, e.g. walk-offs, are not used for the matrix.
+  The RE24 value of an event is the runs scored on the event plus the change
+  in expected runs from its state to that of the next event in the
+  half-inning. As for the table totals, the value of a plate appearance is
+  credited to the batter and that of an on-base event to the runner. The
+  pitcher is credited with the runs saved, i.e. the negative.
+  '''
+
+  nstate = 24
+  bases_labels = [''.join(str(ibas) if mask & (1 << (ibas - 1)) else '-' for ibas in range(1, 4))
+                  for mask in range(8)]
+
+  @staticmethod
+  def state_index(outs, bases):
+    '''Return the state index for arrays of outs and bases.'''
+    return 8*numpy.asarray(outs, dtype=numpy.int64) + numpy.asarray(bases, dtype=numpy.int64)
+
+  def __init__(self, evts, matrix=None):
+    myname = 'RunExpectancy.init'
+    self.__evts = evts
+    arr = evts.values()
+    nevt = len(arr)
+    # Order the events by game and index so each half-inning is contiguous.
+    order = numpy.lexsort((arr['idx'], arr['game']))
+    sarr = arr[order]
+    half = (sarr['game'].astype(numpy.int64)*1000 + sarr['inning'])*2 + sarr['half']
+    start = numpy.r_[True, half[1:] != half[:-1]] if nevt else numpy.zeros(0, dtype=bool)
+    hids = numpy.cumsum(start) - 1
+    last = numpy.r_[start[1:], True] if nevt else start
+    # Reverse cumulative sum of runs in each half-inning.
+    runs = sarr['runs'].astype(numpy.int64)
+    cum = numpy.cumsum(runs)
+    rest = cum[last][hids] - cum + runs
+    nout = numpy.bincount(hids, sarr['nout'])
+    # States before each event and before the next event in the half-inning.
+    state = RunExpectancy.state_index(sarr['outs'], sarr['bases'])
+    after = numpy.r_[state[1:], RunExpectancy.nstate][0:nevt]
+    after[last] = RunExpectancy.nstate
+    self.__state = numpy.empty(nevt, dtype=numpy.int64)
+    self.__state[order] = state
+    self.__after = numpy.empty(nevt, dtype=numpy.int64)
+    self.__after[order] = after
+    self.__rest = numpy.empty(nevt, dtype=numpy.int64)
+    self.__rest[order] = rest
+    self.__complete = numpy.empty(nevt, dtype=bool)
+    self.__complete[order] = nout[hids] >= 3
+    sel = arr['pa'] & self.__complete
+    self.__counts = numpy.bincount(self.__state[sel], minlength=RunExpectancy.nstate)
+    tots = numpy.bincount(self.__state[sel], self.__rest[sel], minlength=RunExpectancy.nstate)
+    self.__matrix = numpy.divide(tots, self.__counts, out=numpy.zeros(RunExpectancy.nstate),
+                                 where=self.__counts > 0)
+    if matrix is None:
+      remat = self.__matrix
+    else:
+      remat = numpy.asarray(matrix, dtype=float)
+      if remat.shape != (8, 3):
+        print(f"{myname}: ERROR: Invalid matrix shape: {remat.shape}")
+        remat = self.__matrix
+      else:
+        remat = remat.T.reshape(RunExpectancy.nstate)
+    revals = numpy.r_[remat, 0.0]
+    self.__values = revals[self.__after] - revals[self.__state] + arr['runs']
+
+  def events(self):
+    '''Return the EventTable.'''
+    return self.__evts
+
+  def states(self):
+    '''Return the array of state indices before each event.'''
+    return self.__state
+
+  def next_states(self):
+    '''Return the array of state indices before the next event in the half-inning or 24.'''
+    return self.__after
+
+  def runs_to_end(self):
+    '''Return the array of runs scored from each event to the end of its half-inning.'''
+    return self.__rest
+
+  def complete(self):
+    '''Return the array with true for events in half-innings that end with three outs.'''
+    return self.__complete
+
+  def values(self):
+    '''Return the array of RE24 values of the events.'''
+    return self.__values
+
+  def __state_frame(self, vals):
+    '''Return a DataFrame indexed by bases with a column for each number of outs.'''
+    return pandas.DataFrame(numpy.asarray(vals).reshape(3, 8).T,
+                            index=pandas.Index(RunExpectancy.bases_labels, name='bases'),
+                            columns=pandas.Index([0, 1, 2], name='outs'))
+
+  def matrix(self):
+    '''
+    Return the RE24 matrix: a DataFrame of expected runs to the end of the
+    half-inning indexed by bases with a column for each number of outs.
+    States with no plate appearances have zero.
+    '''
+    return self.__state_frame(self.__matrix)
+
+  def counts(self):
+    '''Return the DataFrame of the numbers of plate appearances used for the matrix.'''
+    return self.__state_frame(self.__counts)
+
+  def __player_lines(self, nums, sign, name):
+    '''Return the DataFrame of event counts and summed values for each player.'''
+    pnums, inv = numpy.unique(nums, return_inverse=True)
+    inv = inv.reshape(len(nums))
+    pa = self.__evts.values()['pa']
+    df = pandas.DataFrame({
+      name: numpy.bincount(inv, pa, minlength=len(pnums)).astype(numpy.int64),
+      'nevt': numpy.bincount(inv, minlength=len(pnums)),
+      're24': sign*numpy.bincount(inv, self.__values, minlength=len(pnums)),
+    }, index=pandas.Index(pnums, name=GameStats.num_index))
+    return df[df.index >= 0]
+
+  def batting(self):
+    '''
+    Return a DataFrame indexed by player number with the plate appearances
+    pa, number of credited events nevt and summed RE24 value re24.
+    '''
+    return self.__player_lines(self.__evts.bat_players(), 1.0, 'pa')
+
+  def pitching(self):
+    '''
+    Return a DataFrame indexed by pitcher number with the batters faced bf,
+    number of events nevt and the runs saved re24.
+    '''
+    return self.__player_lines(self.__evts.values()['pitcher'], -1.0, 'bf')
+
+def main_re24():
+  '''
+  Usage: bbstat-re24 EVENTS [opt1 opt2 ...]
+    EVENTS is a .npz or .npy event table file, e.g. written by bbstat-season events=FILE
+    opts include
+      team=NAME - Show the player values for this team using the matrix for all events
+      pitch - Show pitching values instead of batting
+      min=N - Minimum plate appearances or batters faced for a player
+      counts - Also show the number of plate appearances for each state
+  '''
+  pandas.options.display.width = 0
+  if len(sys.argv) < 2:
+    print(main_re24.__doc__)
+    return 1
+  team = None
+  offense = True
+  minval = 0
+  show_counts = False
+  for opt in sys.argv[2:]:
+    if   opt[0:5] == 'team=': team = opt[5:]
+    elif opt == 'pitch': offense = False
+    elif opt[0:4] == 'min=': minval = int(opt[4:])
+    elif opt == 'counts': show_counts = True
+    else:
+      print(f"Invalid option: {opt}")
+      return 1
+  evts = EventTable.load(sys.argv[1])
+  if evts is None: return 1
+  rex = RunExpectancy(evts)
+  print(rex.matrix().round(3).to_string())
+  if show_counts: print(rex.counts().to_string())
+  if team is not None:
+    rex = RunExpectancy(evts.team_rows(team, offense), rex.matrix())
+  df = rex.batting() if offense else rex.pitching()
+  df = df[df.iloc[:, 0] >= minval].sort_values('re24', ascending=False)
+  print(df.round(2).to_string())
+  return 0
@@ -0,0 +1,282 @@
+# splits.py
+#
+# Class to evaluate batting and pitching lines for situational splits.
+#
+
+import sys
+import numpy
+import pandas
+from bbstat import EventTable
+from bbstat import GameStats
+from bbstat import BatStats
+from bbstat import PitchStats
+
+class Splits:
+  '''
+  Batting and pitching lines for situational splits of the events in an
+  EventTable.
+    evts - EventTable
+    team - If not None, batting lines are for the events with this team at
+           bat and pitching lines for those with this team in the field.
+  A split dimension assigns each event a category given by an integer key
+  indexing a list of labels. The keys for each dimension are found once
+  with array operations and held. The lines for any combination of
+  dimensions, with or without players, are then found from a single
+  bincount over the combined group index of the events.
+  Dimensions are registered with register_dimension. The standard ones are
+    risp - runner in scoring position: no, yes
+    onbase - bases empty or not: empty, on
+    bases - base state, e.g. 1-3 for runners on first and third
+    outs - outs before the event: 0, 1, 2
+    inning - inning number
+    count - balls and strikes recorded before the event, e.g. 3-2. The
+            counts are capped separately at 3 balls and 2 strikes, so a
+            four-pitch walk is in 3-0 and a foul with two strikes stays at 2.
+    home - team of the lines at home or away
+    pitcher - pitcher number, e.g. batting lines vs each pitcher
+    batter - batter number
+    game - game number
+  As for the table totals, plate appearances are credited to the batter
+  and on-base events to the runner.
+  '''
+
+  __dimensions = {}    # Key functions indexed by dimension name
+
+  @classmethod
+  def register_dimension(cls, name, func):
+    '''
+    Register a split dimension.
+    Function func(evts, offense) receives the structured array of events
+    and True for batting lines or False for pitching lines. It returns
+    (keys, labels) where keys is an integer array with one entry per event
+    and labels is the list of category labels indexed by key.
+    An existing dimension with the same name is replaced.
+    '''
+    cls.__dimensions[name] = func
+
+  @classmethod
+  def unregister_dimension(cls, name):
+    '''Remove a split dimension. Returns 0 for success or 1 if there is no such dimension.'''
+    myname = 'Splits.unregister_dimension'
+    if name not in cls.__dimensions:
+      print(f"{myname}: ERROR: Unknown split dimension: {name}")
+      return 1
+    del cls.__dimensions[name]
+    return 0
+
+  @classmethod
+  def dimensions(cls):
+    '''Return the list of dimension names.'''
+    return list(cls.__dimensions)
+
+  @staticmethod
+  def categories(vals):
+    '''
+    Return (keys, labels) for an array of integer values where labels are the
+    sorted distinct values and keys the index of each value in labels.
+    '''
+    labels, keys = numpy.unique(vals, return_inverse=True)
+    return keys.reshape(len(vals)), [int(lab) for lab in labels]
+
+  @staticmethod
+  def __split_risp(evts, offense):
+    return (evts['bases'] & 6 != 0).astype(numpy.int64), ['no', 'yes']
+
+  @staticmethod
+  def __split_onbase(evts, offense):
+    return (evts['bases'] != 0).astype(numpy.int64), ['empty', 'on']
+
+  @staticmethod
+  def __split_bases(evts, offense):
+    labels = [''.join(str(ibas) if mask & (1 << (ibas - 1)) else '-' for ibas in range(1, 4))
+              for mask in range(8)]
+    return evts['bases'].astype(numpy.int64), labels
+
+  @staticmethod
+  def __split_outs(evts, offense):
+    return evts['outs'].astype(numpy.int64), [0, 1, 2]
+
+  @staticmethod
+  def __split_inning(evts, offense):
+    return Splits.categories(evts['inning'])
+
+  @staticmethod
+  def __split_count(evts, offense):
+    nball = numpy.minimum(evts['balls'], 3).astype(numpy.int64)
+    nstri = numpy.minimum(evts['strikes'], 2).astype(numpy.int64)
+    return 3*nball + nstri, [f"{nb}-{ns}" for nb in range(4) for ns in range(3)]
+
+  @staticmethod
+  def __split_home(evts, offense):
+    return (evts['half'] == (1 if offense else 0)).astype(numpy.int64), ['away', 'home']
+
+  @staticmethod
+  def __split_pitcher(evts, offense):
+    return Splits.categories(evts['pitcher'])
+
+  @staticmethod
+  def __split_batter(evts, offense):
+    return Splits.categories(evts['batter'])
+
+  @staticmethod
+  def __split_game(evts, offense):
+    return Splits.categories(evts['game'])
+
+  @classmethod
+  def register_standard_dimensions(cls):
+    '''Register the standard split dimensions.'''
+    cls.register_dimension('risp', cls.__split_risp)
+    cls.register_dimension('onbase', cls.__split_onbase)
+    cls.register_dimension('bases', cls.__split_bases)
+    cls.register_dimension('outs', cls.__split_outs)
+    cls.register_dimension('inning', cls.__split_inning)
+    cls.register_dimension('count', cls.__split_count)
+    cls.register_dimension('home', cls.__split_home)
+    cls.register_dimension('pitcher', cls.__split_pitcher)
+    cls.register_dimension('batter', cls.__split_batter)
+    cls.register_dimension('game', cls.__split_game)
+
+  def __init__(self, evts, team=None):
+    if team is None:
+      self.__tables = {True: evts, False: evts}
+    else:
+      self.__tables = {True: evts.team_rows(team), False: evts.team_rows(team, offense=False)}
+    self.__keys = {}    # (keys, labels) indexed by (dimension, offense)
+
+  def events(self, offense=True):
+    '''Return the EventTable for batting or, if offense is false, pitching lines.'''
+    return self.__tables[offense]
+
+  def keys(self, name, offense=True):
+    '''
+    Return (keys, labels) for dimension name and batting or pitching lines.
+    Returns None if there is no such dimension.
+    '''
+    myname = 'Splits.keys'
+    kkey = (name, offense)
+    if kkey not in self.__keys:
+      func = Splits.__dimensions.get(name)
+      if func is None:
+        print(f"{myname}: ERROR: Unknown split dimension: {name}")
+        return None
+      keys, labels = func(self.__tables[offense].values(), offense)
+      self.__keys[kkey] = (numpy.asarray(keys, dtype=numpy.int64), list(labels))
+    return self.__keys[kkey]
+
+  def __lines(self, dims, players, offense):
+    '''Return (index, stat columns) for the lines of batting or pitching.'''
+    if isinstance(dims, str): dims = [dims]
+    tab = self.__tables[offense]
+    nevt = len(tab)
+    levels = []     # (name, keys, labels) for each index level
+    if players:
+      nums = tab.bat_players() if offense else tab.values()['pitcher']
+      keys, labels = Splits.categories(nums)
+      levels.append((GameStats.num_index, keys, labels))
+    for name in dims:
+      kls = self.keys(name, offense)
+      if kls is None: return None
+      levels.append((name,) + kls)
+    # Combine the level keys into one group index and keep the groups with events.
+    group = numpy.zeros(nevt, dtype=numpy.int64)
+    for name, keys, labels in levels:
+      group = group*len(labels) + keys
+    gvals, ginv = numpy.unique(group, return_inverse=True)
+    ginv = ginv.reshape(nevt)
+    cols = tab.bat_columns(ginv, len(gvals)) if offense else tab.pitch_columns(ginv, len(gvals))
+    if len(levels) == 0:
+      return pandas.Index(['all'][0:len(gvals)], name='split'), cols
+    arrays = []
+    rest = gvals
+    for name, keys, labels in reversed(levels):
+      rest, ikeys = numpy.divmod(rest, len(labels))
+      arrays.insert(0, numpy.asarray(labels)[ikeys])
+    names = [name for name, keys, labels in levels]
+    if len(levels) == 1: index = pandas.Index(arrays[0], name=names[0])
+    else: index = pandas.MultiIndex.from_arrays(arrays, names=names)
+    return index, cols
+
+  def __frame(self, dims, players, offense, minval):
+    '''Return the DataFrame of lines with the derived columns.'''
+    lines = self.__lines(dims, players, offense)
+    if lines is None: return None
+    index, cols = lines
+    df = pandas.DataFrame(cols, index=index)
+    if players and isinstance(index, pandas.MultiIndex):
+      df = df[index.get_level_values(GameStats.num_index) >= 0]
+    elif players:
+      df = df[index >= 0]
+    if offense:
+      df = BatStats.add_derived(df[df.pa >= minval].copy())
+    else:
+      df = PitchStats.add_derived(df[df.bf >= minval].copy())
+    return df
+
+  def batting(self, dims=(), players=True, minpa=0):
+    '''
+    Return a DataFrame of batting lines for each combination of categories
+    of dimensions dims, a name or list of names.
+      players - If true, there is a line for each player. The first index
+                level is then the player number.
+      minpa - Minimum number of plate appearances for a line
+    The columns are those of EventTable.bat_columns followed by the derived
+    columns of BatStats. Only lines with events are included. Returns None
+    if a dimension is not known.
+    '''
+    return self.__frame(dims, players, True, minpa)
+
+  def pitching(self, dims=(), players=True, minbf=0):
+    '''
+    Return a DataFrame of pitching lines. As for batting with the columns of
+    EventTable.pitch_columns followed by the derived columns of PitchStats.
+      minbf - Minimum number of batters faced for a line
+    '''
+    return self.__frame(dims, players, False, minbf)
+
+Splits.register_standard_dimensions()
+
+def main_splits():
+  '''
+  Usage: bbstat-splits EVENTS [opt1 opt2 ...]
+    EVENTS is a .npz or .npy event table file, e.g. written by bbstat-season events=FILE
+    opts include
+      team=NAME - Team for the lines (default all events)
+      split=DIM1,DIM2,... - Split dimensions (default risp)
+      pitch - Show pitching lines instead of batting lines
+      total - Show lines for all players together
+      player=N - Show only the lines for player N
+      min=N - Minimum plate appearances or batters faced for a line
+      list - List the split dimensions
+  '''
+  pandas.options.display.width = 0
+  if len(sys.argv) < 2:
+    print(main_splits.__doc__)
+    return 1
+  team = None
+  dims = ['risp']
+  offense = True
+  players = True
+  player = None
+  minval = 0
+  for opt in sys.argv[2:]:
+    if   opt[0:5] == 'team=': team = opt[5:]
+    elif opt[0:6] == 'split=': dims = opt[6:].split(',')
+    elif opt == 'pitch': offense = False
+    elif opt == 'total': players = False
+    elif opt[0:7] == 'player=': player = int(opt[7:])
+    elif opt[0:4] == 'min=': minval = int(opt[4:])
+    elif opt == 'list':
+      print(f"Split dimensions: {' '.join(Splits.dimensions())}")
+      return 0
+    else:
+      print(f"Invalid option: {opt}")
+      return 1
+  evts = EventTable.load(sys.argv[1])
+  if evts is None: return 1
+  spl = Splits(evts, team)
+  df = spl.batting(dims, players, minval) if offense else spl.pitching(dims, players, minval)
+  if df is None: return 1
+  if player is not None and players:
+    df = df[df.index.get_level_values(GameStats.num_index) == player]
+  print(df.to_string())
+  return 0
@@ -0,0 +1,90 @@
+# statlog.py
+#
+# Columnar log of stat increments.
+#
+
+from array import array
+import numpy
+
+class StatLog:
+  '''
+  Log of the increments made to a StatTable.
+  Each event is a counter index, table row, table column and delta held in
+  parallel arrays so recording an event is four appends.
+  The values of the table at any counter index are found from cumulative
+  sums over the events for each cell. These are built when first needed
+  after the log changes so a query costs O(ncell log nevent).
+    ncol - number of columns in the table
+  '''
+
+  def __init__(self, ncol):
+    self.__ncol = ncol
+    self.__idxs = array('i')     # Counter index for each event
+    self.__rows = array('i')     # Table row for each event
+    self.__cols = array('i')     # Table column for each event
+    self.__deltas = array('i')   # Increment for each event
+    self.__sums = None           # Cumulative sums built by __build
+
+  def __len__(self):
+    return len(self.__idxs)
+
+  def __getstate__(self):
+    '''Drop the cumulative sums when pickling.'''
+    state = self.__dict__.copy()
+    state['_StatLog__sums'] = None
+    return state
+
+  def record(self, idx, row, col, delta=1):
+    '''Record an increment delta of cell (row, col) at counter index idx.'''
+    self.__idxs.append(idx)
+    self.__rows.append(row)
+    self.__cols.append(col)
+    self.__deltas.append(delta)
+    self.__sums = None
+
+  def events(self):
+    '''Return a dictionary of the event arrays: idx, row, col and delta.'''
+    return {'idx': numpy.array(self.__idxs, dtype=numpy.int64),
+            'row': numpy.array(self.__rows, dtype=numpy.int64),
+            'col': numpy.array(self.__cols, dtype=numpy.int64),
+            'delta': numpy.array(self.__deltas, dtype=numpy.int64)}
+
+  def __build(self):
+    '''
+    Build the cumulative sums.
+    Events are ordered by counter index and then grouped by cell keeping that
+    order. Each event gets the key cell*(nevent+1) + position and the running
+    total of its cell, so the value of a cell after the first n events is the
+    total for the last key below cell*(nevent+1) + n.
+    '''
+    evts = self.events()
+    nevt = len(self)
+    order = numpy.argsort(evts['idx'], kind='stable')
+    idxs = evts['idx'][order]
+    cells = (evts['row']*self.__ncol + evts['col'])[order]
+    group = numpy.argsort(cells, kind='stable')
+    gcells = cells[group]
+    totals = numpy.cumsum(evts['delta'][order][group])
+    starts = numpy.flatnonzero(numpy.r_[True, gcells[1:] != gcells[:-1]])
+    ends = numpy.r_[starts[1:], nevt]
+    offsets = numpy.r_[0, totals][starts]
+    totals -= numpy.repeat(offsets, ends - starts)
+    keys = gcells*(nevt + 1) + group
+    self.__sums = (idxs, keys, totals, gcells[starts], starts)
+
+  def values_at(self, idx, nrow):
+    '''
+    Return the (nrow, ncol) matrix of the sums of the increments made at
+    counter indices less than or equal to idx.
+    '''
+    vals = numpy.zeros((nrow, self.__ncol), dtype=numpy.int64)
+    if len(self) == 0: return vals
+    if self.__sums is None: self.__build()
+    idxs, keys, totals, ucells, starts = self.__sums
+    nevt = int(numpy.searchsorted(idxs, idx, 'right'))
+    if nevt == 0: return vals
+    ikeys = numpy.searchsorted(keys, ucells*(len(idxs) + 1) + nevt) - 1
+    have = ikeys >= starts
+    cells = ucells[have]
+    vals[cells // self.__ncol, cells % self.__ncol] = totals[ikeys[have]]
+    return vals
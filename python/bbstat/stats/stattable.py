@@ -0,0 +1,231 @@
+# stattable.py
+#
+# Class to hold a dense table of integer player stats.
+#
+
+import numpy
+
+class StatTable:
+  '''
+  Dense integer table of stats with one row per player and one column per stat.
+  Rows are found from player numbers and columns from stat names with dicts
+  so an increment is a single array update.
+  The pandas view of the table is built when requested and cached until the
+  next write.
+    names - stat names in column order
+    nrow - initial row capacity
+  '''
+
+  num_index = 'num'
+
+  def __init__(self, names, nrow=16):
+    self.__names = list(names)
+    self.__cols = {nam: icol for icol, nam in enumerate(self.__names)}
+    self.__data = numpy.zeros((nrow, len(self.__names)), dtype=numpy.int64)
+    self.__rows = {}      # Row indexed by player number
+    self.__nums = []      # Player number for each row
+    self.__pnames = []    # Player name for each row
+    self.__df = None      # Cached DataFrame
+
+  def __len__(self):
+    return len(self.__nums)
+
+  def __contains__(self, num):
+    return num in self.__rows
+
+  def __getstate__(self):
+    '''Drop the cached DataFrame when pickling.'''
+    state = self.__dict__.copy()
+    state['_StatTable__df'] = None
+    return state
+
+  def names(self):
+    '''Return the stat names in column order.'''
+    return self.__names
+
+  def nums(self):
+    '''Return the player numbers in row order.'''
+    return self.__nums
+
+  def player_names(self):
+    '''Return the player names in row order.'''
+    return self.__pnames
+
+  def has_stat(self, name):
+    '''Return if name is a stat in this table.'''
+    return name in self.__cols
+
+  def row(self, num):
+    '''Return the array of stats for player num.'''
+    return self.__data[self.__rows[num]]
+
+  def values(self):
+    '''Return the stat matrix for the filled rows.'''
+    return self.__data[:len(self.__nums)]
+
+  def get_name(self, num):
+    '''Return the name for player num.'''
+    return self.__pnames[self.__rows[num]]
+
+  def set_name(self, num, name):
+    '''Set the name for player num.'''
+    self.__pnames[self.__rows[num]] = name
+    self.__df = None
+
+  def add_player(self, num, name=None):
+    '''
+    Add a row of zeroed stats for player num and return its row number.
+    The existing row is returned if the player is already present.
+    '''
+    if num in self.__rows: return self.__rows[num]
+    irow = len(self.__nums)
+    if irow >= len(self.__data):
+      newdata = numpy.zeros((max(2*irow, 16), len(self.__names)), dtype=numpy.int64)
+      newdata[:irow] = self.__data[:irow]
+      self.__data = newdata
+    self.__rows[num] = irow
+    self.__nums.append(num)
+    self.__pnames.append(name)
+    self.__df = None
+    return irow
+
+  def increment(self, num, name, delta=1):
+    '''
+    Increment stat name for player num by delta and return the row and column.
+    Raises KeyError if the player or stat is unknown.
+    '''
+    irow = self.__rows[num]
+    icol = self.__cols[name]
+    self.__data[irow, icol] += delta
+    self.__df = None
+    return irow, icol
+
+  def add_row(self, num, vals):
+    '''Add the array of stats vals to the row for player num.'''
+    self.__data[self.__rows[num]] += vals
+    self.__df = None
+
+  def merge(self, rhs):
+    '''
+    Add the stats in table rhs to this table with rows aligned on player number.
+    Players only in rhs are added with their rhs names and missing names here
+    are taken from rhs. The stats are added with a single array operation.
+    Returns a list of (num, name, rhs name) for players whose names differ.
+    '''
+    nrhs = len(rhs)
+    if nrhs == 0: return []
+    rows = self.__rows
+    rhsnames = rhs.__pnames
+    irows = [rows.get(num, -1) for num in rhs.__nums]
+    conflicts = []
+    for irhs, irow in enumerate(irows):
+      rhsnam = rhsnames[irhs]
+      if irow < 0:
+        irows[irhs] = self.add_player(rhs.__nums[irhs], rhsnam)
+        continue
+      oldnam = self.__pnames[irow]
+      if oldnam == rhsnam or not rhsnam: continue
+      if oldnam: conflicts.append((rhs.__nums[irhs], oldnam, rhsnam))
+      else: self.__pnames[irow] = rhsnam
+    if rhs.__names == self.__names:
+      irow0 = irows[0]
+      if irows == list(range(irow0, irow0 + nrhs)):
+        # Rows in the same order are added as a block.
+        self.__data[irow0:irow0+nrhs] += rhs.values()
+      else:
+        self.__data[irows] += rhs.values()
+    else:
+      icols = [self.__cols[nam] for nam in rhs.__names]
+      self.__data[numpy.ix_(irows, icols)] += rhs.values()
+    self.__df = None
+    return conflicts
+
+  @staticmethod
+  def pick_name(nam1, nam2):
+    '''
+    Return the preferred of two player names: a name over None and otherwise
+    the longer or, for equal lengths, the later in sort order.
+    The choice does not depend on the argument order.
+    '''
+    if nam1 is None: return nam2
+    if nam2 is None: return nam1
+    return max(nam1, nam2, key=lambda nam: (len(nam), nam))
+
+  def merged(self, rhs):
+    '''
+    Return a new table with the sum of this table and rhs.
+    The rows are ordered by player number and names are chosen with pick_name
+    so the result does not depend on the order or grouping of the tables.
+    '''
+    if rhs.__names != self.__names:
+      raise ValueError(f"StatTable.merged: Stat names differ: {rhs.__names} != {self.__names}")
+    nums = sorted(set(self.__nums) | set(rhs.__nums))
+    tab = StatTable(self.__names, max(len(nums), 1))
+    for num in nums:
+      tab.__rows[num] = len(tab.__nums)
+      tab.__nums.append(num)
+      nam1 = self.__pnames[self.__rows[num]] if num in self.__rows else None
+      nam2 = rhs.__pnames[rhs.__rows[num]] if num in rhs.__rows else None
+      tab.__pnames.append(StatTable.pick_name(nam1, nam2))
+    sorted_nums = numpy.array(nums)
+    for src in (self, rhs):
+      if len(src):
+        tab.__data[numpy.searchsorted(sorted_nums, src.__nums)] += src.values()
+    return tab
+
+  def copy(self):
+    '''Return a copy of this table sized to the filled rows.'''
+    tab = StatTable(self.__names, max(len(self), 1))
+    tab.__data[:len(self)] = self.values()
+    tab.__rows = dict(self.__rows)
+    tab.__nums = list(self.__nums)
+    tab.__pnames = list(self.__pnames)
+    return tab
+
+  def with_values(self, vals):
+    '''Return a copy of this table with the stat matrix for the filled rows replaced by vals.'''
+    tab = self.copy()
+    tab.__data[:len(self)] = vals
+    return tab
+
+  def clear(self):
+    '''Remove all players.'''
+    self.__data[:] = 0
+    self.__rows = {}
+    self.__nums = []
+    self.__pnames = []
+    self.__df = None
+
+  def set_dataframe(self, df):
+    '''
+    Replace the table contents with those of a DataFrame indexed by player
+    number. Column name is used for player names if present and stat
+    columns absent from the frame are set to zero.
+    '''
+    self.clear()
+    nrow = len(df)
+    if nrow > len(self.__data):
+      self.__data = numpy.zeros((nrow, len(self.__names)), dtype=numpy.int64)
+    pnames = list(df['name']) if 'name' in df.columns else nrow*[None]
+    for irow, num in enumerate(df.index):
+      self.__rows[num] = irow
+      self.__nums.append(num)
+      self.__pnames.append(pnames[irow])
+    for icol, nam in enumerate(self.__names):
+      if nam in df.columns:
+        self.__data[:nrow, icol] = df[nam].to_numpy()
+    self.__df = None
+
+  def dataframe(self):
+    '''
+    Return the table as a DataFrame indexed by player number with
+    a name column followed by the stat columns.
+    The frame is cached and must not be modified by the caller.
+    '''
+    if self.__df is None:
+      import pandas
+      index = pandas.Index(self.__nums, name=StatTable.num_index)
+      df = pandas.DataFrame(self.values().copy(), index=index, columns=self.__names)
+      df.insert(0, 'name', pandas.Series(self.__pnames, index=index, dtype=object))
+      self.__df = df
+    return self.__df
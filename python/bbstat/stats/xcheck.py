@@ -0,0 +1,58 @@
+# xcheck.py
+'''
+Cross-check of parsed game stats against Excel game summaries.
+'''
+
+import numpy
+from concurrent.futures import ThreadPoolExecutor
+from bbstat import GameStats
+
+def excel_game_stats(fin, roster=None, cache=None):
+  '''Return the GameStats for the batsum sheet of excel file fin.'''
+  gstats = GameStats(roster=roster, fill=False)
+  gstats.add_from_excel(fin, cache=cache)
+  return gstats
+
+def submit_excel_stats(pool, fins, roster=None, cache=None):
+  '''
+  Submit reads of the excel files in dictionary fins to executor pool.
+  Returns a dictionary of futures for the GameStats with the keys of fins.
+  '''
+  return {key: pool.submit(excel_game_stats, fin, roster, cache) for key, fin in fins.items()}
+
+def read_excel_stats(fins, roster=None, jobs=4, cache=None):
+  '''
+  Read the excel files in dictionary fins concurrently in up to jobs threads.
+  Returns a dictionary of GameStats with the keys of fins.
+  '''
+  with ThreadPoolExecutor(max_workers=max(jobs, 1)) as pool:
+    futs = submit_excel_stats(pool, fins, roster, cache)
+    return {key: fut.result() for key, fut in futs.items()}
+
+def stat_discrepancies(expected, actual, names=GameStats.bat_names):
+  '''
+  Compare stats for many games in one pass.
+  Expected and actual are dictionaries of stat DataFrames indexed by
+  player number with game labels as keys. Players or games missing from
+  one side count as zero.
+  Returns a DataFrame with columns game, player, stat, expected, actual
+  holding one row for each stat that differs.
+  '''
+  import pandas
+  cols = ['game', 'player', 'stat', 'expected', 'actual']
+  def stack(dfs):
+    if len(dfs) == 0:
+      index = pandas.MultiIndex.from_arrays([[], []], names=['game', 'player'])
+      return pandas.DataFrame(0, index=index, columns=names)
+    return pandas.concat({key: df[names] for key, df in dfs.items()}, names=['game', 'player'])
+  expdf, actdf = stack(expected).align(stack(actual), join='outer', fill_value=0)
+  expvals = expdf[names].to_numpy(dtype='int64')
+  actvals = actdf[names].to_numpy(dtype='int64')
+  irows, icols = numpy.nonzero(expvals != actvals)
+  return pandas.DataFrame({
+    'game': expdf.index.get_level_values(0)[irows],
+    'player': expdf.index.get_level_values(1)[irows],
+    'stat': numpy.asarray(names, dtype=object)[icols],
+    'expected': expvals[irows, icols],
+    'actual': actvals[irows, icols],
+  }, columns=cols)
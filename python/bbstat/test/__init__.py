@@ -1 +0,0 @@
-from bbstat import version
@@ -0,0 +1,88 @@
+# bench_memory.py
+'''
+Memory benchmark for parsed games.
+'''
+
+import gc
+import sys
+import tempfile
+import tracemalloc
+import bbstat
+from bbstat.data.game import reachable_bytes
+from bbstat.test.gamegen import GameGenerator
+
+# Bytes per frame for the synthetic archive when frames held their histories
+# in lists of strings and tuples, for comparison with the array histories.
+baseline_bytes_per_frame = 1267
+
+def synthetic_archive(dirnam, ngame=500, seed=0):
+    '''
+    Write a synthetic archive of ngame generated game files to directory
+    dirnam and return the list of file names.
+    '''
+    return GameGenerator(seed).write_archive(dirnam, ngame)
+
+def frame_bytes(frm):
+    '''
+    Return the number of bytes held by a frame, i.e. the frame and the
+    objects only it refers to.
+    '''
+    return reachable_bytes([frm], (bbstat.Frame, bbstat.HalfGame, bbstat.InningState, bbstat.GameStats))
+
+def memory_benchmark(fnams, keep_frames=True):
+    '''
+    Read the games in fnams, keeping them all in memory.
+    If keep_frames is false, the games are read in low-memory mode.
+    Returns a dictionary with the game and frame counts, the traced memory
+    and the bytes per game and per frame, and the reduction in the bytes
+    per frame relative to baseline_bytes_per_frame.
+    '''
+    bbstat.Reader(fnams[0])     # Fill the class caches before tracing.
+    gc.collect()
+    tracemalloc.start()
+    games = []
+    for fnam in fnams:
+        games.append(bbstat.Reader(fnam, keep_frames=keep_frames).game())
+    gc.collect()
+    nbyte = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    frms = []
+    for game in games:
+        for half in (game.visitor, game.home):
+            for ing in half.innings():
+                frms += half.inning_frames(ing)
+    nframe_byte = 0
+    for frm in frms:
+        nframe_byte += frame_bytes(frm)
+    ngame = len(games)
+    nfrm = len(frms)
+    bpf = nframe_byte/max(nfrm, 1)
+    return {'games': ngame, 'frames': nfrm, 'bytes': nbyte,
+            'bytes_per_game': nbyte/max(ngame, 1), 'bytes_per_frame': bpf,
+            'frame_reduction': baseline_bytes_per_frame/bpf if bpf else 0.0}
+
+def main_bench_memory():
+    '''
+    Report the memory used to hold a synthetic archive of games.
+    Usage: bbstat-bench-memory [ngame=500] [frames=1]
+      frames=0 reads the games without keeping their frames.
+    '''
+    ngame = 500
+    keep_frames = True
+    for arg in sys.argv[1:]:
+        if arg[0:6] == 'ngame=':
+            ngame = int(arg[6:])
+        elif arg[0:7] == 'frames=':
+            keep_frames = bool(int(arg[7:]))
+        else:
+            print(f"Invalid argument: {arg}")
+            return 1
+    with tempfile.TemporaryDirectory() as dirnam:
+        res = memory_benchmark(synthetic_archive(dirnam, ngame), keep_frames)
+    print(f"        Games: {res['games']}")
+    print(f"       Frames: {res['frames']}")
+    print(f"  Traced (kB): {res['bytes']/1024:.1f}")
+    print(f"   Bytes/game: {res['bytes_per_game']:.0f}")
+    print(f"  Bytes/frame: {res['bytes_per_frame']:.0f}")
+    print(f"     Baseline: {baseline_bytes_per_frame} bytes/frame ({res['frame_reduction']:.1f}x reduction)")
+    return 0
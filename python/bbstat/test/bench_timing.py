@@ -0,0 +1,253 @@
+# bench_timing.py
+'''
+Timing benchmarks for the parser, frame engine and stats hot paths.
+'''
+
+import contextlib
+import gc
+import io
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import bbstat
+from bbstat.test.games import sample_game
+from bbstat.test.games import write_game
+from bbstat.test.gamegen import GameGenerator
+
+fixture_seed = 2033
+
+def fixture_texts(ngame=20):
+    '''Return the fixture game descriptions: the sample game and ngame generated games.'''
+    gen = GameGenerator(fixture_seed)
+    return [sample_game] + [gen.game_text(igam) for igam in range(ngame)]
+
+def time_call(fun, number=1, repeat=5):
+    '''
+    Return the best time in seconds per call of fun over repeat rounds of
+    number calls. As for timeit, garbage collection is off while timing.
+    '''
+    best = None
+    gcold = gc.isenabled()
+    gc.disable()
+    try:
+        for irep in range(repeat):
+            tsta = time.perf_counter()
+            for icall in range(number): fun()
+            tcall = (time.perf_counter() - tsta)/number
+            if best is None or tcall < best: best = tcall
+    finally:
+        if gcold: gc.enable()
+    return best
+
+def parse_text(text):
+    '''Parse a game description and return the game.'''
+    prs = bbstat.GameParser()
+    prs.feed_lines(text.splitlines())
+    return prs.game()
+
+def bench_reader(texts, repeat=5):
+    '''Time Reader for a file holding each game.'''
+    with tempfile.TemporaryDirectory() as dirnam:
+        fnams = [write_game(dirnam, f"game{igam:03d}", text) for igam, text in enumerate(texts)]
+        def read_all():
+            for fnam in fnams: bbstat.Reader(fnam)
+        return {'reader.game': time_call(read_all, 1, repeat)/len(fnams)}
+
+def bench_actions(texts, repeat=5):
+    '''
+    Time Frame.add_action calls made by the parser grouped by action kind
+    using an Instrument restricted to that operation.
+    The time for an action includes the nested actions it carries out,
+    e.g. the tagged actions run by a tag reference.
+    '''
+    res = {}
+    gcold = gc.isenabled()
+    gc.disable()
+    ins = bbstat.Instrument(['frame.add_action'])
+    try:
+        with ins:
+            for irep in range(repeat):
+                ins.reset()
+                for text in texts: parse_text(text)
+                for kind, val in ins.results().get('frame.add_action', {}).items():
+                    name = f"add_action.{kind}"
+                    tcall = val['seconds']/val['count']
+                    if name not in res or tcall < res[name]: res[name] = tcall
+    finally:
+        if gcold: gc.enable()
+    return res
+
+def bench_counter(repeat=5, lengths=(10, 100, 1000, 10000)):
+    '''Time Counter.find_with_key for CounterHistory and dictionary histories.'''
+    rng = random.Random(fixture_seed)
+    res = {}
+    for nent in lengths:
+        hist = bbstat.CounterHistory()
+        dic = {}
+        for ient in range(nent):
+            hist.set(2*ient, ient)
+            dic[2*ient] = ient
+        for name, obj, nquery in [('history', hist, 1000), ('dict', dic, max(10, 100000//nent))]:
+            keys = [rng.randrange(2*nent) for iqry in range(nquery)]
+            def find_all():
+                for key in keys: bbstat.Counter.find_with_key(obj, key)
+            res[f"find_with_key.{name}.{nent}"] = time_call(find_all, 1, repeat)/nquery
+    return res
+
+def bench_lineup(repeat=5, number=1000):
+    '''Time Lineup.set_from_string for a full defensive lineup.'''
+    spec = '[1#21(Pete Pitcher), 2#22, 3#23, 4#24, 5#25, 6#26, 7#27, 8#28, 9#29]'
+    counter = bbstat.Counter()
+    lup = bbstat.Lineup('defense', counter, 9)
+    def set_lineup():
+        counter.next()
+        lup.set_from_string(spec)
+    return {'lineup.set_from_string': time_call(set_lineup, number, repeat)}
+
+def bench_gamestats(games, repeat=5, number=2000):
+    '''Time GameStats increments and merges.'''
+    counter = bbstat.Counter()
+    dlup = bbstat.Lineup('defense', counter, [21, 22, 23, 24, 25, 26, 27, 28, 29])
+    gstats = bbstat.GameStats(None, dlup, 'Bench')
+    for num in range(11, 20): gstats.have_batter(num, add=True)
+    nums = list(range(11, 20))
+    def increment_bat():
+        for num in nums: gstats.increment_player_bat_stat(num, 'pa')
+    def increment_pitch():
+        gstats.increment_pitch_stat('b')
+    stats = []
+    for game in games: stats += [game.vstats, game.hstats]
+    def merge():
+        stats[0].merge(stats[1])
+    def tree_sum():
+        bbstat.GameStats.tree_sum(stats)
+    return {'gamestats.increment_bat': time_call(increment_bat, number, repeat)/len(nums),
+            'gamestats.increment_pitch': time_call(increment_pitch, number, repeat),
+            'gamestats.merge': time_call(merge, 20, repeat),
+            'gamestats.tree_sum': time_call(tree_sum, 1, repeat)/len(stats)}
+
+def bench_derived(games, repeat=5, number=20):
+    '''Time BatStats and PitchStats construction for the summed fixture stats.'''
+    stats = []
+    for game in games: stats += [game.vstats, game.hstats]
+    gsum = bbstat.GameStats.tree_sum(stats)
+    return {'batstats.init': time_call(lambda: bbstat.BatStats(gsum, minpa=0), number, repeat),
+            'pitchstats.init': time_call(lambda: bbstat.PitchStats(gsum, mininn=0), number, repeat)}
+
+def run_benchmarks(ngame=20, repeat=5):
+    '''
+    Run all the benchmarks and return a dictionary with the environment
+    and the results: seconds per operation indexed by benchmark name.
+    '''
+    texts = fixture_texts(ngame)
+    res = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        games = [parse_text(text) for text in texts]
+        res.update(bench_reader(texts, repeat))
+        res.update(bench_actions(texts, repeat))
+        res.update(bench_counter(repeat))
+        res.update(bench_lineup(repeat))
+        res.update(bench_gamestats(games, repeat))
+        res.update(bench_derived(games, repeat))
+    return {'bbstat': bbstat.version, 'python': platform.python_version(),
+            'machine': platform.machine(), 'ngame': len(texts), 'repeat': repeat,
+            'results': dict(sorted(res.items()))}
+
+def compare_results(base, cur, threshold=0.2):
+    '''
+    Compare benchmark results cur with baseline base.
+    Returns a list of (name, base, current, ratio, flag) for the benchmarks in
+    either with flag 'SLOWER' or 'faster' if the ratio differs from one by more
+    than threshold and 'missing' or 'new' if the benchmark is only in one.
+    '''
+    bres = base['results']
+    cres = cur['results']
+    rows = []
+    for name in sorted(set(bres) | set(cres)):
+        tbas = bres.get(name)
+        tcur = cres.get(name)
+        if tcur is None:
+            rows.append((name, tbas, None, None, 'missing'))
+        elif tbas is None:
+            rows.append((name, None, tcur, None, 'new'))
+        else:
+            ratio = tcur/tbas if tbas > 0 else float('inf')
+            flag = ''
+            if ratio > 1 + threshold: flag = 'SLOWER'
+            elif ratio < 1 - threshold: flag = 'faster'
+            rows.append((name, tbas, tcur, ratio, flag))
+    return rows
+
+def format_time(sec):
+    if sec is None: return '-'
+    if sec < 1.e-6: return f"{1.e9*sec:.0f} ns"
+    if sec < 1.e-3: return f"{1.e6*sec:.2f} us"
+    return f"{1.e3*sec:.2f} ms"
+
+def report_results(doc):
+    print(f"bbstat {doc['bbstat']} python {doc['python']} {doc['machine']}, " \
+          f"{doc['ngame']} games, best of {doc['repeat']}")
+    for name, sec in doc['results'].items():
+        print(f"{name:>32}: {format_time(sec):>10}")
+
+def main_bench_timing():
+    '''
+    Time the hot paths and optionally write the results to a JSON file.
+    Usage: bbstat-bench-timing [out=FILE] [ngame=20] [repeat=5]
+    '''
+    out = None
+    ngame = 20
+    repeat = 5
+    for arg in sys.argv[1:]:
+        if arg[0:4] == 'out=': out = arg[4:]
+        elif arg[0:6] == 'ngame=': ngame = int(arg[6:])
+        elif arg[0:7] == 'repeat=': repeat = int(arg[7:])
+        else:
+            print(f"Invalid argument: {arg}")
+            print(main_bench_timing.__doc__)
+            return 1
+    doc = run_benchmarks(ngame, repeat)
+    report_results(doc)
+    if out is not None:
+        with open(out, 'w') as fout:
+            json.dump(doc, fout, indent=1)
+        print(f"Results written to {out}")
+    return 0
+
+def main_bench_compare():
+    '''
+    Compare timing results with a baseline. Returns nonzero if any benchmark is slower.
+    If CURRENT is omitted, the benchmarks are run.
+    Usage: bbstat-bench-compare BASELINE [CURRENT] [threshold=0.2] [ngame=20] [repeat=5]
+    '''
+    fnams = []
+    threshold = 0.2
+    ngame = 20
+    repeat = 5
+    for arg in sys.argv[1:]:
+        if arg[0:10] == 'threshold=': threshold = float(arg[10:])
+        elif arg[0:6] == 'ngame=': ngame = int(arg[6:])
+        elif arg[0:7] == 'repeat=': repeat = int(arg[7:])
+        elif '=' not in arg and len(fnams) < 2: fnams.append(arg)
+        else:
+            print(f"Invalid argument: {arg}")
+            return 1
+    if len(fnams) == 0:
+        print(main_bench_compare.__doc__)
+        return 1
+    docs = []
+    for fnam in fnams:
+        with open(fnam) as fin:
+            docs.append(json.load(fin))
+    if len(docs) == 1: docs.append(run_benchmarks(ngame, repeat))
+    nslow = 0
+    print(f"{'':>32}  {'baseline':>10}  {'current':>10}  ratio")
+    for name, tbas, tcur, ratio, flag in compare_results(docs[0], docs[1], threshold):
+        sratio = '' if ratio is None else f"{ratio:5.2f}"
+        print(f"{name:>32}: {format_time(tbas):>10}  {format_time(tcur):>10}  {sratio:>5} {flag}")
+        if flag == 'SLOWER': nslow += 1
+    print(f"{nslow} benchmarks are slower by more than {100*threshold:.0f}%.")
+    return 1 if nslow else 0
@@ -0,0 +1,528 @@
+# gamegen.py
+'''
+Seeded generator of synthetic game descriptions.
+'''
+
+import os
+import random
+import sys
+
+class GameGenerator:
+    '''
+    Writes random but valid game descriptions in the format read by Reader.
+    Each half inning is simulated with a simple model of the bases, outs
+    and score and then written as batter lines with pitches, at-bat results
+    and the tagged on-base actions of the runners. Games include pitching
+    changes, defensive and pinch substitutions, OUTS:/SCORE: checks and end
+    at regulation or with MERCY, WALKOFF or TIME.
+      seed - Seed for the random numbers. Game igam depends only on seed
+             and igam so any game can be regenerated on its own.
+      innings - Number of regulation innings.
+      vbat, hbat - Number of batters in the visitor and home lineups (8-15).
+      mix - Dictionary overriding entries in default_mix.
+      mercy_runs, mercy_inning - Game is called when a team leads by
+             mercy_runs after mercy_inning innings. Zero disables.
+      max_innings - Game is called for TIME after this inning if tied.
+             Default is innings + 3.
+    '''
+
+    # Relative weights of the plate appearance results and probabilities
+    # of the other events.
+    default_mix = {
+        'K': 18, 'BB': 8, 'IBB': 0.5, 'HBP': 1, 'KD': 0.5,
+        '1B': 15, '2B': 5, '3B': 1, 'HR': 2, 'E': 4, 'GO': 22, 'FO': 18,
+        'DP': 0.4,       # Ground out with a force at second and less than two outs
+        'FC': 0.2,       # Other ground ball with a force at second and less than two outs
+        'SAC': 0.05,     # Bunt with runners on and less than two outs
+        'SF': 0.5,       # Fly out with a runner on third and less than two outs
+        'SB': 0.1,       # Steal attempt by a lead runner with the next base open
+        'CS': 0.25,      # Fraction of steal attempts that are caught
+        'WP': 0.04, 'PB': 0.02, 'BALK': 0.005,   # With runners on
+        'PITCH': 0.03,   # Pitching change before a plate appearance
+        'PH': 0.01,      # Pinch hitter
+        'PR': 0.01,      # Pinch runner
+        'DSUB': 0.05,    # Defensive switch at the start of a half inning
+        'check': 0.2,    # Each optional OUTS:, OUTn, [n] or RUN check
+    }
+    results = ['K', 'BB', 'IBB', 'HBP', 'KD', '1B', '2B', '3B', 'HR', 'E', 'GO', 'FO']
+    first_names = 'Al Bo Cy Di Ed Flo Gus Hal Ike Jo Kit Lou Max Ned Oz Pat Ray Sal Tom Vic'.split()
+    last_names = 'Adams Baker Cruz Diaz Evans Flynn Garcia Hill Ito Jones Kim Lopez Moore Nash Ortiz Park'.split()
+    team_names = 'Wildcats Bears Comets Eagles Hawks Lions Pirates Rockets Tigers Wolves'.split()
+
+    def __init__(self, seed=0, innings=7, vbat=9, hbat=9, mix=None,
+                 mercy_runs=10, mercy_inning=4, max_innings=None):
+        for nbat in (vbat, hbat):
+            if nbat < 8 or nbat > 15:
+                raise ValueError(f"GameGenerator: Lineup size {nbat} is not in the range 8-15.")
+        if innings < 1:
+            raise ValueError(f"GameGenerator: Invalid inning count {innings}.")
+        self.seed = seed
+        self.innings = innings
+        self.vbat = vbat
+        self.hbat = hbat
+        self.mix = dict(GameGenerator.default_mix)
+        if mix is not None:
+            for key in mix:
+                if key not in self.mix:
+                    raise ValueError(f"GameGenerator: Unknown event {key}.")
+            self.mix.update(mix)
+        if sum(self.mix[res] for res in GameGenerator.results) <= 0:
+            raise ValueError(f"GameGenerator: No plate appearance results have weight.")
+        self.mercy_runs = mercy_runs
+        self.mercy_inning = mercy_inning
+        self.max_innings = innings + 3 if max_innings is None else max(max_innings, innings)
+
+    def game_lines(self, igam=0):
+        '''Return the list of lines describing game igam.'''
+        gam = _GameState(self, igam)
+        lines = gam.header()
+        ing = 0
+        while True:
+            ing += 1
+            for ihalf in (0, 1):
+                lines.append(f"Inning {ing}{'tb'[ihalf]}")
+                if gam.half_inning(ing, ihalf, lines): return lines
+
+    def game_text(self, igam=0):
+        '''Return the description of game igam.'''
+        return '\n'.join(self.game_lines(igam)) + '\n'
+
+    def write_game(self, fnam, igam=0):
+        '''Write game igam to file fnam and return the file name.'''
+        with open(fnam, 'w') as fout:
+            fout.write(self.game_text(igam))
+        return fnam
+
+    def write_archive(self, dirnam, ngame, prefix='game'):
+        '''
+        Write games 0, ..., ngame-1 to files dirnam/PREFIXNNNNN.dat.
+        Returns the list of file names.
+        '''
+        os.makedirs(dirnam, exist_ok=True)
+        fnams = []
+        for igam in range(ngame):
+            fnam = os.path.join(dirnam, f"{prefix}{igam+1:05d}.dat")
+            fnams.append(self.write_game(fnam, igam))
+        return fnams
+
+class _Team:
+    '''Lineup, defense and substitutes for one team in a generated game.'''
+
+    def __init__(self, rng, name, nbat, numbase):
+        self.name = name
+        self.nbat = nbat
+        self.names = {}
+        self.lineup = [None] + [numbase + ipos for ipos in range(1, nbat+1)]   # Indexed by batting position
+        self.shown = set()           # Batting positions whose player spec has been written
+        self.next_pos = 1            # Batting position of the next batter
+        self.bench = list(range(numbase + 16, numbase + 40))
+        for num in self.lineup[1:] + self.bench:
+            self.names[num] = f"{rng.choice(GameGenerator.first_names)} {rng.choice(GameGenerator.last_names)}"
+        fielders = self.lineup[1:10]
+        while len(fielders) < 9: fielders.append(self.bench.pop(0))
+        rng.shuffle(fielders)
+        self.defense = [None] + fielders    # Indexed by field position
+        self.fielded = False
+
+    def substitute(self):
+        '''Return a new player from the bench or None if it is empty.'''
+        if len(self.bench) == 0: return None
+        return self.bench.pop(0)
+
+class _Entry:
+    '''Words for one batter line.'''
+
+    def __init__(self, ipos, spec):
+        self.ipos = ipos
+        self.spec = spec
+        self.words = []       # Pitches, tag references, result and checks
+        self.tags = {}        # Actions for this frame as a runner indexed by tag
+        self.tail = []        # End of inning checks
+        self.nref = 0         # Number of tag references in words
+        self.outs = 0         # Inning outs after the line
+
+    def line(self):
+        words = [f"{self.ipos}."]
+        if len(self.spec): words.append(self.spec)
+        words += self.words
+        for tag, acts in self.tags.items():
+            words.append(f"<{tag}>{acts[0]}")
+            words += acts[1:]
+        return ' '.join(words + self.tail)
+
+class _GameState:
+    '''State of one game while it is generated.'''
+
+    def __init__(self, gen, igam):
+        self.gen = gen
+        self.mix = gen.mix
+        self.rng = random.Random(f"bbstat {gen.seed} {igam}")
+        rng = self.rng
+        vnam, hnam = rng.sample(GameGenerator.team_names, 2)
+        self.igam = igam
+        self.teams = [_Team(rng, vnam, gen.vbat, 10), _Team(rng, hnam, gen.hbat, 50)]
+        self.score = [0, 0]
+        self.weights = [gen.mix[res] for res in GameGenerator.results]
+
+    def header(self):
+        rng = self.rng
+        return [f"Title: Synthetic game {self.igam + 1}",
+                f"Date: June {rng.randint(1, 30)}, 2033",
+                f"Location: Field {rng.randint(1, 9)}",
+                f"Visitor: {self.teams[0].name}",
+                f"Home: {self.teams[1].name}",
+                f"VBAT: {self.teams[0].nbat}",
+                f"HBAT: {self.teams[1].nbat}",
+                '']
+
+    def chance(self, key):
+        return self.rng.random() < self.mix[key]
+
+    def home_lead(self):
+        return self.score[1] - self.score[0]
+
+    def mercy(self, ing):
+        gen = self.gen
+        return gen.mercy_runs > 0 and ing >= gen.mercy_inning and abs(self.home_lead()) >= gen.mercy_runs
+
+    def half_inning(self, ing, ihalf, lines):
+        '''
+        Add the lines for a half inning to lines.
+        Returns the line ending the game or None if the game continues.
+        '''
+        gen = self.gen
+        rng = self.rng
+        bat = self.teams[ihalf]
+        fld = self.teams[1-ihalf]
+        items = []             # Lines and batter entries
+        # Defensive lineup.
+        if not fld.fielded:
+            specs = [f"1#{fld.defense[1]}({fld.names[fld.defense[1]]})"]
+            specs += [f"{ipos}#{fld.defense[ipos]}" for ipos in range(2, 10)]
+            items.append(f"DLUP[{', '.join(specs)}]")
+            fld.fielded = True
+        elif self.chance('DSUB'):
+            ipos, jpos = rng.sample(range(2, 10), 2)
+            fld.defense[ipos], fld.defense[jpos] = fld.defense[jpos], fld.defense[ipos]
+            items.append(f"DLUP[{ipos}#{fld.defense[ipos]}, {jpos}#{fld.defense[jpos]}]")
+        hin = _HalfInning(self, bat, fld, ing, ihalf)
+        end = None
+        npa = 0
+        while hin.outs < 3 and end is None:
+            if npa and self.chance('PITCH'):
+                num = fld.substitute()
+                if num is not None:
+                    fld.defense[1] = num
+                    items.append(f"PITCH#{num}({fld.names[num]})")
+            ent = hin.plate_appearance(force_out=npa >= 4*bat.nbat)
+            items.append(ent)
+            npa += 1
+            if ihalf == 1:
+                if ing >= gen.innings and self.home_lead() > 0: end = 'WALKOFF'
+                elif self.mercy(ing) and self.home_lead() > 0: end = 'MERCY'
+        hin.finish()
+        # Render the lines.
+        for item in items:
+            if isinstance(item, str):
+                lines.append(item)
+            else:
+                lines.append(item.line())
+                if len(item.tags) == 0 and self.chance('check'):
+                    lines.append(f"OUTS:{item.outs}")
+        score = f"SCORE:{self.score[0]}-{self.score[1]}"
+        if end is not None:
+            lines += [end, score]
+            return end
+        if ihalf == 0:
+            if ing >= gen.innings and self.home_lead() > 0: end = 'END'
+            elif self.mercy(ing) and self.home_lead() > 0: end = 'MERCY'
+        else:
+            if self.mercy(ing): end = 'MERCY'
+            elif ing >= gen.innings and self.home_lead() != 0: end = 'END'
+            elif ing >= gen.max_innings: end = 'TIME'
+        lines.append(score)
+        if end is not None: lines.append(end)
+        return end
+
+class _HalfInning:
+    '''Bases, outs and batter entries for a half inning being generated.'''
+
+    def __init__(self, gam, bat, fld, ing, ihalf):
+        self.gam = gam
+        self.rng = gam.rng
+        self.mix = gam.mix
+        self.bat = bat
+        self.fld = fld
+        self.ing = ing
+        self.ihalf = ihalf
+        self.bases = 4*[None]     # Entry on each base (index 0 is unused)
+        self.outs = 0
+        self.moves = {}           # Actions for each runner in the current tag
+
+    def check(self):
+        return self.gam.chance('check')
+
+    def move(self, base, nbase, act='AD'):
+        '''Move the runner on base base by nbase bases. Returns 1 if the runner scores.'''
+        ent = self.bases[base]
+        acts = self.moves.setdefault(ent, [])
+        acts += nbase*[act]
+        self.bases[base] = None
+        if base + nbase >= 4:
+            self.gam.score[self.ihalf] += 1
+            if self.check(): acts.append('RUN')
+            return 1
+        assert( self.bases[base + nbase] is None )
+        self.bases[base + nbase] = ent
+        if self.check(): acts.append(f"[{base + nbase}]")
+        return 0
+
+    def advance_all(self, nbase=1, act='AD'):
+        '''Move every runner nbase bases. Returns the number of runs.'''
+        nrun = 0
+        for base in (3, 2, 1):
+            if self.bases[base] is not None:
+                nrun += self.move(base, min(nbase, 4 - base), act)
+        return nrun
+
+    def force(self):
+        '''Move the runners forced by the batter taking first. Returns the number of runs.'''
+        nforce = 0
+        while nforce < 3 and self.bases[nforce+1] is not None: nforce += 1
+        nrun = 0
+        for base in range(nforce, 0, -1):
+            nrun += self.move(base, 1)
+        return nrun
+
+    def runner_out(self, base, label):
+        '''Put out the runner on base base with result label.'''
+        ent = self.bases[base]
+        self.moves.setdefault(ent, []).append(label)
+        self.bases[base] = None
+        self.outs += 1
+
+    def tag(self, ent):
+        '''Add a tag reference to the batter entry for the pending runner actions.'''
+        if len(self.moves) == 0: return
+        tag = str(ent.ipos) if ent.nref == 0 else f"{ent.ipos}.{ent.nref}"
+        ent.words.append('@' if ent.nref == 0 else f"@{ent.nref}")
+        ent.nref += 1
+        for rent, acts in self.moves.items():
+            assert( tag not in rent.tags )
+            rent.tags[tag] = acts
+        self.moves = {}
+
+    def runners(self):
+        return [base for base in (1, 2, 3) if self.bases[base] is not None]
+
+    def pitches(self, res):
+        '''Return the pitch string for a plate appearance with result res.'''
+        rng = self.rng
+        if res == 'IBB': return ''
+        if res == 'BB':
+            nball, nstrike, last = 3, rng.randint(0, 2), 'b'
+        elif res == 'HBP':
+            nball, nstrike, last = rng.randint(0, 3), rng.randint(0, 2), 'b'
+        elif res in ('K', 'KD'):
+            nball, nstrike, last = rng.randint(0, 3), 2, rng.choice('cs') if res == 'K' else 's'
+        else:
+            nball, nstrike, last = rng.randint(0, 3), rng.randint(0, 2), 's'
+        pits = ['b']*nball + [rng.choice('csf') for istr in range(nstrike)]
+        rng.shuffle(pits)
+        if nstrike == 2:
+            pits += ['f']*rng.choice((0, 0, 0, 1, 2))
+        return ''.join(pits) + last
+
+    def plate_appearance(self, force_out=False):
+        '''Simulate one plate appearance and return its batter entry.'''
+        rng = self.rng
+        mix = self.mix
+        gam = self.gam
+        bat = self.bat
+        ipos = bat.next_pos
+        # Pinch hitter.
+        if bat.lineup[ipos] is not None and gam.chance('PH'):
+            num = bat.substitute()
+            if num is not None:
+                bat.lineup[ipos] = num
+                bat.shown.discard(ipos)
+        spec = ''
+        if ipos not in bat.shown:
+            num = bat.lineup[ipos]
+            spec = f"#{num}({bat.names[num]})"
+            bat.shown.add(ipos)
+        ent = _Entry(ipos, spec)
+        res = 'K' if force_out else rng.choices(GameGenerator.results, gam.weights)[0]
+        pits = self.pitches(res)
+        # Pinch runner.
+        runners = self.runners()
+        if len(runners) and gam.chance('PR'):
+            num = bat.substitute()
+            if num is not None:
+                self.moves[self.bases[rng.choice(runners)]] = [f"RSUB#{num}"]
+                self.tag(ent)
+        # Runner event during the at-bat.
+        ipit = rng.randint(0, max(len(pits) - 1, 0))
+        if len(pits) > 1 and gam.chance('PITCH'):
+            num = self.fld.substitute()
+            if num is not None:
+                self.fld.defense[1] = num
+                ent.words += [pits[0:ipit], f"PITCH#{num}"] if ipit else [f"PITCH#{num}"]
+                pits = pits[ipit:]
+                ipit = rng.randint(0, len(pits) - 1)
+        if len(pits) and len(self.runners()):
+            nrun = self.runner_event()
+            if len(self.moves):
+                if ipit: ent.words.append(pits[0:ipit])
+                pits = pits[ipit:]
+                self.tag(ent)
+                if self.outs == 3:
+                    if self.check(): ent.words.append('LAB')
+                    ent.outs = self.outs
+                    return ent
+                if nrun and self.game_over():
+                    ent.outs = self.outs
+                    self.next_batter(ipos)
+                    return ent
+        if len(pits): ent.words.append(pits)
+        self.result(ent, res)
+        ent.outs = self.outs
+        self.next_batter(ipos + 1)
+        return ent
+
+    def game_over(self):
+        '''Return if the game ends in the middle of the half inning.'''
+        gam = self.gam
+        if self.ihalf == 0 or gam.home_lead() <= 0: return False
+        return self.ing >= gam.gen.innings or gam.mercy(self.ing)
+
+    def next_batter(self, ipos):
+        self.bat.next_pos = (ipos - 1) % self.bat.nbat + 1
+
+    def runner_event(self):
+        '''Add a steal, wild pitch, passed ball or balk. Returns the number of runs.'''
+        rng = self.rng
+        gam = self.gam
+        lead = max(self.runners())
+        if lead < 3 and gam.chance('SB'):
+            if gam.chance('CS'):
+                self.runner_out(lead, f"2-{6 if lead == 1 else 5}:CS")
+                return 0
+            return self.move(lead, 1, 'SB')
+        for act in ('WP', 'PB', 'BALK'):
+            if gam.chance(act): return self.advance_all(1, act)
+        return 0
+
+    def result(self, ent, res):
+        '''Add the at-bat result res and the runner moves it causes.'''
+        rng = self.rng
+        gam = self.gam
+        bases = self.bases
+        nrbi = 0
+        onbase = 0          # Base reached by the batter
+        outs0 = self.outs
+        label = res
+        if res == 'KD' and bases[1] is not None: res = 'K'
+        if res == 'K':
+            label = 'KC' if ent.words[-1][-1] == 'c' else 'KS'
+            self.outs += 1
+        elif res == 'KD':
+            onbase = 1
+        elif res in ('BB', 'IBB', 'HBP'):
+            nrbi = self.force()
+            onbase = 1
+        elif res == '1B':
+            for base in self.runners()[::-1]:
+                nbase = 1
+                if base == 2 and rng.random() < 0.6: nbase = 2
+                if base == 1 and bases[3] is None and rng.random() < 0.25: nbase = 2
+                nrbi += self.move(base, nbase)
+            onbase = 1
+        elif res == '2B':
+            for base in self.runners()[::-1]:
+                nbase = 2 if base == 1 and rng.random() < 0.6 else 4 - base
+                nrbi += self.move(base, nbase)
+            onbase = 2
+        elif res == '3B':
+            for base in self.runners()[::-1]: nrbi += self.move(base, 4 - base)
+            onbase = 3
+        elif res == 'HR':
+            for base in self.runners()[::-1]: nrbi += self.move(base, 4 - base)
+            nrbi += 1
+            onbase = 4
+        elif res == 'E':
+            label = f"E{rng.randint(1, 9)}"
+            self.advance_all()
+            onbase = 1
+        elif res == 'GO':
+            ifld = rng.choice((1, 3, 4, 5, 6, 6))
+            label = f"{ifld}-3" if ifld != 3 else '3U'
+            cover = 6 if ifld == 4 else 4
+            if bases[1] is not None and self.outs < 2 and ifld != 3 and gam.chance('DP'):
+                self.runner_out(1, f"{ifld}-{cover}:DP")
+                self.tag(ent)
+                label = f"{cover}-3:DP"
+                self.outs += 1
+            elif bases[1] is not None and self.outs < 2 and ifld != 3 and gam.chance('FC'):
+                self.runner_out(1, f"{ifld}-{cover}")
+                self.tag(ent)
+                label = 'FC'
+                onbase = 1
+            elif len(self.runners()) and self.outs < 2 and gam.chance('SAC'):
+                label = f"{rng.choice((1, 2, 5))}-3:SAC"
+                self.outs += 1
+                nrbi = self.advance_all()
+            else:
+                self.outs += 1
+                if self.outs < 3:
+                    if bases[3] is not None and outs0 < 2 and rng.random() < 0.5: nrbi += self.move(3, 1)
+                    if bases[2] is not None and bases[3] is None and rng.random() < 0.5: self.move(2, 1)
+        elif res == 'FO':
+            if bases[3] is not None and self.outs < 2 and gam.chance('SF'):
+                label = f"SF{rng.randint(7, 9)}"
+                self.outs += 1
+                nrbi = self.move(3, 1)
+            else:
+                kind = rng.choice(('F', 'F', 'F', 'L', 'FF', 'FO'))
+                label = f"{kind}{rng.randint(1, 9)}"
+                self.outs += 1
+        ent.words.append(label)
+        self.tag(ent)
+        ent.words += nrbi*['RBI']
+        if onbase < 4 and onbase > 0:
+            bases[onbase] = ent
+            if self.check(): ent.words.append(f"[{onbase}]")
+        elif onbase == 4:
+            gam.score[self.ihalf] += 1
+            if self.check(): ent.words.append('RUN')
+        elif self.outs > outs0 and self.check():
+            ent.words.append(f"OUT{self.outs}")
+
+    def finish(self):
+        '''Add the left on base checks at the end of the half inning.'''
+        for base in self.runners():
+            self.bases[base].tail.append('LOB')
+
+def main_gen_games():
+    '''
+    Write an archive of synthetic games.
+    Usage: bbstat-gen-games DIR [ngame=1] [seed=0] [innings=7] [vbat=9] [hbat=9]
+    '''
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print(main_gen_games.__doc__)
+        return 1
+    dirnam = sys.argv[1]
+    ngame = 1
+    opts = {}
+    for arg in sys.argv[2:]:
+        key, sep, val = arg.partition('=')
+        if key == 'ngame' and sep:
+            ngame = int(val)
+        elif key in ('seed', 'innings', 'vbat', 'hbat') and sep:
+            opts[key] = int(val)
+        else:
+            print(f"Invalid argument: {arg}")
+            return 1
+    fnams = GameGenerator(**opts).write_archive(dirnam, ngame)
+    print(f"Wrote {len(fnams)} games to {dirnam}")
+    return 0
@@ -0,0 +1,56 @@
+# games.py
+'''
+Game descriptions used by the tests.
+'''
+
+import os
+
+sample_game = '''\
+Title: Test game
+Date: June 1, 2033
+Location: Field
+Visitor: Guests
+Home: Homers
+VBAT: 9
+HBAT: 9
+
+Inning 1t
+DLUP[1#21(Pete Pitcher), 2#22, 3#23, 4#24, 5#25, 6#26, 7#27, 8#28, 9#29]
+1. #11(Al One) bcb 1B <2>SB <3>T <4>AD RUN
+2. #12(Bo Two) b @ s 6-3 OUT1
+3. #13(Cy Three) @ cc K [0]
+4. #14(Di Four) bb 2B @ RBI [2]
+OUTS:2
+5. #15(Ed Five) f F8
+SCORE:1-0
+Inning 1b
+DLUP[1#11, 2#12, 3#13, 4#14, 5#15, 6#16, 7#17, 8#18, 9#19]
+1. #21(Pete Pitcher) bbbb BB <2>WP <3>AD LOB
+2. #22 @ c HBP <3>AD
+3. #23 @ s E6
+4. #24 bs 4-3
+5. #25 FF2
+6. #26 cfs KS
+SCORE:1-0
+Inning 2t
+6. #16 b HR RBI
+7. #17 bbbb IBB <8>6-4:DP
+PITCH#31(New Arm)
+8. #18 @ s 4-3:DP
+9. #19 3U
+SCORE:2-0
+Inning 2b
+7. #27 HR RBI
+8. #28 bbbb BB <9>RSUB#30 SB
+9. #29 @ ccc K
+1. s PITCH#32 L7
+2. FO9
+TIME
+'''
+
+def write_game(dirnam, name, text=sample_game):
+    '''Write a game description to dirnam/name.dat and return the file name.'''
+    fnam = os.path.join(dirnam, name + '.dat')
+    with open(fnam, 'w') as fout:
+        fout.write(text)
+    return fnam
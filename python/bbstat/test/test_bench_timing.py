@@ -0,0 +1,19 @@
+from bbstat.test.bench_timing import run_benchmarks
+from bbstat.test.bench_timing import compare_results
+
+def test_run_benchmarks():
+    doc = run_benchmarks(ngame=1, repeat=1)
+    res = doc['results']
+    assert( doc['ngame'] == 2 )
+    for name in ['reader.game', 'add_action.result', 'add_action.tagref', 'find_with_key.history.10000',
+                 'lineup.set_from_string', 'gamestats.increment_bat', 'gamestats.merge',
+                 'batstats.init', 'pitchstats.init']:
+        assert( res[name] > 0 )
+
+def test_compare_results():
+    base = {'results': {'a': 1.0, 'b': 1.0, 'c': 1.0, 'd': 1.0}}
+    cur = {'results': {'a': 1.1, 'b': 1.5, 'c': 0.5, 'e': 1.0}}
+    rows = compare_results(base, cur, threshold=0.2)
+    assert( [(row[0], row[4]) for row in rows] ==
+            [('a', ''), ('b', 'SLOWER'), ('c', 'faster'), ('d', 'missing'), ('e', 'new')] )
+    assert( rows[1][3] == 1.5 )
@@ -1,6 +1,27 @@
 import bbstat
 
+def test_history():
+    hist = bbstat.CounterHistory()
+    assert( len(hist) == 0 )
+    assert( hist.find() is None )
+    assert( hist.find_with_key(3) == (None, None) )
+    hist.set(2, 52)
+    hist.set(5, 55)
+    hist.set(9, 59)
+    assert( hist.find(1) is None )
+    assert( hist.find(2) == 52 )
+    assert( hist.find(4) == 52 )
+    assert( hist.find_with_key(8) == (55, 5) )
+    assert( hist.find_with_key() == (59, 9) )
+    hist.set(5, 65)
+    hist.set(3, 53)
+    assert( hist.keys() == [2, 3, 5, 9] )
+    assert( hist.find(4) == 53 )
+    assert( hist.find(5) == 65 )
+    assert( bbstat.Counter.find(hist, 100) == 59 )
+
 def main_test_counter():
+    test_history()
     ctr = bbstat.Counter()
     assert( ctr.get() == 0 )
     assert( ctr.next() == 1 )
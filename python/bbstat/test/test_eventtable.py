@@ -0,0 +1,100 @@
+import bbstat
+import numpy
+import os
+import tempfile
+from bbstat.test.games import sample_game
+from bbstat.test.games import write_game
+
+def check_totals(evts, ostats, dstats):
+    '''Check the totals from the events match the stats except balls and strikes.'''
+    bstats = ostats.bat_stats()
+    btots = evts.bat_totals().reindex(bstats.index, fill_value=0)
+    for col in btots.columns:
+        assert( (btots[col] == bstats[col]).all() )
+    pstats = dstats.pitch_stats()
+    ptots = evts.pitch_totals().reindex(pstats.index, fill_value=0)
+    for col in ptots.columns:
+        if col in ['b', 's']: continue
+        assert( (ptots[col] == pstats[col]).all() )
+
+def test_event_table():
+    lines = sample_game.splitlines()
+    prs = bbstat.GameParser()
+    assert( prs.feed_lines(lines) == 0 )
+    game = prs.game()
+    evts = game.events()
+    arr = evts.values()
+    names = bbstat.EventTable.names
+    assert( arr.dtype == bbstat.EventTable.dtype and len(evts) == 24 )
+    assert( (numpy.diff(arr['idx']) > 0).all() and (arr['game'] == 0).all() )
+    assert( arr['pa'].sum() == 20 and arr['runs'].sum() == 3 )
+    assert( [names[code] for code in arr['code'][0:3]] == ['b1', 'sb', 'out'] )
+    # Di Four doubles in Al One with two out.
+    row = arr[4]
+    assert( names[row['code']] == 'b2' and row['batter'] == 14 and row['pitcher'] == 21 )
+    assert( row['outs'] == 2 and row['bases'] == 4 and row['runs'] == 1 and row['rbi'] == 1 )
+    # Stolen base by Al One while Bo Two is at bat.
+    row = arr[1]
+    assert( row['runner'] == 11 and row['batter'] == 12 and not row['pa'] and row['bases'] == 1 )
+    # Out on base before the batter's result after a pitching change.
+    row = arr[15]
+    assert( names[row['code']] == 'po' and row['runner'] == 17 and row['pitcher'] == 31 )
+    assert( row['nout'] == 1 and row['half'] == 0 and row['inning'] == 2 )
+    assert( (arr['half'][6:13] == 1).all() )
+    vevts = evts.team_rows('Guests')
+    assert( len(vevts) + len(evts.team_rows('Guests', offense=False)) == len(evts) )
+    check_totals(vevts, game.vstats, game.hstats)
+    check_totals(evts.team_rows('Homers'), game.hstats, game.vstats)
+    # Events are recorded as the innings end if the frames are dropped.
+    prs = bbstat.GameParser(keep_frames=False, keep_events=True)
+    assert( prs.feed_lines(lines) == 0 )
+    assert( numpy.array_equal(prs.game().events().values(), arr) )
+    assert( len(prs.summary().events) == 24 )
+    prs = bbstat.GameParser(keep_frames=False)
+    assert( prs.feed_lines(lines) == 0 )
+    assert( not prs.game().has_events() and prs.summary().events is None )
+
+def test_event_table_active_frames():
+    # Ed Five is left at bat so the top of the first ends with frames active.
+    lines = sample_game.replace('5. #15(Ed Five) f F8', '5. #15(Ed Five) f').splitlines()
+    prs = bbstat.GameParser()
+    prs.feed_lines(lines)
+    game = prs.game()
+    assert( any(frm.is_active() for frm in game.visitor.inning_frames(1)) )
+    evts = game.events()
+    arr = evts.values()
+    # The later runs, RBI and outs are not assigned to that half inning.
+    first = (arr['inning'] == 1) & (arr['half'] == 0)
+    assert( arr['runs'][first].sum() == 1 and arr['nout'][first].sum() == 2 )
+    assert( arr['runs'].sum() == game.visitor.runs() + game.home.runs() )
+    check_totals(evts.team_rows('Guests'), game.vstats, game.hstats)
+    check_totals(evts.team_rows('Homers'), game.hstats, game.vstats)
+    prs = bbstat.GameParser(keep_frames=False, keep_events=True)
+    prs.feed_lines(lines)
+    assert( numpy.array_equal(prs.game().events().values(), arr) )
+
+def test_event_table_season():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in ['g01', 'g02', 'g03']:
+            write_game(tmpdir, name)
+        pattern = os.path.join(tmpdir, 'g*.dat')
+        srdr = bbstat.SeasonReader(pattern, jobs=1)
+        assert( srdr.events() is None )
+        srdr = bbstat.SeasonReader(pattern, jobs=2, events=True)
+        evts = srdr.events()
+        arr = evts.values()
+        assert( len(evts) == 72 and list(numpy.bincount(arr['game'])) == [24, 24, 24] )
+        assert( evts.game_names() == srdr.fnams() )
+        assert( evts.teams() == 3*[('Guests', 'Homers')] )
+        check_totals(evts.team_rows('Guests'), srdr.teamstats('Guests'), srdr.teamstats('Homers'))
+        assert( evts.bat_totals().loc[14, 'rbi'] == 3 )
+        for ext in ['npz', 'npy']:
+            fnam = os.path.join(tmpdir, 'events.' + ext)
+            evts.save(fnam)
+            loaded = bbstat.EventTable.load(fnam)
+            assert( numpy.array_equal(loaded.values(), arr) )
+        assert( loaded.teams() == [] )
+        assert( bbstat.EventTable.load(os.path.join(tmpdir, 'events.npz')).teams() == evts.teams() )
+        fnam = os.path.join(tmpdir, 'other.npy')
+        numpy.save(fnam, numpy.arange(3))
+        assert( bbstat.EventTable.load(fnam) is None )
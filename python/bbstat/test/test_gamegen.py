@@ -0,0 +1,52 @@
+import bbstat
+import io
+import contextlib
+import tempfile
+from bbstat.test.gamegen import GameGenerator
+
+def parse(text):
+    '''Parse a game description and return the parser and its printed output.'''
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        prs = bbstat.GameParser()
+        prs.feed_lines(text.splitlines())
+    return prs, out.getvalue()
+
+def test_generated_games():
+    gens = [GameGenerator(),
+            GameGenerator(seed=1, innings=3, vbat=8, hbat=15, mercy_runs=0),
+            GameGenerator(seed=2, mix={'HR': 30, 'BB': 30, 'SB': 0.5, 'WP': 0.2, 'PR': 0.2,
+                                       'PH': 0.2, 'PITCH': 0.2, 'DSUB': 0.5, 'check': 1.0}),
+            GameGenerator(seed=3, mix={'GO': 100, 'DP': 1.0, 'FC': 1.0, 'SAC': 0.5, 'SF': 1.0})]
+    calls = set()
+    words = set()
+    for gen in gens:
+        for igam in range(25):
+            text = gen.game_text(igam)
+            prs, out = parse(text)
+            game = prs.game()
+            assert( not prs.stopped() and prs.nerr == 0 and out == '' )
+            assert( game.nerror() == 0 and game.error == 0 and not game.is_active() )
+            calls.add(game.call_reason())
+            words.update(text.split())
+    assert( calls == {'', 'MERCY', 'WALKOFF', 'TIME'} )
+    for word in ['@1', 'PITCH#', 'OUTS:', 'SCORE:', 'RBI', 'LOB', 'HR', 'IBB', '4-3:DP', 'FC',
+                 '1-3:SAC', 'SF7', 'KC', 'RUN', '[2]', '>SB', '>WP', '>2-6:CS', '>RSUB#', '>AD']:
+        assert( any(word in w for w in words) )
+    assert( any(w.startswith('DLUP[') and not w.startswith('DLUP[1#') for w in words) )
+
+def test_generator_seed():
+    gen = GameGenerator(seed=7)
+    text = gen.game_text(4)
+    assert( text == GameGenerator(seed=7).game_text(4) )
+    assert( text != gen.game_text(5) and text != GameGenerator(seed=8).game_text(4) )
+    assert( gen.game_lines(4)[0] == 'Title: Synthetic game 5' )
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fnams = gen.write_archive(tmpdir, 3)
+        rdr = bbstat.Reader(fnams[2])
+        assert( rdr.nerr == 0 and open(fnams[2]).read() == gen.game_text(2) )
+    try:
+        GameGenerator(vbat=7)
+        assert( False )
+    except ValueError:
+        pass
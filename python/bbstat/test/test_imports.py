@@ -0,0 +1,31 @@
+import bbstat
+import subprocess
+import sys
+
+def loaded_modules(code):
+    '''Run code in a fresh interpreter and return the set of loaded module names.'''
+    code += "\nimport sys\nprint(' '.join(sys.modules))"
+    res = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True)
+    return set(res.stdout.split())
+
+def test_lazy_import():
+    mods = loaded_modules('import bbstat')
+    assert( 'pandas' not in mods and 'numpy' not in mods )
+    assert( 'bbstat.data.game' not in mods and 'importlib.metadata' not in mods )
+    mods = loaded_modules('import bbstat.test.test_counter')
+    assert( 'pandas' not in mods )
+    code = ("import bbstat\n"
+            "from bbstat.test.games import sample_game\n"
+            "prs = bbstat.GameParser()\n"
+            "assert prs.feed_lines(sample_game.splitlines()) == 0")
+    assert( 'pandas' not in loaded_modules(code) )
+
+def test_lazy_names():
+    assert( bbstat.Frame is bbstat.data.frame.Frame )
+    assert( 'GameStats' in dir(bbstat) )
+    assert( bbstat.version == bbstat.__version__ )
+    try:
+        bbstat.NoSuchName
+        assert( False )
+    except AttributeError:
+        pass
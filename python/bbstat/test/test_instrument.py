@@ -0,0 +1,60 @@
+import bbstat
+import sys
+import tempfile
+from bbstat.test.games import write_game
+
+def test_instrument():
+    orig = bbstat.Frame.__dict__['add_action']
+    find = bbstat.Counter.__dict__['find_with_key']
+    ins = bbstat.Instrument()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fnam = write_game(tmpdir, 'g01')
+        bbstat.Reader(fnam)
+        assert( ins.results() == {} )
+        with ins:
+            assert( ins.enabled() )
+            assert( bbstat.Frame.__dict__['add_action'] is not orig )
+            assert( bbstat.Instrument().enable() == 1 )
+            rdr = bbstat.Reader(fnam)
+        assert( not ins.enabled() )
+        assert( bbstat.Frame.__dict__['add_action'] is orig )
+        assert( bbstat.Counter.__dict__['find_with_key'] is find )
+        assert( rdr.summary().score == '2-1' )
+        res = ins.results()
+        bbstat.Reader(fnam)
+        assert( ins.results() == res )
+    for oper in ['reader.line', 'frame.add_action', 'atbatresult.get', 'counter.find', 'gamestats.increment']:
+        assert( oper in res )
+    assert( res['reader.line']['inning']['count'] == 4 )
+    assert( res['frame.add_action']['tagref']['count'] == 7 )
+    assert( res['gamestats.increment']['bat.pa']['count'] == 20 )
+    assert( res['counter.find']['history']['seconds'] > 0 )
+    assert( 'frame.add_action' in ins.table() )
+    prom = ins.prometheus()
+    assert( '# TYPE bbstat_calls_total counter' in prom )
+    assert( 'bbstat_calls_total{operation="reader.line",kind="inning"} 4\n' in prom )
+    assert( bbstat.Instrument.prometheus_label('a"b\\') == 'a\\"b\\\\' )
+    ins.reset()
+    assert( ins.results() == {} )
+
+def test_instrument_operations():
+    find = bbstat.Counter.__dict__['find_with_key']
+    ins = bbstat.Instrument(['frame.add_action'])
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fnam = write_game(tmpdir, 'g01')
+        with ins:
+            assert( bbstat.Counter.__dict__['find_with_key'] is find )
+            bbstat.Reader(fnam)
+    res = ins.results()
+    assert( list(res) == ['frame.add_action'] )
+    assert( res['frame.add_action']['tagref']['count'] == 7 )
+
+def test_main_profile(capsys, monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fnam = write_game(tmpdir, 'g01')
+        monkeypatch.setattr(sys, 'argv', ['bbstat-profile', fnam, 'format=prom'])
+        assert( bbstat.main_profile() == 0 )
+        assert( 'bbstat_seconds_total{operation="frame.add_action"' in capsys.readouterr().out )
+        monkeypatch.setattr(sys, 'argv', ['bbstat-profile', fnam + 'x'])
+        assert( bbstat.main_profile() == 1 )
+    assert( bbstat.Instrument.active is None )
@@ -1,8 +1,216 @@
 import bbstat
 import sys
-import pandas
+from bbstat.test.games import sample_game
+from bbstat.test.gamegen import GameGenerator
+
+def test_parser_feed():
+    lines = sample_game.splitlines()
+    prs = bbstat.GameParser('sample')
+    assert( prs.game() is None )
+    for line in lines[0:20]:
+        assert( prs.feed(line) == 0 )
+    assert( prs.game().score() == '1-0' )
+    assert( prs.feed_lines(line for line in lines[20:]) == 0 )
+    game = prs.game()
+    assert( prs.nline() == len(lines) )
+    assert( prs.nerr == 0 and game.nerror() == 0 )
+    assert( game.score() == '2-1' and game.call_reason() == 'TIME' )
+    assert( prs.summary().fnam == 'sample' )
+    # Parsing stops at the first failed line.
+    prs = bbstat.GameParser()
+    assert( prs.feed_lines(lines[0:10] + ['1. #11 XYZ'] + lines[10:]) == 1 )
+    assert( prs.stopped() and prs.nerr == 1 )
+    assert( prs.nline() == 11 )
+    assert( prs.feed(lines[10]) == 1 )
+
+def test_action_dispatch():
+    tokenize = bbstat.Frame.tokenize
+    assert( tokenize('SB').kind == 'onbase' )
+    assert( tokenize('OUTS:2').kind == 'out' )
+    assert( tokenize('PITCH#31(New Arm)').kind == 'pitcher' )
+    assert( tokenize('bcs').kind == 'pitches' )
+    assert( tokenize('6-3').kind == 'result' )
+    assert( tokenize('<2>SB').kind == 'tagged' )
+    assert( tokenize('1B,RBI').kind == 'multi' )
+    assert( tokenize('SB') is tokenize('SB') )
+    # Register a new action code.
+    seen = []
+    def handle_hustle(frm, tok, idx, dotag):
+        seen.append((frm.player(), tok.code))
+        return 0
+    bbstat.Frame.register_action('HUSTLE', handle_hustle)
+    try:
+        assert( tokenize('HUSTLE').kind == 'HUSTLE' )
+        prs = bbstat.GameParser()
+        text = sample_game.replace('4. #14(Di Four) bb 2B', '4. #14(Di Four) bb 2B HUSTLE')
+        assert( prs.feed_lines(text.splitlines()) == 0 )
+        assert( seen == [(14, 'HUSTLE')] )
+    finally:
+        assert( bbstat.Frame.unregister_action('HUSTLE') == 0 )
+    assert( tokenize('HUSTLE').kind == 'result' )
+    assert( bbstat.Frame.unregister_action('HUSTLE') == 1 )
+    # Prefixes can be removed too.
+    bbstat.Frame.register_action('HUS', handle_hustle, 'hus', prefix=True)
+    try:
+        assert( tokenize('HUSTLE').kind == 'hus' )
+    finally:
+        assert( bbstat.Frame.unregister_action('HUS', prefix=True) == 0 )
+    assert( tokenize('HUSTLE').kind == 'result' and tokenize('RSUB#30').kind == 'rsub' )
+
+def test_inning_state():
+    lines = sample_game.splitlines()
+    prs = bbstat.GameParser()
+    # Play through the E6 in the bottom of the first.
+    assert( prs.feed_lines(lines[0:22]) == 0 )
+    half = prs.game().home
+    frm = half.frame()
+    state = half.inning_state()
+    assert( frm.inning_state() is state )
+    assert( [frm.inning_base_frame(bas) for bas in range(4)] == [None] + frm.inning_frames()[::-1] )
+    assert( frm.get_onbase_frame(3).player() == 21 )
+    assert( frm.get_onbase_frame(1) is None )
+    assert( frm.inning_outs() == 0 and frm.inning_runs() == 0 )
+    assert( prs.feed(lines[22]) == 0 )
+    frm = half.frame()
+    assert( frm.inning_outs() == 1 and frm.inning_out_frame(1) is frm )
+    assert( frm.inning_base_frame(0) is None )
+    # The visiting first inning is found from its frames and its history.
+    vis = prs.game().visitor
+    frms = vis.inning_frames()
+    assert( vis.inning_runs(1) == 1 and vis.line_score() == [1] )
+    assert( frms[0].inning_outs() == 3 )
+    idx = frms[3].index_start()
+    assert( frms[0].inning_base_frame(0, idx) is frms[3] )
+    assert( frms[0].inning_base_frame(3, idx) is frms[0] )
+    assert( frms[0].inning_outs(idx) == 2 and frms[0].inning_runs(idx) == 0 )
+    assert( frms[0].inning_runs(frms[4].index_start()) == 1 )
+    assert( frms[0].inning_out_frame(3, idx) is None )
+
+def test_frame_iteration():
+    lines = sample_game.splitlines()
+    prs = bbstat.GameParser()
+    assert( prs.feed_lines(lines) == 0 )
+    half = prs.game().visitor
+    frms = half.inning_frames(1)
+    assert( [frm.lineup_position() for frm in frms] == [1, 2, 3, 4, 5] )
+    assert( half.first_frame(1) is frms[0] and half.last_frame(1) is frms[-1] )
+    assert( list(frms[2].iter_preceding()) == frms[1::-1] )
+    assert( list(frms[2].iter_following()) == frms[3:] )
+    assert( list(frms[0].iter_following(frms[3].index_start())) == frms[1:4] )
+    assert( list(frms[4].iter_preceding(frms[1].index_start())) == frms[1::-1] )
+    assert( frms[4].inning_frames(frms[2].index_start()) == frms[0:3] )
+    assert( half.frame() is half.last_frame(2) and half.frame().inning() == 2 )
+    # An inning longer than the recursion limit.
+    nbat = sys.getrecursionlimit() + 100
+    plays = []
+    for ibat in range(nbat):
+        ipos = ibat%9 + 1
+        spec = f" #{10+ipos}" if ibat < 9 else ''
+        plays.append(f"{ipos}.{spec} HR")
+    prs = bbstat.GameParser()
+    assert( prs.feed_lines(lines[0:10] + plays) == 0 )
+    frm = prs.game().visitor.frame()
+    assert( len(frm.preceding_frames()) == nbat - 1 )
+    assert( len(frm.inning_frames()) == nbat and frm.inning_runs() == nbat )
+
+def test_frame_history():
+    prs = bbstat.GameParser()
+    assert( prs.feed_lines(sample_game.splitlines()) == 0 )
+    frms = prs.game().home.inning_frames(2)
+    frm = frms[1]
+    assert( not hasattr(frm, '__dict__') )
+    assert( frm.sequence() == 'bbbb BB SB' )
+    assert( frm.pitches() == ['bbbb'] and frm.actions() == ['BB', 'SB'] )
+    # Runner substitution.
+    assert( frm.player() == 30 and frm.player(frm.index_start()) == 28 )
+    assert( frm.base() == 2 and frm.base(frm.index_start()) == 0 )
+    assert( bbstat.Frame.code_string(bbstat.Frame.intern_code('BB')) == 'BB' )
+
+def test_state_at():
+    # The state recorded live after the last line for each index must be
+    # the same as that found later for that index. A batter is added to the
+    # batting lineup at the index before the batter's frame starts.
+    prs = bbstat.GameParser()
+    live = {}
+    for line in sample_game.splitlines():
+        assert( prs.feed(line) == 0 )
+        if prs.game() is None: continue
+        state = prs.game().state_at()
+        live[state.idx] = state
+        if line[0:5] == '4. #1': mid = state
+    game = prs.game()
+    for idx, state in live.items():
+        assert( game.state_at(idx)._replace(offense=None) == state._replace(offense=None) )
+    assert( game.state_at(0).inning == 0 )
+    assert( mid.inning == 1 and mid.half == 'top' and mid.outs == 2 )
+    assert( mid.bases == (None, 14, None) and mid.batter is None )
+    assert( mid.pitcher == 21 and mid.score() == '1-0' )
+    assert( mid.offense[4] == 14 and mid.defense[2] == 22 )
+    state = game.state_at()
+    assert( state.half == 'none' and state.score() == game.score() )
+
+def scan_state(frms, idx):
+    '''
+    Return the base occupants, batter and runs for index idx found by scanning
+    the frames of an inning. A base shared while the advances of a tag group
+    are recorded is held by the last frame on it.
+    '''
+    players = 4*[None]
+    nrun = 0
+    for frm in frms:
+        if frm.index_start() > idx: continue
+        base = frm.base(idx)
+        if base == 4: nrun += 1
+        elif base < 4 and frm.is_active(idx): players[base] = frm.player(idx)
+    return tuple(players[1:]), players[0], nrun
+
+def test_state_at_scan():
+    # Every index of generated games matches a scan of the frames.
+    gen = GameGenerator(11)
+    nqry = 0
+    for igam in range(8):
+        prs = bbstat.GameParser()
+        assert( prs.feed_lines(gen.game_lines(igam)) == 0 )
+        game = prs.game()
+        for half, hlab in [(game.visitor, 'top'), (game.home, 'bottom')]:
+            for ing in half.innings():
+                frms = half.inning_frames(ing)
+                if len(frms) == 0: continue
+                istate = half.inning_state(ing)
+                idx2 = max(game.index() if frm.index_end() is None else frm.index_end() for frm in frms)
+                for idx in range(frms[0].index_start(), idx2):
+                    state = game.state_at(idx)
+                    assert( (state.inning, state.half) == (ing, hlab) )
+                    assert( (state.bases, state.batter, istate.runs(idx)) == scan_state(frms, idx) )
+                    nqry += 1
+    assert( nqry > 2000 )
+
+def test_drop_frames():
+    lines = sample_game.splitlines()
+    prs1 = bbstat.GameParser()
+    prs2 = bbstat.GameParser(keep_frames=False)
+    assert( prs1.feed_lines(lines) == 0 and prs2.feed_lines(lines) == 0 )
+    game1 = prs1.game()
+    game2 = prs2.game()
+    assert( len(game1.home.frames()) > 0 and game2.home.frames() == [] )
+    assert( game2.visitor.innings() == game1.visitor.innings() )
+    assert( game2.visitor.line_score() == game1.visitor.line_score() )
+    assert( game2.home.inning_state(1).outs() == 3 )
+    summ1 = prs1.summary()
+    summ2 = prs2.summary()
+    assert( summ2.score == summ1.score and summ2.hline == summ1.hline )
+    assert( summ2.nerror() == summ1.nerror() == 0 )
+    assert( summ2.vstats.bat_stats().equals(summ1.vstats.bat_stats()) )
+    assert( summ2.hstats.pitch_stats().equals(summ1.hstats.pitch_stats()) )
+    mem1 = game1.memory_footprint()
+    mem2 = game2.memory_footprint()
+    assert( sorted(mem1) == ['frames', 'game', 'halfgames', 'lineups', 'stats', 'total'] )
+    assert( mem1['total'] == sum(mem1[key] for key in mem1 if key != 'total') )
+    assert( mem1['frames'] > 0 and mem2['frames'] == 0 )
+    assert( mem2['stats'] == mem1['stats'] and mem2['total'] < mem1['total'] )
 
 def main_test_reader():
+    import pandas
     pandas.options.display.width = 0
     gnam = 'tob02'
     dbg = 0
@@ -46,3 +254,18 @@ def main_test_reader():
     if show == 'bat': game.hstats.display_bat_stats()
     if show == 'pitch': game.hstats.display_pitch_stats()
     return 0
+
+def test_frame_lookup():
+    prs = bbstat.GameParser()
+    assert( prs.feed_lines(sample_game.splitlines()) == 0 )
+    # Al One steals second and advances to third and home.
+    frm = prs.game().visitor.frames()[0]
+    assert( [frm.base(idx) for idx in [2, 5, 6, 16, 24, 36, 45]] == [0, 0, 1, 2, 3, 4, 4] )
+    assert( frm.player(frm.index_start() - 1) is None and frm.player(45) == 11 )
+    # Runner #30 replaces #28 on first.
+    frm = [frm for frm in prs.game().home.frames() if frm.player() == 30][0]
+    assert( [frm.player(idx) for idx in [113, 121, 122, 135]] == [28, 28, 30, 30] )
+    assert( frm.base(121) == 1 and frm.base(123) == 2 )
+    # The string has the pitches followed by each action.
+    assert( str(frm) == 'bbbb:BB:SB' )
+    assert( str(prs.game().home.frames()[0]) == 'bbbb:BB:WP:AD' )
@@ -0,0 +1,25 @@
+import bbstat
+
+def test_atbat_result():
+    AtBatResult = bbstat.AtBatResult
+    res = AtBatResult.get('6-4-3:DP')
+    assert( res is AtBatResult.get('6-4-3:DP') )
+    assert( res.valid and res.batter_out )
+    assert( res.putouts == (3,) and res.assists == (6,) )
+    assert( res.causes == ('DP',) )
+    res = AtBatResult.get('2B!')
+    assert( res.valid and res.excellent and res.base == 2 and res.hit_base == 2 )
+    res = AtBatResult.get('E6')
+    assert( res.is_error and res.base == 1 and res.errors == (6,) )
+    res = AtBatResult.get('SF7:SAC')
+    assert( res.is_sacrifice_fly and res.putouts == (7,) and 'SAC' in res.causes )
+    assert( AtBatResult.get('K').is_k and AtBatResult.get('WP:K').is_k )
+    assert( not AtBatResult.get('XYZ').valid )
+    assert( not AtBatResult.get('6-0').valid )
+    assert( '9-9-9' in AtBatResult.labels() )
+    try:
+        res.base = 3
+        assert( False )
+    except AttributeError:
+        pass
+    assert( AtBatResult('1B') is not AtBatResult('1B') )
@@ -0,0 +1,101 @@
+import bbstat
+import numpy
+import os
+import sys
+import tempfile
+from bbstat.test.games import write_game
+from bbstat.test.gamegen import GameGenerator
+
+def season_events(tmpdir):
+    for name in ['g01', 'g02', 'g03']:
+        write_game(tmpdir, name)
+    srdr = bbstat.SeasonReader(os.path.join(tmpdir, 'g*.dat'), jobs=1, events=True)
+    return srdr.events()
+
+def test_run_expectancy():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        evts = season_events(tmpdir)
+    arr = evts.values()
+    rex = bbstat.RunExpectancy(evts)
+    assert( len(rex.values()) == len(evts) and rex.complete().all() )
+    # The runs to the end of the half-inning from its first event are all its runs.
+    key = (arr['game'].astype(numpy.int64)*1000 + arr['inning'])*2 + arr['half']
+    halves, first, inv = numpy.unique(key, return_index=True, return_inverse=True)
+    runs = numpy.bincount(inv, arr['runs'])
+    assert( (rex.runs_to_end()[first] == runs).all() )
+    assert( (rex.states()[first] == 0).all() )
+    assert( (rex.next_states()[numpy.r_[first[1:] - 1, len(arr) - 1]] == 24).all() )
+    # The matrix is the mean of these over the plate appearances in each state.
+    mat = rex.matrix()
+    cnts = rex.counts()
+    assert( mat.shape == (8, 3) and list(mat.columns) == [0, 1, 2] )
+    assert( cnts.values.sum() == arr['pa'].sum() )
+    for outs in range(3):
+        for bases, label in enumerate(bbstat.RunExpectancy.bases_labels):
+            sel = arr['pa'] & (arr['outs'] == outs) & (arr['bases'] == bases)
+            assert( cnts.loc[label, outs] == sel.sum() )
+            if sel.any():
+                assert( numpy.isclose(mat.loc[label, outs], rex.runs_to_end()[sel].mean()) )
+    assert( cnts.loc['---', 0] >= len(halves) )
+    # The values in a half-inning add to its runs less the expected runs at its start.
+    vals = numpy.bincount(inv, rex.values())
+    assert( numpy.allclose(vals, runs - mat.loc['---', 0]) )
+    # Batters and pitchers share the values.
+    bat = rex.batting()
+    pit = rex.pitching()
+    assert( bat.pa.sum() == arr['pa'].sum() and pit.bf.sum() == arr['pa'].sum() )
+    assert( numpy.isclose(bat.re24.sum(), -pit.re24.sum()) )
+    # Value a team with a given matrix.
+    trex = bbstat.RunExpectancy(evts.team_rows('Guests'), mat)
+    tbat = trex.batting()
+    assert( numpy.allclose(tbat.re24, bat.re24.loc[tbat.index]) )
+    assert( numpy.array_equal(bbstat.RunExpectancy(evts, numpy.zeros((8, 3))).values(), arr['runs']) )
+    assert( len(bbstat.RunExpectancy(bbstat.EventTable()).batting()) == 0 )
+
+def test_run_expectancy_endings():
+    # Generated games 0 and 7 end in the bottom of an inning with WALKOFF and MERCY.
+    gen = GameGenerator(3)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        gen.write_archive(tmpdir, 8)
+        srdr = bbstat.SeasonReader(os.path.join(tmpdir, '*.dat'), events=True)
+        assert( 'WALKOFF' in gen.game_lines(0) and 'MERCY' in gen.game_lines(7) )
+        evts = srdr.events()
+    arr = evts.values()
+    rex = bbstat.RunExpectancy(evts)
+    # The last half-inning of each called game ends with fewer than three outs.
+    incomplete = ~rex.complete()
+    assert( sorted(set(arr['game'][incomplete])) == [0, 7] )
+    key = (arr['game'].astype(numpy.int64)*1000 + arr['inning'])*2 + arr['half']
+    assert( len(numpy.unique(key[incomplete])) == 2 )
+    for igam in [0, 7]:
+        sel = arr['game'] == igam
+        assert( (incomplete[sel] == (key[sel] == key[sel].max())).all() )
+    nout = numpy.bincount(numpy.unique(key, return_inverse=True)[1], arr['nout'])
+    assert( (nout < 3).sum() == 2 )
+    # Their plate appearances are left out of the matrix.
+    pas = arr['pa'] & rex.complete()
+    assert( (arr['pa'] & incomplete).any() )
+    assert( rex.counts().values.sum() == pas.sum() < arr['pa'].sum() )
+    cnts = numpy.bincount(8*arr['outs'][pas].astype(numpy.int64) + arr['bases'][pas], minlength=24)
+    tots = numpy.bincount(8*arr['outs'][pas].astype(numpy.int64) + arr['bases'][pas],
+                          rex.runs_to_end()[pas], minlength=24)
+    mat = rex.matrix().values.T.reshape(24)
+    assert( numpy.allclose(mat[cnts > 0], tots[cnts > 0]/cnts[cnts > 0]) )
+    # On-base events are valued and credited to the runner.
+    onbase = ~arr['pa']
+    assert( onbase.sum() > 10 and (rex.values()[onbase] != 0).any() )
+    bat = rex.batting()
+    assert( bat.nevt.sum() == (evts.bat_players() >= 0).sum() )
+    runner = arr['runner'][onbase][0]
+    assert( bat.loc[runner, 'nevt'] > bat.loc[runner, 'pa'] )
+    assert( numpy.isclose(bat.re24.sum(), -rex.pitching().re24.sum()) )
+
+def test_main_re24(capsys, monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fnam = os.path.join(tmpdir, 'events.npz')
+        season_events(tmpdir).save(fnam)
+        monkeypatch.setattr(sys, 'argv', ['bbstat-re24', fnam, 'team=Guests', 'counts'])
+        assert( bbstat.main_re24() == 0 )
+        assert( 're24' in capsys.readouterr().out )
+        monkeypatch.setattr(sys, 'argv', ['bbstat-re24', fnam, 'nosuch'])
+        assert( bbstat.main_re24() == 1 )
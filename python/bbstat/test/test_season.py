@@ -0,0 +1,98 @@
+import bbstat
+import os
+import tempfile
+from bbstat.test.games import sample_game
+from bbstat.test.games import write_game
+
+def test_season_reader():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in ['g01', 'g02', 'g03']:
+            write_game(tmpdir, name)
+        write_game(tmpdir, 'g04', 'Inning 1x\n')
+        pattern = os.path.join(tmpdir, 'g*.dat')
+        missing = os.path.join(tmpdir, 'none.dat')
+        srdr1 = bbstat.SeasonReader([pattern, missing], jobs=1)
+        srdr2 = bbstat.SeasonReader([pattern, missing], jobs=2)
+        for srdr in [srdr1, srdr2]:
+            assert( len(srdr.fnams()) == 5 )
+            assert( [os.path.basename(s.fnam) for s in srdr.summaries()] == ['g01.dat', 'g02.dat', 'g03.dat'] )
+            assert( sorted(srdr.errors().keys()) == sorted(srdr.fnams()[3:]) )
+            assert( 'Traceback' in srdr.errors()[missing] )
+            summ = srdr.summaries()[0]
+            assert( summ.score == '2-1' )
+            assert( summ.nerror() == 0 )
+            assert( summ.teamstats('Nobody') is None )
+            assert( summ.teamstats('Guests').bat_stats().loc[14, 'rbi'] == 1 )
+            assert( summ.teamstats('Homers').pitch_stats().loc[21, 'b'] == 10 )
+        tstats = srdr2.teamstats('Guests')
+        assert( tstats.bat_stats().loc[11, 'pa'] == 3 )
+        assert( tstats.bat_stats().loc[14, 'name'] == 'Di Four' )
+        for summ1, summ2 in zip(srdr1.summaries(), srdr2.summaries()):
+            assert( summ1.vstats.bat_stats().equals(summ2.vstats.bat_stats()) )
+            assert( summ1.hstats.pitch_stats().equals(summ2.hstats.pitch_stats()) )
+
+def test_game_cache():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cachedir = os.path.join(tmpdir, 'cache')
+        fnam1 = write_game(tmpdir, 'g01')
+        fnam2 = write_game(tmpdir, 'g02')
+        cache = bbstat.GameCache(cachedir)
+        rdr = bbstat.Reader(fnam1, cache=cache)
+        assert( rdr.game() is not None )
+        assert( cache.counts() == {'hit': 0, 'miss': 1} )
+        rdr = bbstat.Reader(fnam1, cache=cache)
+        assert( rdr.game() is None )
+        assert( cache.counts() == {'hit': 1, 'miss': 1} )
+        summ = rdr.summary()
+        assert( summ.score == '2-1' )
+        assert( summ.vline == [1, 1] )
+        assert( summ.hline == [0, 1] )
+        assert( summ.title == 'Test game' )
+        assert( summ.teamstats('Guests').bat_stats().loc[14, 'rbi'] == 1 )
+        # Identical content shares the entry.
+        srdr = bbstat.SeasonReader([fnam1, fnam2], jobs=2, cache=cache)
+        assert( cache.counts() == {'hit': 3, 'miss': 1} )
+        assert( [summ.fnam for summ in srdr.summaries()] == [fnam1, fnam2] )
+        # An edit invalidates the entry.
+        with open(fnam2, 'a') as fout:
+            fout.write('\n')
+        srdr = bbstat.SeasonReader([fnam1, fnam2], jobs=1, cache=cachedir)
+        assert( srdr.cache().counts() == {'hit': 1, 'miss': 1} )
+        srdr = bbstat.SeasonReader([fnam1, fnam2], jobs=1, cache=cachedir)
+        assert( srdr.cache().counts() == {'hit': 2, 'miss': 0} )
+        assert( len(srdr.errors()) == 0 )
+
+def test_game_cache_log(capsys):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = bbstat.GameCache(os.path.join(tmpdir, 'cache'))
+        fnam = write_game(tmpdir, 'bad', sample_game.replace('SCORE:2-0', 'SCORE:3-0'))
+        rdr = bbstat.Reader(fnam, cache=cache)
+        assert( rdr.nerr == 1 )
+        msg = 'Expected and game scores differ'
+        assert( msg in capsys.readouterr().out )
+        # The reader output is cached with the results.
+        srdr = bbstat.SeasonReader(fnam, cache=cache)
+        assert( cache.counts() == {'hit': 1, 'miss': 1} )
+        assert( msg in srdr.errors()[fnam] and msg in srdr.log(fnam) )
+
+def test_game_cache_events():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = bbstat.GameCache(os.path.join(tmpdir, 'cache'))
+        fnam = write_game(tmpdir, 'g01')
+        bbstat.Reader(fnam, cache=cache)
+        assert( cache.counts() == {'hit': 0, 'miss': 1} )
+        # An entry without events is a miss when events are wanted.
+        rdr = bbstat.Reader(fnam, cache=cache, keep_events=True)
+        assert( cache.counts() == {'hit': 0, 'miss': 2} )
+        assert( rdr.game() is not None and len(rdr.summary().events) == 24 )
+        bbstat.Reader(fnam, cache=cache)
+        assert( cache.counts() == {'hit': 1, 'miss': 2} )
+        # The same for a season filled without events.
+        fnam2 = write_game(tmpdir, 'g02', sample_game + '\n')
+        bbstat.SeasonReader(fnam2, cache=cache)
+        assert( cache.counts() == {'hit': 1, 'miss': 3} )
+        srdr = bbstat.SeasonReader([fnam, fnam2], cache=cache, events=True)
+        assert( cache.counts() == {'hit': 2, 'miss': 4} )
+        assert( len(srdr.events()) == 48 )
+        bbstat.SeasonReader([fnam, fnam2], cache=cache, events=True)
+        assert( cache.counts() == {'hit': 4, 'miss': 4} )
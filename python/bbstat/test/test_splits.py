@@ -0,0 +1,79 @@
+import bbstat
+import numpy
+import os
+import sys
+import tempfile
+from bbstat.test.games import sample_game
+
+def parse_sample():
+    prs = bbstat.GameParser(keep_events=True)
+    assert( prs.feed_lines(sample_game.splitlines()) == 0 )
+    return prs.game()
+
+def test_splits_batting():
+    game = parse_sample()
+    evts = game.events()
+    spl = bbstat.Splits(evts, 'Guests')
+    btots = spl.events().bat_totals()
+    for dim in bbstat.Splits.dimensions():
+        lines = spl.batting(dim)
+        assert( lines.index.names == ['num', dim] )
+        sums = lines[btots.columns].groupby(level='num').sum()
+        assert( (sums == btots).all().all() )
+    # Lines for all players in each split add to the team totals.
+    lines = spl.batting(['outs', 'risp'], players=False)
+    assert( lines.pa.sum() == btots.pa.sum() and list(lines.index.names) == ['outs', 'risp'] )
+    assert( lines.loc[(2, 'yes'), 'rbi'] == 1 )
+    # The derived columns are those of BatStats.
+    bstats = bbstat.BatStats(game.vstats, minpa=0).get()
+    lines = spl.batting()
+    for col in ['hit', 'atb', 'avg', 'slg', 'obp', 'ops', 'kpct', 'bbpct']:
+        assert( (lines[col] == bstats.loc[lines.index, col]).all() )
+    assert( len(spl.batting(minpa=3)) == (lines.pa >= 3).sum() )
+    assert( spl.batting('nosuch') is None )
+    # Balls and strikes are capped separately so four-pitch walks are in 3-0.
+    arr = evts.values()
+    keys, labels = bbstat.Splits(evts).keys('count')
+    walks = (arr['balls'] == 4) & (arr['strikes'] == 0)
+    assert( walks.any() and all(labels[key] == '3-0' for key in keys[walks]) )
+
+def test_splits_pitching():
+    evts = parse_sample().events()
+    spl = bbstat.Splits(evts)
+    ptots = evts.pitch_totals()
+    lines = spl.pitching('home')
+    sums = lines[ptots.columns].groupby(level='num').sum()
+    assert( (sums == ptots.loc[sums.index]).all().all() )
+    # Home pitchers face the visitors in the top of the inning.
+    home = lines.xs('home', level='home')
+    assert( (evts.values()['half'][numpy.isin(evts.values()['pitcher'], home.index)] == 0).all() )
+    lines = spl.pitching(['count'], players=False, minbf=1)
+    assert( lines.bf.sum() == ptots.bf.sum() and (lines.bf >= 1).all() )
+    assert( 'whip' in lines.columns )
+
+def test_splits_register():
+    evts = parse_sample().events()
+    def split_parity(arr, offense):
+        return arr['inning'] % 2, ['even', 'odd']
+    bbstat.Splits.register_dimension('parity', split_parity)
+    try:
+        assert( 'parity' in bbstat.Splits.dimensions() )
+        spl = bbstat.Splits(evts)
+        keys, labels = spl.keys('parity')
+        assert( len(keys) == len(evts) and labels == ['even', 'odd'] )
+        lines = spl.batting('parity', players=False)
+        assert( lines.pa.sum() == evts.values()['pa'].sum() )
+    finally:
+        assert( bbstat.Splits.unregister_dimension('parity') == 0 )
+    assert( 'parity' not in bbstat.Splits.dimensions() )
+    assert( bbstat.Splits.unregister_dimension('parity') == 1 )
+
+def test_main_splits(capsys, monkeypatch):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fnam = os.path.join(tmpdir, 'events.npz')
+        parse_sample().events().save(fnam)
+        monkeypatch.setattr(sys, 'argv', ['bbstat-splits', fnam, 'team=Guests', 'split=outs,risp', 'total'])
+        assert( bbstat.main_splits() == 0 )
+        assert( 'risp' in capsys.readouterr().out )
+        monkeypatch.setattr(sys, 'argv', ['bbstat-splits', fnam, 'split=nosuch'])
+        assert( bbstat.main_splits() == 1 )
@@ -3,8 +3,221 @@ from bbstat import GameStats
 from bbstat import BatStats
 from bbstat import PitchStats
 from bbstat import Reader
+from bbstat import Counter
+from bbstat import Lineup
 import sys
-import pandas
+
+def test_increment():
+  dlup = Lineup('defense', Counter(), [31, 32])
+  gstats = GameStats(None, dlup, 'Test')
+  assert( gstats.have_batter(11, 'Al One', add=True) )
+  assert( gstats.have_batter(12, add=True) )
+  gstats.increment_player_bat_stat(11, 'pa')
+  df = gstats.bat_stats()
+  assert( list(df.index) == [11, 12] )
+  assert( list(df.columns) == GameStats.all_bat_names )
+  assert( df.loc[11, 'name'] == 'Al One' )
+  assert( df.loc[11, 'pa'] == 1 )
+  assert( gstats.bat_stats() is df )
+  gstats.increment_player_bat_stat(11, 'pa', 2)
+  assert( gstats.bat_stats() is not df )
+  assert( gstats.bat_stats().loc[11, 'pa'] == 3 )
+  assert( df.loc[11, 'pa'] == 1 )
+  assert( gstats.increment_pitch_stat('b', 4) == 0 )
+  assert( gstats.increment_pitch_stat('xyz') == 2 )
+  assert( gstats.pitch_stats().loc[31, 'b'] == 4 )
+  assert( gstats.nerror() == 1 )
+
+def test_as_of():
+  counter = Counter()
+  gstats = GameStats(None, Lineup('defense', counter, [31]), 'Test')
+  for num in [11, 12]:
+    assert( gstats.have_batter(num, add=True) )
+  idxs = []
+  for num, nam, val in [(11, 'pa', 1), (12, 'pa', 1), (11, 'run', 1), (11, 'pa', 2), (12, 'hr', 1)]:
+    counter.next()
+    gstats.increment_player_bat_stat(num, nam, val)
+    gstats.increment_pitch_stat('bf', val)
+    idxs.append(counter.get())
+  assert( len(gstats.bat_log()) == 5 and len(gstats.pitch_log()) == 5 )
+  assert( list(gstats.bat_log().events()['delta']) == [1, 1, 1, 2, 1] )
+  df = gstats.as_of(idxs[2]).bat_stats()
+  assert( list(df['pa']) == [1, 1] and list(df['run']) == [1, 0] and df['hr'].sum() == 0 )
+  assert( gstats.as_of(idxs[3]).bat_stats().loc[11, 'pa'] == 3 )
+  assert( gstats.as_of(idxs[3]).pitch_stats().loc[31, 'bf'] == 5 )
+  assert( gstats.as_of(0).bat_stats()['pa'].sum() == 0 )
+  assert( gstats.as_of(idxs[-1]).bat_stats().equals(gstats.bat_stats()) )
+  assert( gstats.detached().as_of(idxs[0]) is None )
+
+def test_derived_stats():
+  from bbstat.stats.batstats import krat, krat_array
+  nums = [0, 1, 2, 1, 5, 7, 3, 1]
+  dens = [3, 3, 0, 8, 16, 9, 8, 2000]
+  rats = krat_array(nums, dens)
+  assert( list(rats) == [krat(num, den) for num, den in zip(nums, dens)] )
+  assert( rats.dtype == float )
+  assert( krat_array(nums[3:], dens[3:]).dtype == int )
+  gstats = GameStats(None, Lineup('defense', Counter(), [31]), 'Test')
+  assert( gstats.have_batter(11, 'Al One', add=True) )
+  assert( gstats.have_batter(12, 'Bo Two', add=True) )
+  for nam, val in [('pa', 4), ('b1', 1), ('hr', 1), ('bb', 1), ('k', 1)]:
+    gstats.increment_player_bat_stat(11, nam, val)
+  for nam, val in [('bf', 5), ('ino', 4), ('k', 2), ('bb', 1), ('hit', 2), ('b', 9), ('s', 11)]:
+    gstats.increment_pitch_stat(nam, val)
+  bstats = BatStats(gstats, minpa=-1)
+  assert( list(bstats.get().index) == [11, 12] )
+  row = bstats.get().loc[11]
+  assert( (row.atb, row.avg, row.obp, row.slg, row.ops) == (3, 667, 750, 1667, 2417) )
+  assert( (row.kpct, row.bbpct) == (250, 250) )
+  assert( bstats.get().loc[12, 'avg'] == 0 )
+  row = PitchStats(gstats).get().loc[31]
+  assert( (row.pit, row.kpct, row.bbpct, row.whip) == (20, 400, 200, 2250) )
+
+def test_add():
+  gsum = GameStats(None, None, 'Sum')
+  assert( gsum.have_batter(12, 'Bo', add=True) )
+  assert( gsum.have_batter(13, add=True) )
+  gstats = GameStats(None, Lineup('defense', Counter(), [31]), 'Game')
+  for num, name in [(11, 'Al One'), (12, 'Bo Two'), (13, 'Cy Three')]:
+    assert( gstats.have_batter(num, name, add=True) )
+    gstats.increment_player_bat_stat(num, 'pa', num - 10)
+  gstats.increment_pitch_stat('bf', 6)
+  gsum.add(gstats)
+  gsum.add(gstats)
+  df = gsum.bat_stats()
+  assert( list(df.index) == [12, 13, 11] )
+  assert( list(df['name']) == ['Bo', 'Cy Three', 'Al One'] )
+  assert( list(df['pa']) == [4, 6, 2] )
+  assert( gsum.pitch_stats().loc[31, 'bf'] == 12 )
+
+def test_merge():
+  from bbstat import GameParser
+  from bbstat.test.games import sample_game
+  texts = [sample_game, sample_game.replace('FO9', '1B'),
+           sample_game.replace('#16 b HR RBI', '#16 b 2B').replace('SCORE:2-0', 'SCORE:1-0')]
+  stats = []
+  for text in texts:
+    prs = GameParser()
+    assert( prs.feed_lines(text.splitlines()) == 0 )
+    stats += [prs.game().vstats, prs.game().hstats]
+  empty = GameStats.empty()
+  assert( len(empty.bat_stats()) == 0 )
+  def same(st1, st2):
+    return st1.bat_stats().equals(st2.bat_stats()) and st1.pitch_stats().equals(st2.pitch_stats())
+  tot = sum(stats)
+  assert( same(tot, stats[0] + (stats[1] + (stats[2] + (stats[3] + (stats[4] + stats[5]))))) )
+  assert( same(tot, sum(reversed(stats))) )
+  assert( same(tot, empty + sum(stats[3:]) + sum(stats[:3])) )
+  assert( same(tot, GameStats.tree_sum(stats)) )
+  assert( same(tot, GameStats.tree_sum(stats, jobs=2)) )
+  assert( same(tot, GameStats.tree_sum(stats, jobs=2, processes=True)) )
+  assert( tot.name == 'Guests + Homers' )
+  df = tot.bat_stats()
+  assert( list(df.index) == sorted(df.index) )
+  seq = GameStats.empty()
+  for gstats in stats: seq.add(gstats)
+  assert( (seq.bat_stats().loc[df.index, 'pa'] == df['pa']).all() )
+  assert( seq.pitch_stats()['s'].sum() == tot.pitch_stats()['s'].sum() )
+
+def test_excel_cache():
+  import os
+  import json
+  import pandas
+  import pickle
+  import tempfile
+  from bbstat import ExcelCache
+  with tempfile.TemporaryDirectory() as tmpdir:
+    fnam = os.path.join(tmpdir, 'roster.xlsx')
+    def write_roster(lasts):
+      df = pandas.DataFrame({'num': [11, 12], 'first': ['Al', 'Bo'], 'last': lasts})
+      with pandas.ExcelWriter(fnam) as fout:
+        df.to_excel(fout, sheet_name='roster', index=False)
+    write_roster(['One', 'Two'])
+    # Nothing is cached by default.
+    ros = Roster()
+    ros.set_from_excel(fnam)
+    assert( os.listdir(tmpdir) == ['roster.xlsx'] )
+    cachedir = os.path.join(tmpdir, 'cache')
+    cache = ExcelCache(cachedir)
+    ros.set_from_excel(fnam, cache=cache)
+    assert( list(ros.get()['last']) == ['One', 'Two'] )
+    path = cache.path(fnam, 'roster')
+    kpath = cache.key_path(fnam, 'roster')
+    assert( sorted(os.listdir(cachedir)) == sorted([os.path.basename(path), os.path.basename(kpath)]) )
+    assert( sorted(os.listdir(tmpdir)) == ['cache', 'roster.xlsx'] )
+    assert( cache.counts() == {'hit': 0, 'miss': 1} )
+    with open(kpath) as fin:
+      key = json.load(fin)
+    assert( key['path'] == os.path.abspath(fnam) and key['sheet'] == 'roster' )
+    ros.set_from_excel(fnam, cache=cache)
+    assert( cache.counts() == {'hit': 1, 'miss': 1} )
+    # A pickle that does not match the key is not loaded.
+    with open(path, 'rb') as fin:
+      df = pickle.load(fin)
+    df.loc[12, 'first'] = 'Planted'
+    with open(path, 'wb') as fout:
+      pickle.dump(df, fout)
+    ros.set_from_excel(fnam, cache=cache)
+    assert( ros.first_name(12) == 'Bo' )
+    assert( cache.counts() == {'hit': 1, 'miss': 2} )
+    # A changed workbook or different options are read again.
+    write_roster(['Uno', 'Dos'])
+    ros.set_from_excel(fnam, cache=cachedir)
+    assert( list(ros.get()['last']) == ['Uno', 'Dos'] )
+    assert( cache.counts() == {'hit': 1, 'miss': 2} )
+    assert( cache.read(fnam, 'roster', usecols=['num', 'last']).shape == (2, 2) )
+    assert( cache.counts() == {'hit': 1, 'miss': 3} )
+    assert( ExcelCache.get_cache(True) is None and ExcelCache.get_cache(None) is None )
+    # Game stats sheets.
+    gstats = GameStats(roster=ros)
+    bstats = pandas.DataFrame({'num': [11], 'name': ['Al Uno']})
+    for nam in GameStats.bat_names:
+      bstats[nam] = 0
+    bstats[['pa', 'b1']] = [4, 2]
+    xnam = os.path.join(tmpdir, 'g01.xlsx')
+    with pandas.ExcelWriter(xnam) as fout:
+      bstats.to_excel(fout, sheet_name='batsum', index=False)
+    xcache = ExcelCache(os.path.join(tmpdir, 'side'))
+    for iread in range(2):
+      gstats.add_from_excel(xnam, cache=xcache)
+    assert( xcache.counts() == {'hit': 1, 'miss': 1} )
+    assert( gstats.bat_stats().loc[11, 'pa'] == 8 and gstats.bat_stats().loc[11, 'b1'] == 4 )
+
+def test_xcheck():
+  import os
+  import pandas
+  import tempfile
+  from bbstat.stats.xcheck import read_excel_stats
+  from bbstat.stats.xcheck import stat_discrepancies
+  def batsum(rows):
+    df = pandas.DataFrame(0, index=pandas.Index([row[0] for row in rows], name='num'),
+                          columns=GameStats.all_bat_names)
+    df['name'] = [row[1] for row in rows]
+    df['pa'] = [row[2] for row in rows]
+    df['b1'] = [row[3] for row in rows]
+    return df
+  xdfs = {'g01': batsum([(11, 'Al', 4, 1), (12, 'Bo', 3, 0)]),
+          'g02': batsum([(11, 'Al', 4, 2), (13, 'Cy', 2, 1)])}
+  with tempfile.TemporaryDirectory() as tmpdir:
+    fins = {}
+    for sgam, df in xdfs.items():
+      fins[sgam] = os.path.join(tmpdir, sgam + '.xlsx')
+      with pandas.ExcelWriter(fins[sgam]) as fout:
+        df.to_excel(fout, sheet_name='batsum')
+    xstats = read_excel_stats(fins, jobs=2)
+  assert( list(xstats) == ['g01', 'g02'] )
+  assert( xstats['g02'].bat_stats().loc[13, 'b1'] == 1 )
+  gdfs = {'g01': batsum([(11, 'Al', 4, 1), (12, 'Bo', 4, 0)]),
+          'g02': batsum([(11, 'Al', 4, 1), (14, 'Di', 1, 0)])}
+  xdfs = {sgam: gstats.bat_stats() for sgam, gstats in xstats.items()}
+  diffs = stat_discrepancies(xdfs, gdfs)
+  assert( list(diffs.columns) == ['game', 'player', 'stat', 'expected', 'actual'] )
+  rows = [tuple(row) for row in diffs.itertuples(index=False)]
+  assert( rows == [('g01', 12, 'pa', 3, 4), ('g02', 11, 'b1', 2, 1),
+                   ('g02', 13, 'pa', 2, 0), ('g02', 13, 'b1', 1, 0), ('g02', 14, 'pa', 0, 1)] )
+  assert( len(stat_discrepancies(xdfs, xdfs)) == 0 )
+  assert( len(stat_discrepancies({}, {})) == 0 )
+  assert( len(stat_discrepancies({}, {'g03': gdfs['g01']})) == 3 )
 
 def main_test_stats():
   '''
@@ -15,8 +228,15 @@ def main_test_stats():
          opts include
            xonly - Only show excel stats
            xcheck - Compare excel and game stats
+           jobs=N - Number of threads reading excel files for xcheck
            minpa=N - Set minpa for bat stats to N
+           cache=DIR - Cache the sheets read from the excel files in directory DIR
   '''
+  import pandas
+  from concurrent.futures import ThreadPoolExecutor
+  from bbstat.stats.xcheck import submit_excel_stats
+  from bbstat.stats.xcheck import stat_discrepancies
+  from bbstat import ExcelCache
   pandas.options.display.width = 0
   dir = '/Users/davidadams/Documents/sports/wildcats-2023'
   line = '----------------------------'
@@ -45,19 +265,24 @@ def main_test_stats():
   errgams = []
   xonly = False
   xcheck = False
+  jobs = 4
   minpa = 20
+  xcache = None
   for opt in sys.argv[2:]:
     if   opt == 'xonly': xonly = True
     elif opt == 'xcheck': xcheck = True
+    elif opt[0:5] == 'jobs=':
+      jobs = int(opt[5:])
     elif opt[0:6] == 'minpa=':
       minpa = int(opt[6:])
+    elif opt[0:6] == 'cache=':
+      xcache = ExcelCache(opt[6:])
     else:
       print(f"Invalid option: {opt}")
       return 1
   ros = Roster()
-  ros.set_from_excel(dir + '/roster.xlsx')
+  ros.set_from_excel(dir + '/roster.xlsx', cache=xcache)
   ros.display()
-  xstat_sum = GameStats(roster=ros, fill=True)
   gstat_sum = GameStats(roster=ros, fill=True)
   count = 0
   if xonly:
@@ -75,6 +300,12 @@ def main_test_stats():
     print(line)
   else:
     dbg = 0
+    if xcheck:
+      # Read the excel summaries in the background while the games are parsed.
+      pool = ThreadPoolExecutor(max_workers=max(jobs, 1))
+      xfins = {sgam: f"{dir}/gamesums/{sgam}.xlsx" for sgam in sgams}
+      xfuts = submit_excel_stats(pool, xfins, ros, xcache)
+      gdfs = {}
     for sgam in sgams:
       # Game stats
       gdir = '/Users/davidadams/Documents/sports/wildcats-2023/games'
@@ -92,23 +323,15 @@ def main_test_stats():
       print(gdf)
       print(line, 'Game sum ', sgam)
       print(gsdf)
-      if xcheck:
-        # xcl stats
-        print(line, 'Excel game stats:', sgam)
-        fin = f"{dir}/gamesums/{sgam}.xlsx"
-        xstats = GameStats(roster=ros, xfile=fin)
-        xstat_sum.add(xstats)
-        print(xstats.bat_stats())
-        print(line, 'Excel sum stats:', sgam)
-        print(xstat_sum.bat_stats())
-        #print(line, 'Last game comparison', sgam)
-        #xdf = xstats.bat_stats()
-        #print(xdf.compare(gdf))
-        print(line, 'Game sum comparison', sgam)
-        xsdf = gstat_sum.bat_stats()
-        print(xsdf.compare(gsdf))
+      if xcheck: gdfs[sgam] = gdf
       if count == len(sgams): print(line)
       count = count + 1
+    if xcheck:
+      xdfs = {sgam: fut.result().bat_stats() for sgam, fut in xfuts.items()}
+      pool.shutdown()
+      diffs = stat_discrepancies(xdfs, gdfs)
+      print(line, f"Excel (expected) and game (actual) stat differences: {len(diffs)}")
+      if len(diffs): print(diffs.to_string(index=False))
   print(line)
   bstats = BatStats(gstat_sum, minpa=minpa)
   bstats.display()